@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+import database
+# For json
+import json
+# For images
+import math
+import cv2
+import numpy as np
+from cv_bridge import CvBridge, CvBridgeError
+
+
+class RoomConnectivityExtractor():
+
+	#========================================================================
+	# Description:
+	# Derives the doors (transitions) between the rooms and the corridor
+	# from the global map and the room maps of a database set. Stores the
+	# entry poses of each room and the room adjacency graph in
+	# resources/json/room_connectivity.json.
+	#========================================================================
+
+	# Region id of the free space which does not belong to any room
+	corridor_id_ = -1
+
+	# Constructor
+	def __init__(self, database_file_path=""):
+		self.bridge_ = CvBridge()
+		self.database_file_path_ = database_file_path
+		self.database_ = database.Database(extracted_file_path=database_file_path)
+		self.database_.loadDatabase()
+		self.robot_radius_ = 0.325
+		# Maximum gap in [m] between two regions which are still considered to be connected (e.g. a door frame)
+		self.max_door_gap_ = 0.2
+		# Minimum width in [m] of a passable door
+		self.min_door_width_ = 0.6
+		# Distance in [m] of an entry pose from the door
+		self.entry_distance_ = 0.5
+
+	def cvBridge2OpenCv(self, cvbridge_image):
+		return self.bridge_.imgmsg_to_cv2(cvbridge_image, desired_encoding = "passthrough")
+
+	# Converts a pixel position into map coordinates
+	def pixelToWorld(self, u, v):
+		map_resolution = self.database_.global_map_data_.map_resolution_
+		map_origin = self.database_.global_map_data_.map_origin_
+		return [map_origin.position.x + u*map_resolution, map_origin.position.y + v*map_resolution]
+
+	# Returns a dictionary region id --> binary mask of all rooms and of the corridor
+	def getRegionMasks(self):
+		free_space = (self.cvBridge2OpenCv(self.database_.global_map_data_.map_image_) == 255)
+		region_masks = {}
+		room_space = np.zeros(free_space.shape, np.bool_)
+		for room in self.database_.rooms_:
+			if (room.room_map_data_ == None):
+				continue
+			room_mask = (self.cvBridge2OpenCv(room.room_map_data_) == 255)
+			region_masks[room.room_id_] = room_mask
+			room_space = np.logical_or(room_space, room_mask)
+		region_masks[self.corridor_id_] = np.logical_and(free_space, np.logical_not(room_space))
+		return region_masks
+
+	# Returns the doors between all pairs of regions as list of dictionaries
+	def extractDoors(self, region_masks):
+		map_resolution = self.database_.global_map_data_.map_resolution_
+		gap_in_pixel = int(math.ceil(self.max_door_gap_/map_resolution))
+		kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*gap_in_pixel+1, 2*gap_in_pixel+1))
+		dilated_masks = {}
+		for region_id, mask in region_masks.items():
+			dilated_masks[region_id] = cv2.dilate(mask.astype(np.uint8), kernel) > 0
+		doors = []
+		region_ids = sorted(region_masks.keys())
+		for i in range(len(region_ids)):
+			for j in range(i+1, len(region_ids)):
+				region_a = region_ids[i]
+				region_b = region_ids[j]
+				# Pixels of both regions which are close to the other region
+				contact = np.logical_or(np.logical_and(region_masks[region_a], dilated_masks[region_b]),
+										np.logical_and(region_masks[region_b], dilated_masks[region_a]))
+				if (np.any(contact) == False):
+					continue
+				# Close the gap between both sides of a door, such that each door is one component
+				contact = cv2.dilate(contact.astype(np.uint8), kernel)
+				number_components, labels, stats, centroids = cv2.connectedComponentsWithStats(contact, connectivity=8)
+				for component in range(1, number_components):
+					width = max(stats[component, cv2.CC_STAT_WIDTH], stats[component, cv2.CC_STAT_HEIGHT]) - 2*gap_in_pixel
+					if (width*map_resolution < self.min_door_width_):
+						continue
+					doors.append({
+						"regions": [region_a, region_b],
+						"center": self.pixelToWorld(centroids[component][0], centroids[component][1]),
+						"center_in_pixel": [float(centroids[component][0]), float(centroids[component][1])],
+						"width": float(width*map_resolution)
+					})
+		return doors
+
+	# Returns the entry pose [x, y, yaw] of a room behind a door or None if the robot does not fit into the room.
+	# The entry position is the accessible room pixel closest to the point entry_distance_ behind the door center.
+	def computeEntryPose(self, room_mask, door):
+		map_resolution = self.database_.global_map_data_.map_resolution_
+		radius_in_pixel = int(math.ceil(self.robot_radius_/map_resolution))
+		kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*radius_in_pixel+1, 2*radius_in_pixel+1))
+		accessible_pixels = np.argwhere(cv2.erode(room_mask.astype(np.uint8), kernel) > 0)
+		if (accessible_pixels.shape[0] == 0):
+			return None
+		door_u, door_v = door["center_in_pixel"]
+		# Accessible pixels whose distance to the door is closest to the entry distance
+		door_distances = np.hypot(accessible_pixels[:, 1] - door_u, accessible_pixels[:, 0] - door_v)
+		entry_index = int(np.argmin(np.abs(door_distances - self.entry_distance_/map_resolution)))
+		entry_v, entry_u = accessible_pixels[entry_index]
+		# The robot looks from the door into the room
+		yaw = math.atan2(entry_v - door_v, entry_u - door_u)
+		return self.pixelToWorld(entry_u, entry_v) + [yaw]
+
+	# Compute the doors, entry poses and the adjacency graph and save them in the database set
+	def runConnectivityExtraction(self):
+		region_masks = self.getRegionMasks()
+		doors = self.extractDoors(region_masks)
+		rooms_dict = {}
+		for room in self.database_.rooms_:
+			if ((room.room_id_ in region_masks) == False):
+				continue
+			entry_poses = []
+			neighbors = []
+			for door in doors:
+				if ((room.room_id_ in door["regions"]) == False):
+					continue
+				other_region = door["regions"][1] if (door["regions"][0] == room.room_id_) else door["regions"][0]
+				if ((other_region in neighbors) == False):
+					neighbors.append(other_region)
+				entry_pose = self.computeEntryPose(region_masks[room.room_id_], door)
+				if (entry_pose != None):
+					entry_poses.append(entry_pose)
+			rooms_dict[str(room.room_id_)] = {
+				"room_id": room.room_id_,
+				"entry_poses": entry_poses,
+				"neighbors": neighbors
+			}
+			print "Room " + str(room.room_id_) + ": " + str(len(entry_poses)) + " entry poses, neighbors " + str(neighbors)
+		for door in doors:
+			del door["center_in_pixel"]
+		connectivity_dict = {
+			"corridor_id": self.corridor_id_,
+			"rooms": rooms_dict,
+			"doors": doors
+		}
+		connectivity_text = json.dumps(connectivity_dict, indent=4, sort_keys=True)
+		file = open(str(self.database_file_path_) + "resources/json/room_connectivity.json", "w")
+		file.write(connectivity_text)
+		file.close()
+
+
+
+# =======================================================================================================
+# Calling the connectivity extraction
+
+if __name__ == '__main__':
+	connectivity_extractor = RoomConnectivityExtractor()
+	connectivity_extractor.runConnectivityExtraction()
@@ -10,6 +10,8 @@ import threading
 from abc import ABCMeta, abstractmethod
 import std_msgs
 from cob_srvs.srv import SetInt, SetIntResponse
+import coroutine_runtime
+import application_status_publisher
 
 from baker_wet_cleaning_application.msg import InterruptActionAction
 from baker_wet_cleaning_application.msg import InterruptActionGoal
@@ -31,13 +33,6 @@ class ApplicationContainer:
 	# but this apparently works to automatically get the changed number also into the client behaviors
 	application_status_ = [1]
 
-	def publishApplicationStatus(self):
-		self.application_status_pub_ = rospy.Publisher(str(self.application_name_) + '_status', std_msgs.msg.Int32, queue_size=1)
-		rate = rospy.Rate(5) # 5hz
-		while (not rospy.is_shutdown()):
-			self.application_status_pub_.publish(self.application_status_[0])
-			rate.sleep()
-
 	# Method for printing messages.
 	def printMsg(self, text):
 		print "[Application '" + str(self.application_name_) + "']: " + str(text)
@@ -47,17 +42,21 @@ class ApplicationContainer:
 		self.application_name_ = application_name
 		# Initialize the interruption action server
 		self.interrupt_action_name_ = interrupt_action_name
+		# The status is published on every change and as heartbeat, the publisher has to exist before the first interrupt arrives
+		self.status_publisher_ = application_status_publisher.ApplicationStatusPublisher(self.application_name_, self.application_status_)
+		self.status_publisher_.start()
+
 		#self.interrupt_server_ = actionlib.SimpleActionServer(interrupt_action_name, InterruptActionAction, execute_cb=self.interruptCallback, auto_start=False)
 		#self.interrupt_server_.start()
 		self.interrupt_server_ = rospy.Service(interrupt_action_name, SetInt, self.interruptCallback)
-		
-		thread = threading.Thread(target = self.publishApplicationStatus)
-		thread.start()
 
 	# Callback function for interrupt
 	def interruptCallback(self, req):
 		self.application_status_[0] = req.data
 		print "Changed self.application_status_[0] =", self.application_status_[0]
+		# Coroutine behaviors are cancelled immediately
+		coroutine_runtime.notifyInterrupt(self.application_status_)
+		self.status_publisher_.notifyChange()
 		res = SetIntResponse()
 		res.success = True
 		return res
@@ -126,6 +125,7 @@ class ApplicationContainer:
 				self.executeCustomBehavior()
 				if self.application_status_[0] == 0:
 					self.application_status_[0] = 1		# set back to 1=Paused after successful, uninterrupted execution to avoid automatic restart
+					self.status_publisher_.notifyChange()
 				self.printMsg("Application completed with code " + str(self.application_status_[0]))
 			elif self.application_status_[0] == 3:
 				break
\ No newline at end of file
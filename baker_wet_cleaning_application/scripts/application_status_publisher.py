@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+import std_msgs
+
+from baker_wet_cleaning_application.msg import ApplicationStatus
+
+
+class ApplicationStatusPublisher():
+
+	#========================================================================
+	# Description:
+	# Publishes the status of the application on every change and as
+	# low-rate heartbeat. <application_name>_status carries the plain
+	# status (Int32), <application_name>_progress the ApplicationStatus
+	# message with the progress of an optional CleaningProgressTracker.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, application_name, application_status, heartbeat_period=2.0):
+		# Pointer to the status variable of the application container
+		self.application_status_ = application_status
+		# Time in [s] after which the status is published again without a change
+		self.heartbeat_period_ = heartbeat_period
+		# Optional CleaningProgressTracker
+		self.progress_tracker_ = None
+		self.status_pub_ = rospy.Publisher(str(application_name) + '_status', std_msgs.msg.Int32, queue_size=1, latch=True)
+		self.progress_pub_ = rospy.Publisher(str(application_name) + '_progress', ApplicationStatus, queue_size=1, latch=True)
+		self.change_pending_ = False
+		self.condition_ = threading.Condition()
+		self.worker_thread_ = None
+
+	# Publish the progress of the given CleaningProgressTracker with the status
+	def setProgressTracker(self, progress_tracker):
+		self.progress_tracker_ = progress_tracker
+		progress_tracker.addListener(self.notifyChange)
+		self.notifyChange()
+
+	# Start the publishing thread
+	def start(self):
+		if (self.worker_thread_ == None):
+			self.worker_thread_ = threading.Thread(target = self.processChanges)
+			self.worker_thread_.daemon = True
+			self.worker_thread_.start()
+
+	# Request a publication of the current status, e.g. after the status or the progress changed
+	def notifyChange(self):
+		with self.condition_:
+			self.change_pending_ = True
+			self.condition_.notify_all()
+
+	# Publish the current status and progress
+	def publishStatus(self):
+		status = self.application_status_[0]
+		self.status_pub_.publish(status)
+		message = ApplicationStatus()
+		message.header.stamp = rospy.Time.now()
+		message.status = status
+		message.cleaning_pass = -1
+		message.current_room_id = -1
+		if (self.progress_tracker_ != None):
+			progress = self.progress_tracker_.getProgress()
+			message.cleaning_pass = progress["cleaning_pass"]
+			message.current_room_id = progress["current_room_id"]
+			message.current_room_name = progress["current_room_name"]
+			message.rooms_done = progress["rooms_done"]
+			message.rooms_remaining = progress["rooms_remaining"]
+			message.cleaned_area = progress["cleaned_area"]
+			if (progress["estimated_finish_time"] != None):
+				message.estimated_finish_time = rospy.Time.from_sec(progress["estimated_finish_time"])
+		self.progress_pub_.publish(message)
+
+	# Worker loop: publish on every change, otherwise after the heartbeat period
+	def processChanges(self):
+		while (rospy.is_shutdown() == False):
+			with self.condition_:
+				if (self.change_pending_ == False):
+					self.condition_.wait(self.heartbeat_period_)
+				self.change_pending_ = False
+			try:
+				self.publishStatus()
+			except rospy.ROSException, e:
+				# the node is shutting down
+				pass
@@ -7,8 +7,15 @@ import application_container
 import map_handling_behavior
 import dry_cleaning_behavior
 import wet_cleaning_behavior
+import behavior_graph
 import database
 import database_handler
+import database_writer
+import dirt_map_client
+import dirt_history_store
+import cleaning_progress_tracker
+import room_sequence_cache
+import room_distance_matrix
 
 from geometry_msgs.msg import Point32
 import datetime
@@ -21,38 +28,94 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 	#========================================================================
 
 
+	# Sequencing of the given rooms, returns (room sequencing data, mapping) or None if interrupted
+	# start_position: Point32 in [m] from which the sequence starts, None = current robot position
+	def computeRoomSequence(self, rooms_list, pass_name, start_position=None):
+		map_handler = map_handling_behavior.MapHandlingBehavior("MapHandlingBehavior", self.application_status_)
+		map_handler.setParameters(
+			self.database_handler_,
+			rooms_list,
+			self.room_sequence_cache_,
+			self.room_distance_matrix_,
+			start_position
+		)
+		map_handler.executeBehavior()
+		if (hasattr(map_handler, "mapping_") == False):
+			return None
+		self.printMsg("Room Mapping (" + pass_name + "): " + str(map_handler.mapping_))
+		for checkpoint in map_handler.room_sequencing_data_.checkpoints:
+			self.printMsg("Order: " + str(checkpoint.room_indices))
+		return (map_handler.room_sequencing_data_, map_handler.mapping_)
+
+	# Returns the center (Point32 in [m]) of the last room of a sequence from computeRoomSequence, None if there is none
+	def getSequenceEndPosition(self, room_sequence):
+		if ((room_sequence == None) or (len(room_sequence[1]) == 0)):
+			return None
+		last_room_id = room_sequence[1][len(room_sequence[1]) - 1]
+		return self.database_handler_.database_.getRoom(last_room_id).room_information_in_meter_.room_center
+
+	# Run the dry cleaning of the sequenced rooms
+	def runDryCleaning(self, room_sequence, is_overdue):
+
+		# Document the start of the pass in the progress checkpoint
+		self.database_handler_.startCleaningPass(2 if is_overdue else 0)
+
+		# Run Dry Cleaning Behavior
+		self.dry_cleaner_.setParameters(
+			self.database_handler_,
+			room_sequence[0],
+			room_sequence[1],
+			self.dirt_map_client_,
+			self.dirt_history_store_,
+			self.use_coroutine_behaviors_
+		)
+		self.dry_cleaner_.executeBehavior()
+
+	# Run the wet cleaning of the sequenced rooms
+	def runWetCleaning(self, rooms_wet_cleaning, room_sequence, is_overdue):
+
+		# Document the start of the pass in the progress checkpoint, an interrupted room of this pass is resumed
+		self.database_handler_.startCleaningPass(3 if is_overdue else 1)
+
+		# Run Wet Cleaning Behavior
+		self.wet_cleaner_.setParameters(
+			self.database_handler_,
+			self.database_handler_.getRoomInformationInMeter(rooms_wet_cleaning),
+			room_sequence[0],
+			room_sequence[1],
+			self.robot_frame_id_,
+			self.robot_radius_,
+			self.coverage_radius_,
+			self.field_of_view_,
+			3 if is_overdue else 1
+		)
+		self.wet_cleaner_.executeBehavior()
+
+	# Print that there are no rooms for a pass
+	def printNoRooms(self, is_overdue, cleaning_method):
+		if (is_overdue == False):
+			self.printMsg("There is no due room to be cleaned " + cleaning_method + ".")
+		else:
+			self.printMsg("There is no overdue room to be cleaned " + cleaning_method + ".")
+
+
+
 	# Dry cleaning routine, to be called from inside executeCustomBehavior()
 	def processDryCleaning(self, rooms_dry_cleaning, is_overdue):
 
 		if (rooms_dry_cleaning != []):
 
 			# Get a sequence for all the rooms to be cleaned dry
-			self.map_handler_.setParameters(
-				self.database_handler_,
-				rooms_dry_cleaning
-			)
-			self.map_handler_.executeBehavior()
-			self.printMsg("Room Mapping (Dry): " + str(self.map_handler_.mapping_))
-			for checkpoint in self.map_handler_.room_sequencing_data_.checkpoints:
-				self.printMsg("Order: " + str(checkpoint.room_indices))
+			room_sequence = self.computeRoomSequence(rooms_dry_cleaning, "Dry")
 			
 			# Interruption opportunity
-			if self.handleInterrupt() == 2:
+			if ((self.handleInterrupt() == 2) or (room_sequence == None)):
 				return
 
-			# Run Dry Cleaning Behavior
-			self.dry_cleaner_.setParameters(
-				self.database_handler_,
-				self.map_handler_.room_sequencing_data_,
-				self.map_handler_.mapping_
-			)
-			self.dry_cleaner_.executeBehavior()
+			self.runDryCleaning(room_sequence, is_overdue)
 		
 		else:
-			if (is_overdue == False):
-				self.printMsg("There is no due room to be cleaned dry.")
-			else:
-				self.printMsg("There is no overdue room to be cleaned dry.")
+			self.printNoRooms(is_overdue, "dry")
 
 
 
@@ -62,37 +125,87 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 		if (rooms_wet_cleaning != []):
 
 			# Get a sequence for all the rooms to be cleaned wet
-			self.map_handler_.setParameters(
-				self.database_handler_,
-				rooms_wet_cleaning
-			)
-			self.map_handler_.executeBehavior()
-			self.printMsg("Room Mapping (Wet): " + str(self.map_handler_.mapping_))
-			for checkpoint in self.map_handler_.room_sequencing_data_.checkpoints:
-				self.printMsg("Order: " + str(checkpoint.room_indices))
+			room_sequence = self.computeRoomSequence(rooms_wet_cleaning, "Wet")
 
 			# Interruption opportunity
-			if self.handleInterrupt() == 2:
+			if ((self.handleInterrupt() == 2) or (room_sequence == None)):
 				return
 
-			# Run Wet Cleaning Behavior
-			self.wet_cleaner_.setParameters(
-				self.database_handler_,
-				self.database_handler_.getRoomInformationInMeter(rooms_wet_cleaning),
-				self.map_handler_.room_sequencing_data_,
-				self.map_handler_.mapping_,
-				self.robot_frame_id_,
-				self.robot_radius_,
-				self.coverage_radius_,
-				self.field_of_view_
-			)
-			self.wet_cleaner_.executeBehavior()
+			self.runWetCleaning(rooms_wet_cleaning, room_sequence, is_overdue)
 
 		else:
-			if (is_overdue == False):
-				self.printMsg("There is no due room to be cleaned wet.")
-			else:
-				self.printMsg("There is no overdue room to be cleaned wet.")
+			self.printNoRooms(is_overdue, "wet")
+
+
+
+	# Dry and wet cleaning as behavior graph, to be called from inside executeCustomBehavior()
+	# The wet rooms are sequenced while the robot is cleaning dry, starting from the last room of the dry sequence.
+	# Repeated sequencings are served by the RoomSequenceCache.
+	def processCleaningGraph(self, rooms_dry_cleaning, rooms_wet_cleaning, is_overdue):
+
+		self.behavior_graph_.clearNodes()
+		sequencing_dependencies = []
+		cleaning_dependencies = []
+
+		if (rooms_dry_cleaning != []):
+			self.behavior_graph_.addNode(behavior_graph.BehaviorNode("DrySequencing",
+				lambda inputs: self.computeRoomSequence(rooms_dry_cleaning, "Dry"),
+				resources=["room_sequencing"]))
+			self.behavior_graph_.addNode(behavior_graph.BehaviorNode("DryCleaning",
+				lambda inputs: (self.runDryCleaning(inputs["DrySequencing"], is_overdue) if (inputs["DrySequencing"] != None) else None),
+				dependencies=["DrySequencing"], resources=["robot"]))
+			sequencing_dependencies = ["DrySequencing"]
+			cleaning_dependencies = ["DryCleaning"]
+		else:
+			self.printNoRooms(is_overdue, "dry")
+
+		if (rooms_wet_cleaning != []):
+			self.behavior_graph_.addNode(behavior_graph.BehaviorNode("WetSequencing",
+				lambda inputs: self.computeRoomSequence(rooms_wet_cleaning, "Wet", self.getSequenceEndPosition(inputs.get("DrySequencing"))),
+				dependencies=sequencing_dependencies, resources=["room_sequencing"]))
+			# the wet pass follows the dry pass
+			self.behavior_graph_.addNode(behavior_graph.BehaviorNode("WetCleaning",
+				lambda inputs: (self.runWetCleaning(rooms_wet_cleaning, inputs["WetSequencing"], is_overdue) if (inputs["WetSequencing"] != None) else None),
+				dependencies=["WetSequencing"] + cleaning_dependencies, resources=["robot"]))
+		else:
+			self.printNoRooms(is_overdue, "wet")
+
+		self.behavior_graph_.execute()
+
+
+
+	# Returns the rooms to be cleaned wet, ordered from dirty to clean. The wet cleaning of consistently clean rooms is checked out as skipped.
+	def skipCleanRooms(self, rooms_wet_cleaning):
+		if ((self.dirt_history_store_ == None) or (self.skip_clean_rooms_ == False)):
+			return rooms_wet_cleaning
+		rooms_wet_cleaning, skipped_rooms = self.dirt_history_store_.selectRooms(rooms_wet_cleaning)
+		with self.database_handler_.transaction():
+			for room in skipped_rooms:
+				self.printMsg("Skipping the wet cleaning of the clean room " + str(room.room_name_) + ".")
+				self.database_handler_.checkoutCompletedRoom(room, 1, self.database_handler_.createLogItem(room.room_id_, -1, 1))
+		return rooms_wet_cleaning
+
+	# Dry and wet cleaning of the given rooms
+	def processCleaning(self, rooms_dry_cleaning, rooms_wet_cleaning, is_overdue):
+		rooms_wet_cleaning = self.skipCleanRooms(rooms_wet_cleaning)
+
+		# Plan both passes for the progress tracking
+		self.progress_tracker_.planPass(2 if is_overdue else 0, rooms_dry_cleaning)
+		self.progress_tracker_.planPass(3 if is_overdue else 1, rooms_wet_cleaning)
+
+		if (self.use_behavior_graph_ == True):
+			self.processCleaningGraph(rooms_dry_cleaning, rooms_wet_cleaning, is_overdue)
+			return
+
+		# Dry cleaning
+		self.processDryCleaning(rooms_dry_cleaning, is_overdue)
+
+		# Interruption opportunity
+		if self.handleInterrupt() == 2:
+			return
+
+		# Wet cleaning
+		self.processWetCleaning(rooms_wet_cleaning, is_overdue)
 
 
 
@@ -104,9 +217,9 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 		# Initialize behaviors
 		# ====================
 
-		self.map_handler_ = map_handling_behavior.MapHandlingBehavior("MapHandlingBehavior", self.application_status_)
 		self.dry_cleaner_ = dry_cleaning_behavior.DryCleaningBehavior("DryCleaningBehavior", self.application_status_)
 		self.wet_cleaner_ = wet_cleaning_behavior.WetCleaningBehavior("WetCleaningBehavior", self.application_status_)
+		self.behavior_graph_ = behavior_graph.BehaviorGraph(self.application_status_)
 
 
 
@@ -124,6 +237,31 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 		if rospy.has_param('coverage_radius'):
 			self.coverage_radius_ = rospy.get_param("coverage_radius")
 			self.printMsg("Imported parameter robot_radius = " + str(self.coverage_radius_))
+		# Unified planning: the overdue rooms are cleaned together with the due rooms in one dry and one wet pass
+		self.unified_planning_ = False
+		if rospy.has_param('unified_planning'):
+			self.unified_planning_ = rospy.get_param("unified_planning")
+			self.printMsg("Imported parameter unified_planning = " + str(self.unified_planning_))
+		# Behavior graph: the room sequencing runs in parallel to the cleaning of the previous pass
+		self.use_behavior_graph_ = False
+		if rospy.has_param('use_behavior_graph'):
+			self.use_behavior_graph_ = rospy.get_param("use_behavior_graph")
+			self.printMsg("Imported parameter use_behavior_graph = " + str(self.use_behavior_graph_))
+		# Dirt detection during the dry cleaning
+		self.dirt_map_client_ = None
+		if (rospy.has_param('use_dirt_detection') and (rospy.get_param("use_dirt_detection") == True)):
+			self.dirt_map_client_ = dirt_map_client.DirtMapClient()
+			self.printMsg("Imported parameter use_dirt_detection = True")
+		# Execution mode of the behaviors which are available as coroutines (see coroutine_behavior.py)
+		self.use_coroutine_behaviors_ = False
+		if rospy.has_param('use_coroutine_behaviors'):
+			self.use_coroutine_behaviors_ = rospy.get_param("use_coroutine_behaviors")
+			self.printMsg("Imported parameter use_coroutine_behaviors = " + str(self.use_coroutine_behaviors_))
+		# Skip the wet cleaning of rooms which were consistently clean in the dirt history
+		self.skip_clean_rooms_ = False
+		if rospy.has_param('skip_clean_rooms'):
+			self.skip_clean_rooms_ = rospy.get_param("skip_clean_rooms")
+			self.printMsg("Imported parameter skip_clean_rooms = " + str(self.skip_clean_rooms_))
 		# todo: get field_of_view
 
 		self.field_of_view_ = [Point32(x=0.04035, y=0.136), Point32(x=0.04035, y=-0.364),
@@ -148,10 +286,28 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 		# Initialize database handler
 		#try:
 		self.database_handler_ = database_handler.DatabaseHandler(self.database_)
+		# All database changes are written by one background thread
+		self.database_writer_ = database_writer.DatabaseWriter(self.database_, self.database_handler_.lock_)
+		self.database_writer_.start()
+		self.database_handler_.setDatabaseWriter(self.database_writer_)
+		# Progress and projected finish time for the status publisher
+		self.progress_tracker_ = cleaning_progress_tracker.CleaningProgressTracker()
+		self.database_handler_.setProgressTracker(self.progress_tracker_)
+		self.status_publisher_.setProgressTracker(self.progress_tracker_)
 		#except:
 		#	self.printMsg("Fatal: Initialization of database handler failed!")
 		#	exit(1)
 
+		# Initialize the cache of room sequences, which usually repeat from run to run
+		self.room_sequence_cache_ = room_sequence_cache.RoomSequenceCache(self.database_.extracted_file_path + "resources/cache/room_sequences.pkl")
+		# Initialize the travel distances between the rooms, only recomputed if the map changes
+		self.room_distance_matrix_ = room_distance_matrix.RoomDistanceMatrix(self.database_.extracted_file_path + "resources/cache/room_distances.npz")
+		# Initialize the history of the detected dirt
+		self.dirt_history_store_ = None
+		if (self.dirt_map_client_ != None):
+			self.dirt_history_store_ = dirt_history_store.DirtHistoryStore(self.database_.extracted_file_path + "resources/cache/dirt_history.dat")
+			self.dirt_history_store_.open(self.database_)
+
 
 		shall_continue_old_cleaning = False
 		days_delta = datetime.datetime.now() - self.database_.application_data_.last_execution_date_
@@ -166,6 +322,8 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 				# TODO: Programm needs to pause here. Then the user must be asked if the old cleaning state shall be overwritten.
 		else:
 			self.database_.application_data_.progress_ = [1, datetime.datetime.now()]
+			# A new cleaning does not resume the rooms of an older one
+			self.database_.application_data_.progress_checkpoint_ = None
 		self.database_handler_.applyChangesToDatabase()
 
 
@@ -206,10 +364,18 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 			#	self.printMsg("Fatal: Restoring of the due rooms failed!")
 			#	exit(1)
 
+		# Unified planning: add the overdue rooms, such that each tool is mounted once and each area is visited once per tool
+		rooms_list = self.database_handler_.due_rooms_
+		if (self.unified_planning_ == True):
+			self.printMsg("Collecting overdue rooms...")
+			self.database_handler_.getAllOverdueRooms()
+			rooms_list = self.database_handler_.mergeRoomsLists(self.database_handler_.due_rooms_, self.database_handler_.overdue_rooms_)
+			self.database_.application_data_.last_planning_date_[1] = datetime.datetime.now()
+
 		# Sort the due rooms with respect to cleaning method
 		self.printMsg("Sorting the found rooms after cleaning method...")
 		#try:
-		rooms_dry_cleaning, rooms_wet_cleaning = self.database_handler_.sortRoomsList(self.database_handler_.due_rooms_)
+		rooms_dry_cleaning, rooms_wet_cleaning = self.database_handler_.sortRoomsList(rooms_list)
 		for room in rooms_dry_cleaning:
 			self.printMsg(str(room.room_name_) + " ---> DRY")
 		for room in rooms_wet_cleaning:
@@ -229,20 +395,9 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 
 
 		
-		# Dry cleaning of the due rooms
-		# =============================
-		self.processDryCleaning(rooms_dry_cleaning, False)
-		
-
-		# Interruption opportunity
-		if self.handleInterrupt() == 2:
-			return
-
-
-
-		# Wet cleaning of the due rooms
-		# =============================
-		self.processWetCleaning(rooms_wet_cleaning, False)
+		# Dry and wet cleaning of the due rooms
+		# =====================================
+		self.processCleaning(rooms_dry_cleaning, rooms_wet_cleaning, False)
 		
 		
 		# Interruption opportunity
@@ -251,51 +406,44 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 		
 
 
-		# Find and sort all overdue rooms
-		# ===============================
-
-		# Find overdue rooms
-		self.printMsg("Collecting overdue rooms...")
-		#try:
-		self.database_handler_.getAllOverdueRooms()
-		#except:
-		#	self.printMsg("Fatal: Collecting of the over rooms failed!")
-		#	exit(1)
-
-
-		# Sort the overdue rooms after cleaning method
-		self.printMsg("Sorting the found rooms after cleaning method...")
-		#try:
-		rooms_dry_cleaning, rooms_wet_cleaning = self.database_handler_.sortRoomsList(self.database_handler_.overdue_rooms_)
-		#except:
-		#	self.printMsg("Fatal: Sorting after the cleaning method failed!")
-		#	exit(1)
+		# With unified planning the overdue rooms have been cleaned together with the due rooms
+		if (self.unified_planning_ == False):
 
-		# Document completed due rooms planning in the database
-		self.database_.application_data_.last_planning_date_[1] = datetime.datetime.now()
-		self.database_handler_.applyChangesToDatabase()
-		
+			# Find and sort all overdue rooms
+			# ===============================
 
+			# Find overdue rooms
+			self.printMsg("Collecting overdue rooms...")
+			#try:
+			self.database_handler_.getAllOverdueRooms()
+			#except:
+			#	self.printMsg("Fatal: Collecting of the over rooms failed!")
+			#	exit(1)
 
-		# Dry cleaning of the overdue rooms
-		# =================================
 
-		self.processDryCleaning(rooms_dry_cleaning, True)
+			# Sort the overdue rooms after cleaning method
+			self.printMsg("Sorting the found rooms after cleaning method...")
+			#try:
+			rooms_dry_cleaning, rooms_wet_cleaning = self.database_handler_.sortRoomsList(self.database_handler_.overdue_rooms_)
+			#except:
+			#	self.printMsg("Fatal: Sorting after the cleaning method failed!")
+			#	exit(1)
 
-		# Interruption opportunity
-		if self.handleInterrupt() == 2:
-			return
+			# Document completed due rooms planning in the database
+			self.database_.application_data_.last_planning_date_[1] = datetime.datetime.now()
+			self.database_handler_.applyChangesToDatabase()
 		
 
 
-		# Wet cleaning of the overdue rooms
-		# =================================
+			# Dry and wet cleaning of the overdue rooms
+			# =========================================
 
-		self.processWetCleaning(rooms_wet_cleaning, True)
+			self.processCleaning(rooms_dry_cleaning, rooms_wet_cleaning, True)
 		
-		# Interruption opportunity
-		if self.handleInterrupt() == 2:
-			return
+			# Interruption opportunity
+			if self.handleInterrupt() == 2:
+				return
+
 
 
 		
@@ -337,8 +485,7 @@ class WetCleaningApplication(application_container.ApplicationContainer):
 	# Method for returning to the standard pose of the robot
 	def returnToRobotStandardState(self):
 		# save current data if necessary
-		self.database_.saveRoomDatabase()
-		self.database_.saveGlobalApplicationData()
+		self.database_handler_.flushDatabase()
 		# undo or check whether everything has been undone
 
 
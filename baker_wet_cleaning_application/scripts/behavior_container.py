@@ -48,12 +48,14 @@ class BehaviorContainer:
 		return self.interrupt_var_[0]
 
 	# Method for running an action server, shall only be called from def executeCustomBehavior
-	def runAction(self, action_client, action_goal):
+	# If timeout (in seconds) is not None, the goal is cancelled after that time and None is returned
+	def runAction(self, action_client, action_goal, timeout=None):
 		# action client --> call external functionality but do not wait for finishing
 		self.printMsg("Waiting for action " + str(action_client.action_client.ns) + " to become available...")
 		action_client.wait_for_server()
 		self.printMsg("Sending goal...")
 		action_client.send_goal(action_goal)
+		start_time = time.time()
 		# loop --> ask for action finished and sleep for one second
 		# in loop check for interrupt --> if necessary stop action with self.executionInterrupted() == True and wait until action stopped
 		# Definition of SimpleGoalState: 0 = PENDING, 1 = ACTIVE, 3 = DONE
@@ -64,6 +66,10 @@ class BehaviorContainer:
 				while ((action_client.get_state()<2 or action_client.get_state()==2) and rospy.is_shutdown()==False):
 					pass
 				return self.handleInterrupt()
+			if ((timeout != None) and (time.time() - start_time > timeout)):
+				self.printMsg("Action timed out after " + str(timeout) + " s.")
+				action_client.cancel_goal()
+				return None
 			rospy.sleep(self.sleep_time_)
 		if (action_client.get_state() == 3):
 			self.printMsg("Action successfully processed.")
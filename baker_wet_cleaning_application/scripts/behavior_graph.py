@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+
+import task_runner
+
+
+class BehaviorNode():
+
+	#========================================================================
+	# Description:
+	# Node of a BehaviorGraph. function(inputs) executes the node, where
+	# inputs maps the names of the dependencies to their outputs, and
+	# returns the output of the node (e.g. configures and executes a
+	# BehaviorContainer and returns its result).
+	#========================================================================
+
+	# Constructor
+	# dependencies: names of the nodes whose outputs are needed
+	# resources: names of exclusive resources (e.g. action servers, the robot base), nodes sharing a resource never run at the same time
+	def __init__(self, name, function, dependencies=[], resources=[]):
+		self.name_ = name
+		self.function_ = function
+		self.dependencies_ = list(dependencies)
+		self.resources_ = list(resources)
+
+
+
+class BehaviorGraph():
+
+	#========================================================================
+	# Description:
+	# Executes a graph of BehaviorNodes with data dependencies. Nodes whose
+	# dependencies are finished run in parallel unless they share an
+	# exclusive resource. The application can be paused and cancelled at
+	# node boundaries. The graph keeps no outputs across executions, the
+	# room sequences of repeated passes are reused by the RoomSequenceCache.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, interrupt_var, number_workers=2):
+		# Pointer to the interrupt variable of the application container
+		self.interrupt_var_ = interrupt_var
+		self.number_workers_ = number_workers
+		# name --> BehaviorNode, in the order of addition
+		self.nodes_ = {}
+		self.node_order_ = []
+		# Outputs of the last execution, name --> output
+		self.outputs_ = {}
+		self.sleep_time_ = 1
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[BehaviorGraph]: " + str(text)
+
+	# Add a node, its dependencies have to be added before
+	def addNode(self, node):
+		for dependency in node.dependencies_:
+			if ((dependency in self.nodes_) == False):
+				raise ValueError("Node " + str(node.name_) + " depends on the unknown node " + str(dependency) + ".")
+		self.nodes_[node.name_] = node
+		self.node_order_.append(node.name_)
+		return node
+
+	# Remove all nodes
+	def clearNodes(self):
+		self.nodes_ = {}
+		self.node_order_ = []
+		self.outputs_ = {}
+
+	# Returns the nodes which are needed for the given target nodes
+	def getRequiredNodes(self, targets):
+		required = set()
+		open_nodes = list(targets)
+		while (len(open_nodes) > 0):
+			name = open_nodes.pop()
+			if ((name in required) == False):
+				required.add(name)
+				open_nodes.extend(self.nodes_[name].dependencies_)
+		return [name for name in self.node_order_ if (name in required)]
+
+	# Task of a worker thread: execute the node with the outputs of its dependencies and hand over its output to the scheduler
+	def runNode(self, node, inputs, finished_nodes, condition):
+		output = None
+		exception = None
+		try:
+			self.printMsg("Executing node " + str(node.name_) + "...")
+			output = node.function_(inputs)
+		except Exception, e:
+			exception = e
+		with condition:
+			finished_nodes[node.name_] = (output, exception)
+			condition.notify_all()
+
+	# Execute the given target nodes (default: all nodes) and the nodes they depend on.
+	# Returns False if the execution was cancelled or a node failed, the outputs are available in outputs_.
+	def execute(self, targets=None):
+		if (targets == None):
+			targets = self.node_order_
+		pending = self.getRequiredNodes(targets)
+		self.outputs_ = {}
+		# name --> TaskFuture of the started nodes
+		running = {}
+		# name --> (output, exception) of the nodes finished since the last check
+		finished_nodes = {}
+		busy_resources = set()
+		success = True
+		runner = task_runner.TaskRunner(self.interrupt_var_, self.number_workers_)
+		runner.start()
+		condition = threading.Condition()
+		try:
+			with condition:
+				while (((len(pending) > 0) and (success == True)) or (len(running) > 0)):
+					# Collect the finished nodes
+					for name, (output, exception) in finished_nodes.items():
+						del running[name]
+						busy_resources.difference_update(self.nodes_[name].resources_)
+						if (exception != None):
+							self.printMsg("Node " + str(name) + " failed: %s" % exception)
+							success = False
+						else:
+							self.outputs_[name] = output
+					finished_nodes.clear()
+					# nodes which did not start before the cancellation
+					for name, future in running.items():
+						if (future.cancelled() == True):
+							del running[name]
+							busy_resources.difference_update(self.nodes_[name].resources_)
+					# Pause and cancel at node boundaries: no further nodes are started
+					if ((self.interrupt_var_[0] == 2) or (rospy.is_shutdown() == True)):
+						success = False
+					# Start all nodes whose dependencies are finished and whose resources are free
+					if ((success == True) and (self.interrupt_var_[0] == 0)):
+						for name in list(pending):
+							node = self.nodes_[name]
+							if ((all((dependency in self.outputs_) for dependency in node.dependencies_) == True) and (busy_resources.isdisjoint(node.resources_) == True)):
+								pending.remove(name)
+								busy_resources.update(node.resources_)
+								inputs = dict((dependency, self.outputs_[dependency]) for dependency in node.dependencies_)
+								running[name] = runner.submit(self.runNode, node, inputs, finished_nodes, condition)
+					if (((len(pending) > 0) and (success == True)) or (len(running) > 0)):
+						condition.wait(self.sleep_time_)
+		finally:
+			runner.stop()
+		return success
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+import threading
+import time
+
+
+class CleaningProgressTracker():
+
+	#========================================================================
+	# Description:
+	# Keeps track of the progress of the planned cleaning passes and
+	# projects the finish time. The time per square meter is measured
+	# separately for dry and wet passes from the time between the room
+	# checkouts (i.e. including the travel), the remaining surface area
+	# is updated with each checkout. Listeners are informed on every change.
+	#========================================================================
+
+	# Constructor
+	# default_seconds_per_square_meter: assumed cleaning time [dry, wet] until the first rooms are measured
+	def __init__(self, default_seconds_per_square_meter=[10.0, 40.0], minimum_room_area=1.0):
+		self.default_seconds_per_square_meter_ = default_seconds_per_square_meter
+		# Rooms with unknown surface area are accounted with this area in [m^2]
+		self.minimum_room_area_ = minimum_room_area
+		self.lock_ = threading.Lock()
+		# Functions called after every change
+		self.listeners_ = []
+		self.reset()
+
+	# Forget the plan and the measurements
+	def reset(self):
+		# Planned passes, cleaning pass --> list of the remaining room ids
+		self.remaining_rooms_ = {}
+		# Room id --> accounted surface area in [m^2]
+		self.room_areas_ = {}
+		# Room id --> room name
+		self.room_names_ = {}
+		# Remaining surface area of all planned passes, [dry, wet]
+		self.remaining_area_ = [0., 0.]
+		# Measured cleaning time in [s] and cleaned surface area in [m^2], [dry, wet]
+		self.measured_time_ = [0., 0.]
+		self.measured_area_ = [0., 0.]
+		self.cleaning_pass_ = -1
+		self.current_room_id_ = -1
+		self.rooms_done_ = 0
+		self.cleaned_area_ = 0.
+		# Time of the pass start or of the last checkout
+		self.last_event_time_ = None
+
+	# Register listener(), called after every change of the progress
+	def addListener(self, listener):
+		self.listeners_.append(listener)
+
+	def notifyListeners(self):
+		for listener in self.listeners_:
+			listener()
+
+	# Index into the [dry, wet] lists
+	@staticmethod
+	def getCleaningMethod(cleaning_pass):
+		return cleaning_pass % 2
+
+	# Plan a cleaning pass [0=due dry, 1=due wet, 2=overdue dry, 3=overdue wet] with the given database rooms
+	def planPass(self, cleaning_pass, rooms_list):
+		with self.lock_:
+			self.removePass(cleaning_pass)
+			self.remaining_rooms_[cleaning_pass] = [room.room_id_ for room in rooms_list]
+			for room in rooms_list:
+				self.room_areas_[room.room_id_] = max(room.room_surface_area_, self.minimum_room_area_)
+				self.room_names_[room.room_id_] = room.room_name_
+				self.remaining_area_[self.getCleaningMethod(cleaning_pass)] += self.room_areas_[room.room_id_]
+		self.notifyListeners()
+
+	# Remove the remaining rooms of a pass from the plan, the lock has to be held
+	def removePass(self, cleaning_pass):
+		for room_id in self.remaining_rooms_.pop(cleaning_pass, []):
+			self.remaining_area_[self.getCleaningMethod(cleaning_pass)] -= self.room_areas_[room_id]
+
+	# Start a cleaning pass, the measurement of the first room starts now
+	def startPass(self, cleaning_pass):
+		with self.lock_:
+			# passes before this one are not executed anymore
+			for earlier_pass in [planned_pass for planned_pass in self.remaining_rooms_ if (planned_pass < cleaning_pass)]:
+				self.removePass(earlier_pass)
+			self.cleaning_pass_ = cleaning_pass
+			self.current_room_id_ = -1
+			self.last_event_time_ = time.time()
+		self.notifyListeners()
+
+	# A room of the current pass is in progress
+	def startRoom(self, room_id):
+		with self.lock_:
+			if (room_id == self.current_room_id_):
+				return
+			self.current_room_id_ = room_id
+		self.notifyListeners()
+
+	# Checkout of a room, log_items are the completed subtasks. The room is finished if a subtask of the current pass is completed.
+	def checkoutRoom(self, room_id, log_items):
+		with self.lock_:
+			remaining_rooms = self.remaining_rooms_.get(self.cleaning_pass_, [])
+			cleaning_method = self.getCleaningMethod(self.cleaning_pass_)
+			# subtasks of the dry pass: 0=dry, -1=trashcan, of the wet pass: 1=wet
+			pass_tasks = [0, -1] if (cleaning_method == 0) else [1]
+			if (((room_id in remaining_rooms) == False) or (any((log_item.cleaning_task_ in pass_tasks) for log_item in log_items) == False)):
+				return
+			remaining_rooms.remove(room_id)
+			area = self.room_areas_[room_id]
+			self.remaining_area_[cleaning_method] -= area
+			now = time.time()
+			if (self.last_event_time_ != None):
+				self.measured_time_[cleaning_method] += now - self.last_event_time_
+				self.measured_area_[cleaning_method] += area
+			self.last_event_time_ = now
+			self.rooms_done_ = self.rooms_done_ + 1
+			self.cleaned_area_ = self.cleaned_area_ + area
+			if (self.current_room_id_ == room_id):
+				self.current_room_id_ = -1
+		self.notifyListeners()
+
+	# The application finished all passes
+	def finish(self):
+		with self.lock_:
+			for cleaning_pass in list(self.remaining_rooms_.keys()):
+				self.removePass(cleaning_pass)
+			self.cleaning_pass_ = -1
+			self.current_room_id_ = -1
+		self.notifyListeners()
+
+	# Returns the measured cleaning time per square meter of the cleaning method, the lock has to be held
+	def getSecondsPerSquareMeter(self, cleaning_method):
+		if (self.measured_area_[cleaning_method] > 0.):
+			return self.measured_time_[cleaning_method] / self.measured_area_[cleaning_method]
+		return self.default_seconds_per_square_meter_[cleaning_method]
+
+	# Returns the progress as dictionary with the fields of the ApplicationStatus message
+	def getProgress(self):
+		with self.lock_:
+			rooms_remaining = sum(len(remaining_rooms) for remaining_rooms in self.remaining_rooms_.values())
+			estimated_finish_time = None
+			if (rooms_remaining > 0):
+				remaining_time = sum(max(self.remaining_area_[cleaning_method], 0.) * self.getSecondsPerSquareMeter(cleaning_method) for cleaning_method in [0, 1])
+				# the time spent in the current room is already part of the remaining time
+				if (self.last_event_time_ != None):
+					remaining_time = max(remaining_time - (time.time() - self.last_event_time_), 0.)
+				estimated_finish_time = time.time() + remaining_time
+			return {
+				"cleaning_pass": self.cleaning_pass_,
+				"current_room_id": self.current_room_id_,
+				"current_room_name": self.room_names_.get(self.current_room_id_, ""),
+				"rooms_done": self.rooms_done_,
+				"rooms_remaining": rooms_remaining,
+				"cleaned_area": self.cleaned_area_,
+				"estimated_finish_time": estimated_finish_time
+			}
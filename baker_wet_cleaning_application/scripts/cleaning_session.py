@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+import std_srvs.srv
+import dynamic_reconfigure.client
+import ipa_building_msgs.srv
+
+
+class CleaningSession():
+
+	#========================================================================
+	# Description:
+	# Keeps the brush cleaning module and the coverage monitor active while
+	# one or several rooms are cleaned back to back (i.e. all rooms of one trolley
+	# checkpoint). The recorded trajectory is split per room afterwards by
+	# requesting the coverage image of each room map, hence the session
+	# keeps running on the way between adjacent rooms. It is only paused
+	# for a pause of the application and the trashcan routines. A single
+	# room uses a session of its own.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, map_header_frame_id, robot_frame_id, coverage_radius, field_of_view, map_resolution, map_origin):
+		self.map_header_frame_id_ = map_header_frame_id
+		self.robot_frame_id_ = robot_frame_id
+		self.coverage_radius_ = coverage_radius
+		self.field_of_view_ = field_of_view
+		self.map_resolution_ = map_resolution
+		self.map_origin_ = map_origin
+		self.start_cleaning_service_str_ = '/brush_cleaning_module_interface/start_brush_cleaner'
+		self.stop_cleaning_service_str_ = '/brush_cleaning_module_interface/stop_brush_cleaner'
+		self.coverage_monitor_dynamic_reconfigure_service_str_ = '/room_exploration/coverage_monitor_server'
+		self.stop_coverage_monitoring_service_str_ = "/room_exploration/coverage_monitor_server/stop_coverage_monitoring"
+		self.receive_coverage_image_service_str_ = "/room_exploration/coverage_monitor_server/get_coverage_image"
+		# Service proxies and dynamic reconfigure client, created once per session
+		self.service_proxies_ = {}
+		self.reconfigure_client_ = None
+		# Room maps of the rooms cleaned in this session, room_id --> room map
+		self.room_maps_ = {}
+		# Coverage images of the rooms after the session was stopped, room_id --> CheckCoverage response
+		self.coverage_responses_ = {}
+		# True while the brush and the coverage monitoring are running
+		self.active_ = False
+		# start, pause and stop may be called from the task runner while the robot is driving
+		self.lock_ = threading.Lock()
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[CleaningSession]: " + str(text)
+
+	# Returns the cached service proxy of the given service, waits for the service on first use
+	def getServiceProxy(self, service_str, service_type):
+		if ((service_str in self.service_proxies_) == False):
+			rospy.wait_for_service(service_str)
+			self.service_proxies_[service_str] = rospy.ServiceProxy(service_str, service_type)
+		return self.service_proxies_[service_str]
+
+	# Calls a std_srvs/Trigger service
+	def callTrigger(self, service_str):
+		try:
+			resp = self.getServiceProxy(service_str, std_srvs.srv.Trigger)()
+			self.printMsg("Service " + service_str + " returned with success status " + str(resp.success))
+		except rospy.ServiceException, e:
+			self.printMsg("Service call to " + service_str + " failed: %s" % e)
+
+	# Returns True if the brush and the coverage monitoring are running
+	def isActive(self):
+		return self.active_
+
+	# Turn on the cleaning device and start recording the cleaned path, does nothing if the session is already active.
+	# Also resumes a paused session.
+	def start(self):
+		with self.lock_:
+			if (self.active_ == True):
+				return
+			# baker_brush_cleaning_module_interface: turn on the cleaning device (service "start_brush_cleaner")
+			self.callTrigger(self.start_cleaning_service_str_)
+			# coverage_monitor_server: set the robot configuration with dynamic reconfigure and turn on logging of the cleaned path
+			try:
+				self.printMsg("Calling dynamic reconfigure at the coverage_monitor_server to start coverage monitoring.")
+				if (self.reconfigure_client_ == None):
+					self.reconfigure_client_ = dynamic_reconfigure.client.Client(self.coverage_monitor_dynamic_reconfigure_service_str_, timeout=5)
+				self.reconfigure_client_.update_configuration({"map_frame":self.map_header_frame_id_, "robot_frame":self.robot_frame_id_,
+											"coverage_radius":self.coverage_radius_,
+											"coverage_circle_offset_transform_x":0.5*(self.field_of_view_[0].x+self.field_of_view_[2].x),
+											"coverage_circle_offset_transform_y":0.5*(self.field_of_view_[0].y+self.field_of_view_[1].y),
+											"coverage_circle_offset_transform_z":0.0,
+											"robot_trajectory_recording_active":True})
+			except rospy.ServiceException, e:
+				self.printMsg("Dynamic reconfigure request to " + self.coverage_monitor_dynamic_reconfigure_service_str_ + " failed: %s" % e)
+			self.active_ = True
+
+	# Turn off the cleaning device and the recording without finishing the session, e.g. during a pause or a trashcan routine.
+	# start() resumes the session.
+	def pause(self):
+		with self.lock_:
+			if (self.active_ == False):
+				return
+			# coverage_monitor_server.cpp: turn off logging of the cleaned path (service "stop_coverage_monitoring")
+			self.callTrigger(self.stop_coverage_monitoring_service_str_)
+			# baker_brush_cleaning_module_interface: turn off the cleaning device (service "stop_brush_cleaner")
+			self.callTrigger(self.stop_cleaning_service_str_)
+			self.active_ = False
+
+	# Register a room which is cleaned within this session
+	def addRoom(self, room_id, room_map_data):
+		self.room_maps_[room_id] = room_map_data
+
+	# Request the coverage image of a room map from the recorded trajectory
+	def receiveCoverageImage(self, room_map_data):
+		try:
+			req = self.getServiceProxy(self.receive_coverage_image_service_str_, ipa_building_msgs.srv.CheckCoverage)
+			return req(input_map=room_map_data, map_resolution=self.map_resolution_, map_origin=self.map_origin_,
+					   field_of_view=self.field_of_view_, coverage_radius=self.coverage_radius_,
+					   check_for_footprint=False, check_number_of_coverages=False)
+		except rospy.ServiceException, e:
+			self.printMsg("Service call to " + self.receive_coverage_image_service_str_ + " failed: %s" % e)
+			return None
+
+	# Stop recording and turn off the cleaning device, then split the recorded trajectory per room
+	def stop(self):
+		self.pause()
+		for room_id, room_map_data in self.room_maps_.items():
+			self.coverage_responses_[room_id] = self.receiveCoverageImage(room_map_data)
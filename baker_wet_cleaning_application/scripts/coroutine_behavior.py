@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import rospy
+from actionlib_msgs.msg import GoalStatus
+from abc import ABCMeta, abstractmethod
+
+import behavior_container
+import coroutine_runtime
+
+
+class CoroutineBehavior(behavior_container.BehaviorContainer):
+
+	#========================================================================
+	# Description:
+	# Behavior which is implemented as coroutine (see coroutine_runtime.py)
+	# instead of blocking calls. executeBehavior runs the coroutine on its
+	# own EventLoop, hence the behavior can be used like any other
+	# behavior. An interruption of the application cancels the coroutine
+	# immediately instead of being polled.
+	#========================================================================
+
+	__metaclass__ = ABCMeta
+
+	# Implement the behavior as coroutine here, e.g.
+	#     result = yield self.runActionAsync(loop, client, goal)
+	@abstractmethod
+	def executeCustomBehaviorAsync(self, loop):
+		pass
+
+	# Coroutine for running an action. Returns the result or None if the action failed or timed out.
+	# Raises CancelledError if the behavior is interrupted, the goal is cancelled then.
+	def runActionAsync(self, loop, action_client, action_goal, timeout=None):
+		self.printMsg("Sending goal to action " + str(action_client.action_client.ns) + "...")
+		action_future = coroutine_runtime.runAction(loop, action_client, action_goal)
+		if (timeout != None):
+			action_future = coroutine_runtime.withTimeout(loop, action_future, timeout)
+		try:
+			(goal_status, action_result) = yield action_future
+		except coroutine_runtime.TimeoutError:
+			self.printMsg("Action timed out after " + str(timeout) + " s.")
+			raise coroutine_runtime.Return(None)
+		if (goal_status == GoalStatus.SUCCEEDED):
+			self.printMsg("Action successfully processed.")
+			raise coroutine_runtime.Return(action_result)
+		self.printMsg("Action failed.")
+		raise coroutine_runtime.Return(None)
+
+	# Cancel the behavior's task if the application was interrupted, called on the loop's thread
+	def onInterrupt(self, task):
+		if (self.executionInterrupted() == True):
+			task.cancel()
+
+	# Run the coroutine of the behavior until it is finished or interrupted
+	def executeCustomBehavior(self):
+		loop = coroutine_runtime.EventLoop()
+		task = loop.createTask(self.executeCustomBehaviorAsync(loop))
+		interrupt_listener = lambda: loop.callSoonThreadsafe(self.onInterrupt, task)
+		coroutine_runtime.addInterruptListener(self.interrupt_var_, interrupt_listener)
+		# an interruption before the start is handled like one during the execution
+		loop.callSoon(self.onInterrupt, task)
+		try:
+			return loop.runUntilComplete(task)
+		except coroutine_runtime.CancelledError:
+			self.handleInterrupt()
+			return None
+		finally:
+			coroutine_runtime.removeInterruptListener(self.interrupt_var_, interrupt_listener)
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+
+#========================================================================
+# Description:
+# Single threaded runtime for behaviors written as coroutines.
+# A coroutine is a generator which yields Futures and continues with
+# their results, e.g.
+#     result = yield coroutine_runtime.runAction(loop, client, goal)
+#     raise coroutine_runtime.Return(result)
+# Action goals and service calls are bridged from their callbacks into
+# Futures, cancelling a Task raises CancelledError at its current yield
+# and cancels the action goal it is waiting for.
+# (Python 2 has no asyncio, hence the generator based implementation.)
+#========================================================================
+
+import rospy
+import actionlib
+from actionlib_msgs.msg import GoalStatus
+import threading
+import heapq
+import time
+import Queue
+import types
+
+
+# Raised inside a coroutine whose Task was cancelled
+class CancelledError(Exception):
+	pass
+
+
+
+# Set by withTimeout if the operation did not finish in time
+class TimeoutError(Exception):
+	pass
+
+
+
+# Raise Return(value) to return a value from a coroutine
+class Return(Exception):
+	def __init__(self, value=None):
+		Exception.__init__(self)
+		self.value = value
+
+
+
+class Future():
+
+	#========================================================================
+	# Description:
+	# Result of an asynchronous operation. Must only be resolved from the
+	# thread of its EventLoop (use EventLoop.callSoonThreadsafe).
+	#========================================================================
+
+	# Constructor
+	def __init__(self, loop):
+		self.loop_ = loop
+		# State of the future: 0=pending, 1=finished, 2=cancelled
+		self.state_ = 0
+		self.result_ = None
+		self.exception_ = None
+		self.callbacks_ = []
+		# Function called on cancellation of a pending future (e.g. to cancel an action goal)
+		self.cancel_callback_ = None
+
+	def done(self):
+		return (self.state_ != 0)
+
+	def cancelled(self):
+		return (self.state_ == 2)
+
+	# Returns the result, raises the exception of the operation or CancelledError
+	def result(self):
+		if (self.state_ == 2):
+			raise CancelledError()
+		if (self.exception_ != None):
+			raise self.exception_
+		return self.result_
+
+	def exception(self):
+		return self.exception_
+
+	# Register callback(future), called by the loop when the future is done
+	def addDoneCallback(self, callback):
+		if (self.done() == True):
+			self.loop_.callSoon(callback, self)
+		else:
+			self.callbacks_.append(callback)
+
+	def setResult(self, result):
+		if (self.done() == True):
+			return
+		self.result_ = result
+		self.state_ = 1
+		self.scheduleCallbacks()
+
+	def setException(self, exception):
+		if (self.done() == True):
+			return
+		self.exception_ = exception
+		self.state_ = 1
+		self.scheduleCallbacks()
+
+	# Cancel the operation, returns False if it is already done
+	def cancel(self):
+		if (self.done() == True):
+			return False
+		self.state_ = 2
+		if (self.cancel_callback_ != None):
+			self.cancel_callback_()
+		self.scheduleCallbacks()
+		return True
+
+	def scheduleCallbacks(self):
+		callbacks = self.callbacks_
+		self.callbacks_ = []
+		for callback in callbacks:
+			self.loop_.callSoon(callback, self)
+
+
+
+class Task(Future):
+
+	#========================================================================
+	# Description:
+	# Runs a coroutine (generator) on the EventLoop. The Task is a Future
+	# of the coroutine's return value.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, loop, coroutine):
+		Future.__init__(self, loop)
+		self.coroutine_ = coroutine
+		# Future the coroutine is currently waiting for
+		self.waiting_for_ = None
+		self.cancel_requested_ = False
+		self.loop_.callSoon(self.step)
+
+	# Cancel the coroutine: CancelledError is raised at its current yield, the coroutine may handle it
+	def cancel(self):
+		if (self.done() == True):
+			return False
+		self.cancel_requested_ = True
+		if (self.waiting_for_ != None):
+			self.waiting_for_.cancel()
+		return True
+
+	# Continue the coroutine with the result of the future it waited for
+	def step(self, future=None):
+		if (self.done() == True):
+			return
+		self.waiting_for_ = None
+		try:
+			if (self.cancel_requested_ == True):
+				self.cancel_requested_ = False
+				yielded = self.coroutine_.throw(CancelledError())
+			elif (future == None):
+				yielded = self.coroutine_.send(None)
+			elif (future.cancelled() == True):
+				yielded = self.coroutine_.throw(CancelledError())
+			elif (future.exception() != None):
+				yielded = self.coroutine_.throw(future.exception())
+			else:
+				yielded = self.coroutine_.send(future.result())
+		except StopIteration:
+			self.setResult(None)
+			return
+		except Return, e:
+			self.setResult(e.value)
+			return
+		except CancelledError:
+			Future.cancel(self)
+			return
+		except Exception, e:
+			self.setException(e)
+			return
+		# coroutines may yield other coroutines directly
+		if (isinstance(yielded, types.GeneratorType) == True):
+			yielded = Task(self.loop_, yielded)
+		if (isinstance(yielded, Future) == False):
+			error_future = Future(self.loop_)
+			error_future.setException(TypeError("Coroutines must yield Futures, got " + str(yielded)))
+			yielded = error_future
+		self.waiting_for_ = yielded
+		yielded.addDoneCallback(self.step)
+
+
+
+class EventLoop():
+
+	#========================================================================
+	# Description:
+	# Processes callbacks and timers on the thread which calls
+	# runUntilComplete. Other threads (e.g. actionlib and rospy callbacks)
+	# hand over their results with callSoonThreadsafe, the loop sleeps
+	# until a callback arrives or a timer expires.
+	#========================================================================
+
+	# Constructor
+	def __init__(self):
+		# Callbacks (function, args) which are ready to run
+		self.ready_ = Queue.Queue()
+		# Heap of timers (time, counter, function, args)
+		self.timers_ = []
+		self.timer_counter_ = 0
+
+	def callSoon(self, function, *args):
+		self.ready_.put((function, args))
+
+	# Thread safe variant of callSoon for callbacks of other threads
+	def callSoonThreadsafe(self, function, *args):
+		self.ready_.put((function, args))
+
+	def callLater(self, delay, function, *args):
+		self.timer_counter_ = self.timer_counter_ + 1
+		heapq.heappush(self.timers_, (time.time() + delay, self.timer_counter_, function, args))
+
+	# Start a coroutine as Task
+	def createTask(self, coroutine):
+		return Task(self, coroutine)
+
+	# Run the loop until the future (or coroutine) is done, returns its result
+	def runUntilComplete(self, future):
+		if (isinstance(future, types.GeneratorType) == True):
+			future = self.createTask(future)
+		while ((future.done() == False) and (rospy.is_shutdown() == False)):
+			timeout = 1.0
+			if (len(self.timers_) > 0):
+				timeout = min(max(self.timers_[0][0] - time.time(), 0.), timeout)
+			try:
+				(function, args) = self.ready_.get(timeout=timeout)
+				function(*args)
+			except Queue.Empty:
+				pass
+			while ((len(self.timers_) > 0) and (self.timers_[0][0] <= time.time())):
+				(timer_time, counter, function, args) = heapq.heappop(self.timers_)
+				function(*args)
+		if (future.done() == False):
+			future.cancel()
+			raise CancelledError()
+		return future.result()
+
+
+
+# Returns a Future which is finished after delay seconds
+def sleep(loop, delay, result=None):
+	future = Future(loop)
+	loop.callLater(delay, future.setResult, result)
+	return future
+
+
+
+# Returns a Future of the list of results of all futures (or coroutines), cancelling it cancels all of them
+def gather(loop, *futures):
+	futures = [(loop.createTask(future) if (isinstance(future, types.GeneratorType) == True) else future) for future in futures]
+	gathered_future = Future(loop)
+	def cancelAll():
+		for future in futures:
+			future.cancel()
+	gathered_future.cancel_callback_ = cancelAll
+	def onDone(done_future):
+		if (gathered_future.done() == True):
+			return
+		if (done_future.cancelled() == True):
+			gathered_future.cancel()
+		elif (done_future.exception() != None):
+			gathered_future.setException(done_future.exception())
+		elif (all(future.done() for future in futures) == True):
+			gathered_future.setResult([future.result() for future in futures])
+	if (len(futures) == 0):
+		gathered_future.setResult([])
+	for future in futures:
+		future.addDoneCallback(onDone)
+	return gathered_future
+
+
+
+# Returns a Future of the list of the done futures, finished as soon as one of the futures is done or after timeout seconds
+# (empty list). The futures are not cancelled.
+def waitFirst(loop, futures, timeout=None):
+	waited_future = Future(loop)
+	def onDone(done_future=None):
+		if (waited_future.done() == False):
+			waited_future.setResult([future for future in futures if (future.done() == True)])
+	if (timeout != None):
+		loop.callLater(timeout, onDone)
+	for future in futures:
+		future.addDoneCallback(onDone)
+	return waited_future
+
+
+
+# Returns a Future of the result of future (or coroutine), which fails with TimeoutError and cancels the operation after timeout seconds
+def withTimeout(loop, future, timeout):
+	if (isinstance(future, types.GeneratorType) == True):
+		future = loop.createTask(future)
+	timed_future = Future(loop)
+	timed_future.cancel_callback_ = future.cancel
+	def onTimeout():
+		if (timed_future.done() == False):
+			timed_future.setException(TimeoutError("Operation timed out after " + str(timeout) + " s."))
+			future.cancel()
+	def onDone(done_future):
+		if (timed_future.done() == True):
+			return
+		if (done_future.cancelled() == True):
+			timed_future.cancel()
+		elif (done_future.exception() != None):
+			timed_future.setException(done_future.exception())
+		else:
+			timed_future.setResult(done_future.result())
+	loop.callLater(timeout, onTimeout)
+	future.addDoneCallback(onDone)
+	return timed_future
+
+
+
+# Sends the goal to the action server, returns a Future of (terminal GoalStatus, result).
+# Cancelling the Future cancels the goal.
+def runAction(loop, action_client, action_goal):
+	future = Future(loop)
+	def onDone(goal_status, action_result):
+		loop.callSoonThreadsafe(future.setResult, (goal_status, action_result))
+	def sendGoal():
+		try:
+			if (action_client.wait_for_server(rospy.Duration(5.0)) == False):
+				raise rospy.ROSException("Action server " + str(action_client.action_client.ns) + " is not available.")
+			if (future.done() == False):
+				action_client.send_goal(action_goal, done_cb=onDone)
+		except Exception, e:
+			loop.callSoonThreadsafe(future.setException, e)
+	future.cancel_callback_ = action_client.cancel_goal
+	# waiting for the server must not block the loop
+	threading.Thread(target = sendGoal).start()
+	return future
+
+
+
+# Runs a blocking function in a background thread, returns a Future of its return value.
+# Cancelling the Future does not stop the function.
+def runInThread(loop, function, *args, **kwargs):
+	future = Future(loop)
+	def call():
+		try:
+			result = function(*args, **kwargs)
+			loop.callSoonThreadsafe(future.setResult, result)
+		except Exception, e:
+			loop.callSoonThreadsafe(future.setException, e)
+	thread = threading.Thread(target = call)
+	thread.daemon = True
+	thread.start()
+	return future
+
+
+
+# Calls a rospy service in a background thread, returns a Future of the response
+def callService(loop, service_proxy, *args, **kwargs):
+	return runInThread(loop, service_proxy, *args, **kwargs)
+
+
+
+# Interrupt listeners of the application status variables, id(interrupt_var) --> list of functions
+interrupt_listeners_ = {}
+interrupt_listeners_lock_ = threading.Lock()
+
+# Register listener() to be called from the thread which changes interrupt_var (see notifyInterrupt)
+def addInterruptListener(interrupt_var, listener):
+	with interrupt_listeners_lock_:
+		interrupt_listeners_.setdefault(id(interrupt_var), []).append(listener)
+
+def removeInterruptListener(interrupt_var, listener):
+	with interrupt_listeners_lock_:
+		listeners = interrupt_listeners_.get(id(interrupt_var), [])
+		if (listener in listeners):
+			listeners.remove(listener)
+
+# Inform all listeners that interrupt_var has changed
+def notifyInterrupt(interrupt_var):
+	with interrupt_listeners_lock_:
+		listeners = list(interrupt_listeners_.get(id(interrupt_var), []))
+	for listener in listeners:
+		listener()
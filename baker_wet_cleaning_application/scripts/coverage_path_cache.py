@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# For hashing
+import hashlib
+# For the path storage
+import numpy as np
+import os
+
+import map_utilities
+import path_utilities
+
+
+class CoveragePathCache():
+
+	#========================================================================
+	# Description:
+	# Disk-backed cache of the coverage paths computed by the room
+	# exploration server. A path is identified by a hash of all inputs of
+	# the RoomExplorationGoal and stored as float32 array [x, y, yaw].
+	#========================================================================
+
+	# Constructor
+	def __init__(self, cache_directory, starting_position_grid=0.5):
+		self.cache_directory_ = cache_directory
+		# Grid size in [m] to which the starting positions are rounded
+		self.starting_position_grid_ = starting_position_grid
+		if (os.path.isdir(self.cache_directory_) == False):
+			os.makedirs(self.cache_directory_)
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[CoveragePathCache]: " + str(text)
+
+	# Compute the key of a path from the parameters of RoomExplorationBehavior.setParameters
+	def computeKey(self, input_map, map_resolution, map_origin, robot_radius, coverage_radius, field_of_view, starting_position, planning_mode):
+		key_hash = hashlib.sha1()
+		key_hash.update(map_utilities.hashImage(input_map))
+		key_hash.update("res%.6f" % map_resolution)
+		key_hash.update("origin%.4f_%.4f_%.4f_%.4f_%.4f_%.4f_%.4f" % (map_origin.position.x, map_origin.position.y, map_origin.position.z,
+			map_origin.orientation.x, map_origin.orientation.y, map_origin.orientation.z, map_origin.orientation.w))
+		key_hash.update("robot%.4f_coverage%.4f" % (robot_radius, coverage_radius))
+		for point in field_of_view:
+			key_hash.update("fov%.4f_%.4f" % (point.x, point.y))
+		key_hash.update("start%d_%d" % (int(round(starting_position.x/self.starting_position_grid_)), int(round(starting_position.y/self.starting_position_grid_))))
+		key_hash.update("mode%d" % planning_mode)
+		return key_hash.hexdigest()
+
+	# Returns the file name of the cached path with the given key
+	def getFilename(self, key):
+		return os.path.join(self.cache_directory_, str(key) + ".npz")
+
+	# Returns True if a path with the given key is cached
+	def containsPath(self, key):
+		return os.path.isfile(self.getFilename(key))
+
+	# Returns the cached path as list of PoseStamped or None if there is no such path
+	def loadPath(self, key):
+		if (self.containsPath(key) == False):
+			return None
+		try:
+			cache_file = np.load(self.getFilename(key))
+			poses = cache_file["poses"]
+			frame_id = str(cache_file["frame_id"])
+		except (IOError, ValueError, KeyError), e:
+			self.printMsg("Could not read cached path " + str(key) + ": %s" % e)
+			return None
+		return path_utilities.arrayToPath(poses, frame_id)
+
+	# Store the path (list of PoseStamped) under the given key
+	def savePath(self, key, path):
+		poses = path_utilities.pathToArray(path, np.float32)
+		frame_id = ""
+		if (len(path) > 0):
+			frame_id = path[0].header.frame_id
+		# Write into a temporal file first such that an interrupted write cannot leave a damaged cache entry
+		tmp_filename = os.path.join(self.cache_directory_, "_tmp_" + str(key) + ".npz")
+		np.savez(tmp_filename, poses=poses, frame_id=np.array(frame_id))
+		os.rename(tmp_filename, self.getFilename(key))
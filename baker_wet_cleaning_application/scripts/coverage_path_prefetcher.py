@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+import Queue
+
+
+class CoveragePathPrefetcher():
+
+	#========================================================================
+	# Description:
+	# Computes the coverage paths of upcoming rooms in a background thread
+	# while the robot is cleaning the current room.
+	# The room exploration server can only process one goal at a time,
+	# hence all path requests (also the one of the current room) have to be
+	# passed through this class and are processed by one single worker.
+	# Paths whose computation is interrupted are not stored, they are
+	# computed again on the next request after the interruption.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, interrupt_var, lookahead=1):
+		# Pointer to the interrupt variable of the application container
+		self.interrupt_var_ = interrupt_var
+		# Maximum number of computed or scheduled paths which have not been collected yet
+		self.lookahead_ = lookahead
+		# Queue of (key, RoomExplorationBehavior) jobs, None stops the worker
+		self.jobs_ = Queue.Queue()
+		# Keys of the scheduled jobs which have no result yet
+		self.pending_keys_ = set()
+		# Results of the finished jobs, key --> exploration result
+		self.results_ = {}
+		self.condition_ = threading.Condition()
+		self.worker_thread_ = None
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[CoveragePathPrefetcher]: " + str(text)
+
+	# Start the worker thread
+	def start(self):
+		if (self.worker_thread_ == None):
+			self.worker_thread_ = threading.Thread(target = self.processJobs)
+			self.worker_thread_.daemon = True
+			self.worker_thread_.start()
+
+	# Stop the worker thread after the currently running job and forget all results
+	def stop(self):
+		if (self.worker_thread_ != None):
+			self.jobs_.put(None)
+			self.worker_thread_ = None
+		with self.condition_:
+			self.results_ = {}
+
+	# Enqueue a job without checking the lookahead
+	def enqueue(self, key, room_explorer):
+		with self.condition_:
+			if ((key in self.pending_keys_) or (key in self.results_)):
+				return False
+			self.pending_keys_.add(key)
+		self.jobs_.put((key, room_explorer))
+		return True
+
+	# Request the coverage path of an upcoming room if the lookahead is not exhausted yet.
+	# room_explorer must be a RoomExplorationBehavior with already set parameters.
+	def prefetch(self, key, room_explorer):
+		with self.condition_:
+			if (len(self.pending_keys_) + len(self.results_) >= self.lookahead_):
+				return False
+		return self.enqueue(key, room_explorer)
+
+	# Returns the exploration result of the room with the given key (None if no path could be computed).
+	# Computes the path with the provided room_explorer if it was not prefetched.
+	# During a pause the call waits and computes the path again afterwards, None is also returned if the
+	# application is cancelled or shut down, which the caller has to check.
+	def getResult(self, key, room_explorer):
+		self.enqueue(key, room_explorer)
+		with self.condition_:
+			while ((key in self.results_) == False):
+				# the application was cancelled (2) or is stopped (3)
+				if ((rospy.is_shutdown() == True) or (self.interrupt_var_[0] > 1)):
+					return None
+				# the job was dropped because of an interruption
+				if (((key in self.pending_keys_) == False) and (self.interrupt_var_[0] == 0)):
+					self.enqueue(key, room_explorer)
+				self.condition_.wait(1.0)
+			return self.results_.pop(key)
+
+	# Worker loop
+	def processJobs(self):
+		while (True):
+			job = self.jobs_.get()
+			if (job == None):
+				break
+			(key, room_explorer) = job
+			exploration_result = None
+			interrupted = (self.interrupt_var_[0] != 0)
+			if (interrupted == False):
+				self.printMsg("Computing coverage path for key " + str(key) + " in the background.")
+				try:
+					room_explorer.executeCustomBehavior()
+					exploration_result = room_explorer.exploration_result_
+					interrupted = room_explorer.interrupted_
+				except Exception, e:
+					self.printMsg("Coverage path computation failed: %s" % e)
+			# results obtained during an interruption are incomplete, the job is dropped and requested again later
+			interrupted = (interrupted or (self.interrupt_var_[0] != 0))
+			with self.condition_:
+				self.pending_keys_.discard(key)
+				if (interrupted == False):
+					self.results_[key] = exploration_result
+				self.condition_.notify_all()
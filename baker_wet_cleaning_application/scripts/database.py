@@ -49,6 +49,7 @@ class Database():
 	global_map_data_filename_ = ""
 	global_map_image_filename_ = ""
 	global_map_segmented_image_filename_ = ""
+	room_connectivity_filename_ = ""
 
 
 # =========================================================================================
@@ -104,6 +105,18 @@ class Database():
 			self.application_data_.progress_[1] = self.stringToDatetime(progress_str[1])
 		else:
 			self.application_data_.progress_[1] = None
+		# Get the progress checkpoint, which is missing in older databases
+		progress_checkpoint_dict = dict.get("progress_checkpoint")
+		if (progress_checkpoint_dict != None):
+			progress_checkpoint = database_classes.ProgressCheckpoint()
+			progress_checkpoint.cleaning_pass_ = progress_checkpoint_dict.get("cleaning_pass")
+			progress_checkpoint.checkpoint_index_ = progress_checkpoint_dict.get("checkpoint_index")
+			progress_checkpoint.room_id_ = progress_checkpoint_dict.get("room_id")
+			progress_checkpoint.path_key_ = progress_checkpoint_dict.get("path_key")
+			progress_checkpoint.last_reached_pose_index_ = progress_checkpoint_dict.get("last_reached_pose_index")
+			self.application_data_.progress_checkpoint_ = progress_checkpoint
+		else:
+			self.application_data_.progress_checkpoint_ = None
 
 
 
@@ -130,6 +143,18 @@ class Database():
 			application_data_dict["progress"] = [self.application_data_.progress_[0], self.datetimeToString(self.application_data_.progress_[1])]
 		else:
 			application_data_dict["progress"] = [self.application_data_.progress_[0], None]
+
+		progress_checkpoint = self.application_data_.progress_checkpoint_
+		if (progress_checkpoint != None):
+			application_data_dict["progress_checkpoint"] = {
+				"cleaning_pass": progress_checkpoint.cleaning_pass_,
+				"checkpoint_index": progress_checkpoint.checkpoint_index_,
+				"room_id": progress_checkpoint.room_id_,
+				"path_key": progress_checkpoint.path_key_,
+				"last_reached_pose_index": progress_checkpoint.last_reached_pose_index_
+			}
+		else:
+			application_data_dict["progress_checkpoint"] = None
 		
 		return application_data_dict
 	
@@ -285,6 +310,20 @@ class Database():
 
 
 
+	# Set the entry poses and neighbors of the rooms stated in the dict parameter (see room_connectivity_tool.py)
+	def updateRoomConnectivity(self, dict):
+		rooms_dict = dict.get("rooms")
+		for room in self.rooms_:
+			room_dict = rooms_dict.get(str(room.room_id_))
+			if (room_dict != None):
+				room.room_entry_poses_ = room_dict.get("entry_poses")
+				room.room_neighbors_ = room_dict.get("neighbors")
+			else:
+				room.room_entry_poses_ = []
+				room.room_neighbors_ = []
+
+
+
 	# Get a dictionary representation of rooms_
 	def getRoomsDictFromRoomsList(self):
 		room_dict = {}
@@ -389,6 +428,11 @@ class Database():
 		file = open(self.global_map_data_filename_, "r").read()
 		global_map_data_dict = json.loads(file)
 		self.updateGlobalMapData(global_map_data_dict)
+		# Load the room connectivity, which is optional
+		if (os.path.isfile(self.room_connectivity_filename_) == True):
+			file = open(self.room_connectivity_filename_, "r").read()
+			room_connectivity_dict = json.loads(file)
+			self.updateRoomConnectivity(room_connectivity_dict)
 
 
 	# Check the integrity of the specified file, return True on intact files
@@ -439,6 +483,7 @@ class Database():
 		for log_key in dict:
 			log_item = database_classes.LogItem()
 			log_item.cleaned_surface_area_ = dict.get(log_key).get("cleaned_surface_area")
+			log_item.coverage_percentage_ = dict.get(log_key).get("coverage_percentage", 0)
 			log_item.cleaning_task_ = dict.get(log_key).get("cleaning_task")
 			log_item.date_and_time_ = self.stringToDatetime(dict.get(log_key).get("date_and_time"))
 			log_item.found_dirtspots_ = dict.get(log_key).get("found_dirtspots")
@@ -457,8 +502,15 @@ class Database():
 		log_dict = {}
 		for log_item in log_item_list:
 			date_and_time = self.datetimeToString(log_item.date_and_time_)
-			log_dict[str(date_and_time)] = {
+			# Entries of the same minute get a running number, otherwise they would replace each other
+			log_key = str(date_and_time)
+			entry_number = 1
+			while (log_key in log_dict):
+				log_key = str(date_and_time) + "_" + str(entry_number)
+				entry_number = entry_number + 1
+			log_dict[log_key] = {
 				"cleaned_surface_area": log_item.cleaned_surface_area_,
+				"coverage_percentage": log_item.coverage_percentage_,
 				"cleaning_task": log_item.cleaning_task_,
 				"date_and_time": date_and_time,
 				"found_dirtspots": log_item.found_dirtspots_,
@@ -474,9 +526,11 @@ class Database():
 
 
 	# Save the room data
-	def saveRoomDatabase(self, temporal=True):
-		rooms_dict = self.getRoomsDictFromRoomsList()
-		rooms_text = json.dumps(rooms_dict, indent=4, sort_keys=True)
+	def saveRoomDatabase(self, temporal=True, rooms_text=None):
+		# rooms_text: already serialized room data (see serializeCompleteDatabase)
+		if (rooms_text == None):
+			rooms_dict = self.getRoomsDictFromRoomsList()
+			rooms_text = json.dumps(rooms_dict, indent=4, sort_keys=True)
 		if (temporal == True):
 			file = open(self.rooms_filename_, "w")
 		else:
@@ -487,9 +541,11 @@ class Database():
 
 
 	# Save the application data
-	def saveGlobalApplicationData(self, temporal=True):
-		application_data_dict = self.getGlobalApplicationDataDictFromGlobalApplicationData()
-		application_data_text = json.dumps(application_data_dict, indent=4, sort_keys=True)
+	def saveGlobalApplicationData(self, temporal=True, application_data_text=None):
+		# application_data_text: already serialized application data (see serializeCompleteDatabase)
+		if (application_data_text == None):
+			application_data_dict = self.getGlobalApplicationDataDictFromGlobalApplicationData()
+			application_data_text = json.dumps(application_data_dict, indent=4, sort_keys=True)
 		if (temporal == True):
 			file = open(self.tmp_application_data_filename_, "w")
 		else:
@@ -513,6 +569,7 @@ class Database():
 		self.global_map_data_filename_ = self.extracted_file_path + str("resources/json/global_map_data.json")
 		self.global_map_image_filename_ = self.extracted_file_path + str("resources/maps/global_map.png")
 		self.global_map_segmented_image_filename_ = self.extracted_file_path + str("resources/maps/global_map_segmented.png")
+		self.room_connectivity_filename_ = self.extracted_file_path + str("resources/json/room_connectivity.json")
 		self.application_data_filename_ = self.extracted_file_path + str("resources/json/application_data.json")
 		self.tmp_application_data_filename_ = self.extracted_file_path + str("resources/json/tmp_application_data.json")
 		self.log_filepath_ = self.extracted_file_path + str("resources/logs/")
@@ -559,6 +616,12 @@ class Database():
 
 
 	def addLogEntry(self, log_element):
+		self.addLogEntries([log_element])
+
+
+
+	# Append several LogItem instances to the current log file with one rewrite of the file
+	def addLogEntries(self, log_elements):
 		# Load current log file. If there is not a suiting log file, create one
 		current_logfile_filename = self.getCurrentLogfileName()
 		current_file_name = str(self.log_filepath_) + str(current_logfile_filename)
@@ -573,8 +636,8 @@ class Database():
 			file.write("{}")
 			file.close
 			log_item_list = []
-		# Append new LogItem instance to the LogItem list
-		log_item_list.append(log_element)
+		# Append the new LogItem instances to the LogItem list
+		log_item_list.extend(log_elements)
 		# Translate LogItem list to dict and dict to text
 		log_item_dict = self.getLogDictFromLogList(log_item_list)
 		log_text = json.dumps(log_item_dict, indent=4, sort_keys=True)
@@ -590,13 +653,24 @@ class Database():
 
 
 
-	# Save the complete database safely, remove temporal data on final save
-	def saveCompleteDatabase(self, temporal_file=True):
+	# Serialize the complete database for writeCompleteDatabase.
+	# Returns the room data and the application data before and after the successful save.
+	def serializeCompleteDatabase(self):
+		rooms_text = json.dumps(self.getRoomsDictFromRoomsList(), indent=4, sort_keys=True)
 		self.application_data_.last_database_save_successful_ = False
-		self.saveGlobalApplicationData(temporal=temporal_file)
-		self.saveRoomDatabase(temporal=temporal_file)
+		unconfirmed_application_data_text = json.dumps(self.getGlobalApplicationDataDictFromGlobalApplicationData(), indent=4, sort_keys=True)
 		self.application_data_.last_database_save_successful_ = True
-		self.saveGlobalApplicationData(temporal=temporal_file)
+		confirmed_application_data_text = json.dumps(self.getGlobalApplicationDataDictFromGlobalApplicationData(), indent=4, sort_keys=True)
+		return (rooms_text, unconfirmed_application_data_text, confirmed_application_data_text)
+
+
+
+	# Write the serialized database safely, remove temporal data on final save
+	def writeCompleteDatabase(self, database_texts, temporal_file=True):
+		(rooms_text, unconfirmed_application_data_text, confirmed_application_data_text) = database_texts
+		self.saveGlobalApplicationData(temporal=temporal_file, application_data_text=unconfirmed_application_data_text)
+		self.saveRoomDatabase(temporal=temporal_file, rooms_text=rooms_text)
+		self.saveGlobalApplicationData(temporal=temporal_file, application_data_text=confirmed_application_data_text)
 		if (temporal_file == False):
 			if (os.path.isfile(self.tmp_rooms_filename_) == True):
 				os.remove(str(self.tmp_rooms_filename_))
@@ -605,6 +679,12 @@ class Database():
 
 
 
+	# Save the complete database safely, remove temporal data on final save
+	def saveCompleteDatabase(self, temporal_file=True):
+		self.writeCompleteDatabase(self.serializeCompleteDatabase(), temporal_file)
+
+
+
 	# Retreive a room by providing a room_id
 	def getRoom(self, room_id):
 		result = None
@@ -76,6 +76,29 @@ class GlobalApplicationData():
 	# Progress status of the application [0=Completed, 1=Running, 2=Paused, 3=Stopped, 4=Discarded] and date the progress belongs to
 	# ([INTEGER, DATETIME])
 	progress_ = [0, None]
+	# Fine-grained progress of the running application, None if there is nothing to resume
+	# (PROGRESSCHECKPOINT)
+	progress_checkpoint_ = None
+
+
+
+# Class which documents the progress within a cleaning pass, such that the application can resume a room after a pause or a restart
+class ProgressCheckpoint():
+	# Current cleaning pass [0=due dry, 1=due wet, 2=overdue dry, 3=overdue wet]
+	# (INTEGER)
+	cleaning_pass_ = 0
+	# Index of the current trolley checkpoint within the room sequence of the pass
+	# (INTEGER)
+	checkpoint_index_ = 0
+	# ID of the room which is currently cleaned, None if no room is in progress
+	# (INTEGER)
+	room_id_ = None
+	# Key of the room's coverage path in the coverage path cache
+	# (STRING)
+	path_key_ = None
+	# Index of the last reached pose of the room's coverage path
+	# (INTEGER)
+	last_reached_pose_index_ = -1
 
 
 
@@ -93,7 +116,7 @@ class LogItem():
 	# Concerning cleaning task [-1=trashcan_only, 0=dry_only, 1=wet_only]
 	# (INTEGER)
 	cleaning_task_ = 0
-	# Status [Started, Completed=1, Stopped, Halted, Paused, Continued, ...]
+	# Status [Skipped=-1 (clean according to the dirt history), Started, Completed=1, Stopped, Halted, Paused, Continued, ...]
 	# (INTEGER)
 	status_ = 0
 	# Found trashcans
@@ -102,9 +125,12 @@ class LogItem():
 	# Found dirt spots
 	# (INTEGER)
 	found_dirtspots_ = 0
-	# Cleaned floor surface area
-	# (INTEGER)
+	# Cleaned floor surface area in [m^2]
+	# (FLOAT)
 	cleaned_surface_area_ = 0
+	# Percentage of the room's floor covered by the cleaning
+	# (FLOAT)
+	coverage_percentage_ = 0
 	# Amount of used water
 	# (FLOAT)
 	used_water_amount_ = 0
@@ -198,6 +224,12 @@ class RoomItem():
 	# Room Information in pixel
 	# (ROOMINFORMATION)
 	room_information_in_pixel_ = None
+	# Poses [x, y, yaw] in front of the doors inside the room, from room_connectivity.json
+	# (ARRAY OF ARRAY OF FLOAT)
+	room_entry_poses_ = []
+	# IDs of the adjacent rooms (-1=corridor), from room_connectivity.json
+	# (ARRAY OF INTEGER)
+	room_neighbors_ = []
 	# Room information in meter
 	# (ROOMINFORMATION)
 	room_information_in_meter_ = None
@@ -3,6 +3,9 @@
 # For database
 import database
 import database_classes
+# For concurrent access of the behaviors
+import threading
+import contextlib
 # For date and time calculations
 import datetime
 from datetime import date
@@ -88,6 +91,63 @@ class DatabaseHandler():
 
 	def __init__(self, database):
 		self.database_ = database
+		# Serializes the modifications of the database by concurrently running tasks
+		self.lock_ = threading.RLock()
+		# Optional DatabaseWriter, None = the changes are written by the calling thread
+		self.database_writer_ = None
+		# Nesting depth of the open transactions, the changes and log entries of a transaction are persisted at its end
+		self.transaction_depth_ = 0
+		self.transaction_changes_applied_ = False
+		self.transaction_log_items_ = []
+		# Optional CleaningProgressTracker which is informed about the started passes and rooms and the checkouts
+		self.progress_tracker_ = None
+
+
+
+	# Inform the given CleaningProgressTracker about the progress of the cleaning (None = no tracking)
+	def setProgressTracker(self, progress_tracker):
+		self.progress_tracker_ = progress_tracker
+
+
+
+	# Route all database writes through the given DatabaseWriter (None = write synchronously)
+	def setDatabaseWriter(self, database_writer):
+		self.database_writer_ = database_writer
+
+
+
+	# Append a LogItem to the current log file
+	def writeLogEntry(self, log_item):
+		with self.lock_:
+			if (self.transaction_depth_ > 0):
+				self.transaction_log_items_.append(log_item)
+			elif (self.database_writer_ != None):
+				self.database_writer_.addLogEntry(log_item)
+			else:
+				self.database_.addLogEntry(log_item)
+
+
+
+	# Transaction: all database changes and log entries within the with-block are persisted once at its end
+	@contextlib.contextmanager
+	def transaction(self):
+		with self.lock_:
+			self.transaction_depth_ = self.transaction_depth_ + 1
+			try:
+				yield
+			finally:
+				self.transaction_depth_ = self.transaction_depth_ - 1
+				if (self.transaction_depth_ == 0):
+					log_items = self.transaction_log_items_
+					self.transaction_log_items_ = []
+					if (len(log_items) > 0):
+						if (self.database_writer_ != None):
+							self.database_writer_.addLogEntries(log_items)
+						else:
+							self.database_.addLogEntries(log_items)
+					if (self.transaction_changes_applied_ == True):
+						self.transaction_changes_applied_ = False
+						self.applyChangesToDatabase()
 	
 
 
@@ -275,54 +335,133 @@ class DatabaseHandler():
 		return rooms_dry_cleaning, rooms_wet_cleaning
 
 
-	# Method for setting a room as completed
-	def checkoutCompletedRoom(self, room, assignment_type):
-		# Print checkout on console
-		print "[DatabaseHandler]: Checking out room " + str(room.room_id_) + ", cleaning subtask " + str(assignment_type) + ", out of " + str(room.open_cleaning_tasks_)
-		# Add entry into the log
+	# Method for merging lists of rooms into one list which contains each room once
+	def mergeRoomsLists(self, *rooms_lists):
+		merged_rooms_list = []
+		for rooms_list in rooms_lists:
+			for room in rooms_list:
+				if not (room in merged_rooms_list):
+					merged_rooms_list.append(room)
+		return merged_rooms_list
+
+
+	# Create a LogItem of a room for the current date
+	def createLogItem(self, room_id, status, cleaning_task, found_dirtspots=0, found_trashcans=0, cleaned_surface_area=0, room_issues=[], used_water_amount=0, battery_usage=0, coverage_percentage=0):
 		log_item = database_classes.LogItem()
-		log_item.room_id_ = room.room_id_
-		log_item.cleaning_task_ = assignment_type
-		log_item.battery_usage_ = 0
-		log_item.cleaned_surface_area_ = 0
-		log_item.date_and_time_ = datetime.datetime.now()
-		log_item.found_dirtspots_ = 0
-		log_item.found_trashcans_ = 0
+		log_item.room_id_ = room_id
 		log_item.log_week_and_day_ = [self.getTodaysWeekType(), self.getTodaysWeekDay()]
-		log_item.room_issues_ = []
-		log_item.status_ = 0
+		log_item.date_and_time_ = datetime.datetime.now()
+		log_item.status_ = status
+		log_item.cleaning_task_ = cleaning_task
+		log_item.found_dirtspots_ = found_dirtspots
+		log_item.found_trashcans_ = found_trashcans
+		log_item.cleaned_surface_area_ = cleaned_surface_area
+		log_item.coverage_percentage_ = coverage_percentage
+		log_item.room_issues_ = room_issues
 		log_item.trolley_capacity_ = 0
-		log_item.used_water_amount_ = 0
-		self.database_.addLogEntry(log_item)
-		# Remove assignment from the room's open assignment list
-		room.open_cleaning_tasks_.remove(assignment_type)
-		# Save current datetime as timestamp for the specified assignment
-		room.room_cleaning_datestamps_[assignment_type + 1] = datetime.datetime.now()
-		# Save all changes to the database
-		self.applyChangesToDatabase()
+		log_item.used_water_amount_ = used_water_amount
+		log_item.battery_usage_ = battery_usage
+		return log_item
+
+
+	# Method for setting a room as completed. log_item replaces the default log entry of the checkout.
+	def checkoutCompletedRoom(self, room, assignment_type, log_item=None):
+		with self.transaction():
+			# Print checkout on console
+			print "[DatabaseHandler]: Checking out room " + str(room.room_id_) + ", cleaning subtask " + str(assignment_type) + ", out of " + str(room.open_cleaning_tasks_)
+			# Add entry into the log
+			if (log_item == None):
+				log_item = self.createLogItem(room.room_id_, 0, assignment_type)
+			self.writeLogEntry(log_item)
+			# Remove assignment from the room's open assignment list
+			room.open_cleaning_tasks_.remove(assignment_type)
+			# Save current datetime as timestamp for the specified assignment
+			room.room_cleaning_datestamps_[assignment_type + 1] = datetime.datetime.now()
+			# Save all changes to the database
+			self.applyChangesToDatabase()
+			if (self.progress_tracker_ != None):
+				self.progress_tracker_.checkoutRoom(room.room_id_, [log_item])
+
+
+	# Method for setting several subtasks of a room as completed with one database commit.
+	# log_items: one LogItem per completed subtask, the subtask is given by LogItem.cleaning_task_
+	def checkoutCompletedRoomTasks(self, room, log_items):
+		with self.transaction():
+			for log_item in log_items:
+				self.checkoutCompletedRoom(room, log_item.cleaning_task_, log_item)
+
+	
+	# Method for starting a cleaning pass [0=due dry, 1=due wet, 2=overdue dry, 3=overdue wet].
+	# A stored checkpoint of the same or a later pass is kept, such that an interrupted pass can be resumed.
+	def startCleaningPass(self, cleaning_pass):
+		if (self.progress_tracker_ != None):
+			self.progress_tracker_.startPass(cleaning_pass)
+		with self.lock_:
+			progress_checkpoint = self.database_.application_data_.progress_checkpoint_
+			if ((progress_checkpoint != None) and (progress_checkpoint.cleaning_pass_ >= cleaning_pass)):
+				return
+			progress_checkpoint = database_classes.ProgressCheckpoint()
+			progress_checkpoint.cleaning_pass_ = cleaning_pass
+			self.database_.application_data_.progress_checkpoint_ = progress_checkpoint
+			self.applyChangesToDatabase()
+
+
+	# Method for recording the progress within a room. room_id=None marks that no room is in progress.
+	def updateRoomProgress(self, cleaning_pass, checkpoint_index, room_id, path_key=None, last_reached_pose_index=-1):
+		with self.lock_:
+			progress_checkpoint = database_classes.ProgressCheckpoint()
+			progress_checkpoint.cleaning_pass_ = cleaning_pass
+			progress_checkpoint.checkpoint_index_ = checkpoint_index
+			progress_checkpoint.room_id_ = room_id
+			progress_checkpoint.path_key_ = path_key
+			progress_checkpoint.last_reached_pose_index_ = last_reached_pose_index
+			self.database_.application_data_.progress_checkpoint_ = progress_checkpoint
+			self.applyChangesToDatabase()
+		if ((self.progress_tracker_ != None) and (room_id != None)):
+			self.progress_tracker_.startRoom(room_id)
+
+
+	# Returns the index of the coverage path pose where the cleaning of the room shall start.
+	# The recorded progress is only used if it belongs to the same pass, room and coverage path.
+	def getResumePoseIndex(self, cleaning_pass, room_id, path_key):
+		progress_checkpoint = self.database_.application_data_.progress_checkpoint_
+		if ((progress_checkpoint == None) or (path_key == None)):
+			return 0
+		if ((progress_checkpoint.cleaning_pass_ == cleaning_pass) and (progress_checkpoint.room_id_ == room_id) and (progress_checkpoint.path_key_ == path_key)):
+			return progress_checkpoint.last_reached_pose_index_ + 1
+		return 0
 
 	
 	# Public method to add an entry to the log. Method from the database does not need to be called, avoiding nasty imports
 	def addLogEntry(self, room_id, status, cleaning_task, found_dirtspots, found_trashcans, cleaned_surface_area, room_issues, used_water_amount, battery_usage):
-		new_entry = database_classes.LogItem()
-		new_entry.room_id_ = room_id
-		new_entry.log_week_and_day_ = [self.getTodaysWeekType(), self.getTodaysWeekDay()]
-		new_entry.date_and_time_ = datetime.datetime.now()
-		new_entry.status_ = status
-		new_entry.cleaning_task_ = cleaning_task
-		new_entry.found_dirtspots_ = found_dirtspots
-		new_entry.found_trashcans_ = found_trashcans
-		new_entry.cleaned_surface_area_ = cleaned_surface_area
-		new_entry.room_issues_ = room_issues
-		new_entry.used_water_amount_ = used_water_amount
-		new_entry.battery_usage_ = battery_usage
-		self.database_.addLogEntry(new_entry)
+		self.writeLogEntry(self.createLogItem(room_id, status, cleaning_task, found_dirtspots, found_trashcans, cleaned_surface_area, room_issues, used_water_amount, battery_usage))
 
 	# Method to run if a change in the database shall be applied (i.e. writes the temporary files). Applied changes can be discarded
 	def applyChangesToDatabase(self):
-		self.database_.saveCompleteDatabase(temporal_file=True)
+		with self.lock_:
+			if (self.transaction_depth_ > 0):
+				self.transaction_changes_applied_ = True
+			elif (self.database_writer_ != None):
+				self.database_writer_.requestSave()
+			else:
+				self.database_.saveCompleteDatabase(temporal_file=True)
+
+	# Method to run if all applied changes have to be on disk before continuing (e.g. before a pause or cancel)
+	def flushDatabase(self):
+		if (self.database_writer_ != None):
+			self.database_writer_.flush()
+		else:
+			self.applyChangesToDatabase()
 
 	# Method to run after all cleaning operations were performed
 	def cleaningFinished(self):
-		self.database_.saveCompleteDatabase(temporal_file=False)
+		if (self.progress_tracker_ != None):
+			self.progress_tracker_.finish()
+		with self.lock_:
+			self.database_.application_data_.progress_checkpoint_ = None
+			if (self.database_writer_ == None):
+				self.database_.saveCompleteDatabase(temporal_file=False)
+		# the writer needs the lock to serialize the database
+		if (self.database_writer_ != None):
+			self.database_writer_.flush(temporal_file=False)
 
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+import time
+
+
+class DatabaseWriter():
+
+	#========================================================================
+	# Description:
+	# Writes the database files and log entries in a background thread.
+	# Save requests which arrive in a short time are combined into one
+	# write of the latest database state. The database is serialized while
+	# holding the lock of the DatabaseHandler, the files are written
+	# without it, such that the behaviors are not blocked by disk I/O.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, database, lock, coalescing_delay=0.5):
+		self.database_ = database
+		# Lock which protects the database against modifications during the serialization
+		self.lock_ = lock
+		# Time in [s] to collect further changes before a save is written
+		self.coalescing_delay_ = coalescing_delay
+		# Number of the latest request and of the latest written request
+		self.requested_generation_ = 0
+		self.written_generation_ = 0
+		# A final save (temporal_file=False) is requested
+		self.final_save_requested_ = False
+		# LogItems which have not been written yet
+		self.pending_log_items_ = []
+		self.active_ = False
+		self.condition_ = threading.Condition()
+		self.worker_thread_ = None
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[DatabaseWriter]: " + str(text)
+
+	# Start the writer thread
+	def start(self):
+		if (self.worker_thread_ == None):
+			self.active_ = True
+			self.worker_thread_ = threading.Thread(target = self.processRequests)
+			self.worker_thread_.daemon = True
+			self.worker_thread_.start()
+
+	# Write all pending changes and stop the writer thread
+	def stop(self):
+		if (self.worker_thread_ != None):
+			self.flush()
+			with self.condition_:
+				self.active_ = False
+				self.condition_.notify_all()
+			self.worker_thread_.join()
+			self.worker_thread_ = None
+
+	# Request a (temporal) save of the complete database, returns the number of the request
+	def requestSave(self):
+		with self.condition_:
+			self.requested_generation_ = self.requested_generation_ + 1
+			self.condition_.notify_all()
+			return self.requested_generation_
+
+	# Request to append a LogItem to the current log file
+	def addLogEntry(self, log_item):
+		self.addLogEntries([log_item])
+
+	# Request to append several LogItems to the current log file
+	def addLogEntries(self, log_items):
+		with self.condition_:
+			self.pending_log_items_.extend(log_items)
+		self.requestSave()
+
+	# Barrier: wait until all requested changes are written.
+	# temporal_file=False writes the final database files and removes the temporal ones.
+	def flush(self, temporal_file=True):
+		with self.condition_:
+			if (temporal_file == False):
+				self.final_save_requested_ = True
+		generation = self.requestSave()
+		# without writer thread the changes are written by the calling thread
+		if (self.worker_thread_ == None):
+			self.writeChanges()
+			return
+		with self.condition_:
+			while ((self.written_generation_ < generation) and (rospy.is_shutdown() == False)):
+				self.condition_.wait(0.1)
+
+	# Write the latest database state and the pending log entries
+	def writeChanges(self):
+		with self.condition_:
+			generation = self.requested_generation_
+			temporal_file = not self.final_save_requested_
+			self.final_save_requested_ = False
+			log_items = self.pending_log_items_
+			self.pending_log_items_ = []
+		with self.lock_:
+			database_texts = self.database_.serializeCompleteDatabase()
+		try:
+			if (len(log_items) > 0):
+				self.database_.addLogEntries(log_items)
+			self.database_.writeCompleteDatabase(database_texts, temporal_file)
+		except Exception, e:
+			self.printMsg("Writing the database failed: %s" % e)
+		with self.condition_:
+			self.written_generation_ = max(self.written_generation_, generation)
+			self.condition_.notify_all()
+
+	# Worker loop
+	def processRequests(self):
+		while (True):
+			with self.condition_:
+				while ((self.active_ == True) and (self.written_generation_ >= self.requested_generation_)):
+					self.condition_.wait(1.0)
+				if (self.active_ == False):
+					break
+				final_save_requested = self.final_save_requested_
+			# collect a burst of changes, a final save is written immediately
+			if (final_save_requested == False):
+				time.sleep(self.coalescing_delay_)
+			self.writeChanges()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+import datetime
+import json
+import math
+import os
+import numpy as np
+from cv_bridge import CvBridge, CvBridgeError
+
+import map_utilities
+
+
+class DirtHistoryStore():
+
+	#========================================================================
+	# Description:
+	# Long term history of the detected dirt. A coarse float32 heat map of
+	# the global map is kept in a memory-mapped file, each dry pass adds its
+	# dirt map and older dirt decays with the given half life. Provides
+	# dirtiness scores per room, such that consistently clean rooms can be
+	# skipped and dirty rooms be preferred. Only rooms which were actually
+	# covered in a dry pass count as observed.
+	#========================================================================
+
+	# Constructor
+	# filename: file of the heat map, the metadata is stored in <filename>.json
+	# half_life: time in [days] after which the heat of a detection has halved
+	# dirt_increment: heat added to a cell per dry pass with dirt in the cell, the heat is limited to max_heat
+	def __init__(self, filename, cell_size=0.5, half_life=14.0, dirt_increment=64., max_heat=255.):
+		self.filename_ = filename
+		self.metadata_filename_ = filename + ".json"
+		self.cell_size_ = cell_size
+		self.half_life_ = half_life
+		self.dirt_increment_ = dirt_increment
+		self.max_heat_ = max_heat
+		# Heat map (numpy memmap), rows=y, columns=x
+		self.heat_map_ = None
+		self.cell_size_in_pixel_ = 1
+		self.map_resolution_ = None
+		self.map_origin_ = None
+		# Metadata: map hash, shape, data type, date of the last update, room id (as string) --> number of observing dry passes
+		self.metadata_ = None
+		# room id --> mask of the room on the heat map
+		self.room_masks_ = {}
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[DirtHistoryStore]: " + str(text)
+
+	# Open the history of the database's global map, a history of another map or data type is discarded
+	def open(self, database):
+		map_data = database.global_map_data_
+		bridge = CvBridge()
+		map_image = bridge.imgmsg_to_cv2(map_data.map_image_, desired_encoding = "passthrough")
+		self.map_resolution_ = map_data.map_resolution_
+		self.map_origin_ = map_data.map_origin_
+		self.cell_size_in_pixel_ = max(int(round(self.cell_size_/self.map_resolution_)), 1)
+		shape = [int(math.ceil(map_image.shape[0]/float(self.cell_size_in_pixel_))), int(math.ceil(map_image.shape[1]/float(self.cell_size_in_pixel_)))]
+		map_hash = map_utilities.hashImage(map_data.map_image_)
+		self.room_masks_ = {}
+		try:
+			metadata = json.loads(open(self.metadata_filename_, "r").read())
+			if ((metadata.get("map_hash") == map_hash) and (metadata.get("shape") == shape) and (metadata.get("dtype") == "float32") and (os.path.exists(self.filename_) == True)):
+				self.metadata_ = metadata
+				self.heat_map_ = np.memmap(self.filename_, dtype=np.float32, mode="r+", shape=tuple(shape))
+				return
+			self.printMsg("The dirt history belongs to another map or format, starting a new history.")
+		except (IOError, ValueError), e:
+			pass
+		directory = os.path.dirname(self.filename_)
+		if ((directory != "") and (os.path.exists(directory) == False)):
+			os.makedirs(directory)
+		self.heat_map_ = np.memmap(self.filename_, dtype=np.float32, mode="w+", shape=tuple(shape))
+		self.metadata_ = {"map_hash": map_hash, "shape": shape, "dtype": "float32", "last_update": None, "room_observations": {}}
+		self.saveMetadata()
+
+	def saveMetadata(self):
+		open(self.metadata_filename_, "w").write(json.dumps(self.metadata_, indent=4))
+
+	# Returns the decay factor of the heat since the last update
+	def getDecayFactor(self, now):
+		if (self.metadata_["last_update"] == None):
+			return 1.
+		last_update = datetime.datetime.strptime(self.metadata_["last_update"], "%Y-%m-%d_%H:%M:%S")
+		days = max((now - last_update).total_seconds()/86400., 0.)
+		return 0.5**(days/self.half_life_)
+
+	# Add the last dirt map of the DirtMapClient, observed_room_ids are the rooms which were covered in the dry pass
+	def addDirtMap(self, dirt_map_client, observed_room_ids):
+		if ((self.heat_map_ is None) or (dirt_map_client.dirt_map_ is None)):
+			return
+		now = datetime.datetime.now()
+		# decay the history, then add the dirty cells (the float heat decays without rounding steps)
+		decay_factor = self.getDecayFactor(now)
+		if (decay_factor < 1.):
+			self.heat_map_ *= decay_factor
+		rows, columns = np.nonzero(dirt_map_client.dirt_map_ > dirt_map_client.dirt_threshold_)
+		positions = dirt_map_client.cellsToWorld(rows, columns)
+		cell_rows = np.floor((positions[:, 1] - self.map_origin_.position.y)/(self.map_resolution_*self.cell_size_in_pixel_)).astype(np.int64)
+		cell_columns = np.floor((positions[:, 0] - self.map_origin_.position.x)/(self.map_resolution_*self.cell_size_in_pixel_)).astype(np.int64)
+		valid = (cell_rows >= 0) & (cell_rows < self.heat_map_.shape[0]) & (cell_columns >= 0) & (cell_columns < self.heat_map_.shape[1])
+		dirty_cells = np.zeros(self.heat_map_.shape, np.bool_)
+		dirty_cells[cell_rows[valid], cell_columns[valid]] = True
+		self.heat_map_[dirty_cells] = np.minimum(self.heat_map_[dirty_cells] + self.dirt_increment_, self.max_heat_)
+		self.heat_map_.flush()
+		room_observations = self.metadata_["room_observations"]
+		for room_id in observed_room_ids:
+			room_observations[str(room_id)] = room_observations.get(str(room_id), 0) + 1
+		self.metadata_["last_update"] = now.strftime("%Y-%m-%d_%H:%M:%S")
+		self.saveMetadata()
+		self.printMsg("Added " + str(int(np.count_nonzero(dirty_cells))) + " dirty cells of " + str(len(observed_room_ids)) + " observed rooms to the dirt history.")
+
+	# Returns the mask of the room on the heat map
+	def getRoomMask(self, room):
+		if ((room.room_id_ in self.room_masks_) == False):
+			bridge = CvBridge()
+			room_map = bridge.imgmsg_to_cv2(room.room_map_data_, desired_encoding = "passthrough")
+			# a cell belongs to the room if any of its pixels does
+			padded_map = np.zeros((self.heat_map_.shape[0]*self.cell_size_in_pixel_, self.heat_map_.shape[1]*self.cell_size_in_pixel_), np.bool_)
+			padded_map[0:room_map.shape[0], 0:room_map.shape[1]] = (room_map == 255)
+			self.room_masks_[room.room_id_] = padded_map.reshape(self.heat_map_.shape[0], self.cell_size_in_pixel_, self.heat_map_.shape[1], self.cell_size_in_pixel_).max(axis=(1, 3))
+		return self.room_masks_[room.room_id_]
+
+	# Returns the number of dry passes which covered the room
+	def getRoomObservations(self, room_id):
+		if (self.metadata_ == None):
+			return 0
+		return self.metadata_["room_observations"].get(str(room_id), 0)
+
+	# Returns the dirtiness scores [0, 1] of the rooms at the current time, room id --> score
+	def getRoomScores(self, rooms_list):
+		scores = {}
+		if (self.heat_map_ is None):
+			return scores
+		decay_factor = self.getDecayFactor(datetime.datetime.now())
+		for room in rooms_list:
+			if (room.room_map_data_ is None):
+				continue
+			room_heat = self.heat_map_[self.getRoomMask(room)]
+			scores[room.room_id_] = (float(room_heat.mean())*decay_factor/self.max_heat_ if (room_heat.size > 0) else 0.)
+		return scores
+
+	# Split the rooms into the rooms to be cleaned, ordered from dirty to clean, and the consistently clean rooms which can be skipped.
+	# A room is consistently clean if it was covered in at least min_observations dry passes and its score is at most skip_threshold.
+	# Rooms without observations are never skipped, their unobserved cells cannot be told from clean ones.
+	def selectRooms(self, rooms_list, skip_threshold=0.02, min_observations=3):
+		scores = self.getRoomScores(rooms_list)
+		selected_rooms = []
+		skipped_rooms = []
+		for room in rooms_list:
+			if ((room.room_id_ in scores) and (self.getRoomObservations(room.room_id_) >= min_observations) and (scores[room.room_id_] <= skip_threshold)):
+				skipped_rooms.append(room)
+			else:
+				selected_rooms.append(room)
+		selected_rooms.sort(key=lambda room: -scores.get(room.room_id_, 1.))
+		return selected_rooms, skipped_rooms
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+import rospy
+import contextlib
+import numpy as np
+from rospy.numpy_msg import numpy_msg
+from cv_bridge import CvBridge, CvBridgeError
+from std_srvs.srv import Empty
+
+from ipa_dirt_detection.srv import ActivateDirtDetection
+from ipa_dirt_detection.srv import DeactivateDirtDetection
+from ipa_dirt_detection.srv import GetDirtMap, GetDirtMapRequest, GetDirtMapResponse
+from ipa_dirt_detection.srv import ValidateCleaningResult
+from geometry_msgs.msg import Point
+
+import map_utilities
+
+
+# GetDirtMap with a response whose arrays are deserialized as numpy arrays on the received buffer (no copy of the map data)
+class NumpyGetDirtMap(object):
+	_type = GetDirtMap._type
+	_md5sum = GetDirtMap._md5sum
+	_request_class = GetDirtMapRequest
+	_response_class = numpy_msg(GetDirtMapResponse)
+
+
+
+class DirtMapClient():
+
+	#========================================================================
+	# Description:
+	# Client of the dirt detection (ipa_dirt_detection). Switches the
+	# detection on and off, fetches the dirt map as numpy array view of the
+	# received OccupancyGrid and provides per room views and statistics,
+	# using a label image of the rooms on the grid of the dirt map.
+	#========================================================================
+
+	# Constructor
+	# dirt_threshold: cells with a dirt map value above the threshold [0, 100] are dirty
+	def __init__(self, service_namespace='/dirt_detection', dirt_threshold=50, service_timeout=5.0):
+		self.service_namespace_ = service_namespace
+		self.dirt_threshold_ = dirt_threshold
+		self.service_timeout_ = service_timeout
+		self.activate_service_ = rospy.ServiceProxy(service_namespace + '/activate_dirt_detection', ActivateDirtDetection)
+		self.deactivate_service_ = rospy.ServiceProxy(service_namespace + '/deactivate_dirt_detection', DeactivateDirtDetection)
+		self.get_dirt_map_service_ = rospy.ServiceProxy(service_namespace + '/get_dirt_map', NumpyGetDirtMap)
+		self.validate_service_ = rospy.ServiceProxy(service_namespace + '/validate_cleaning_result', ValidateCleaningResult)
+		self.reset_service_ = rospy.ServiceProxy(service_namespace + '/reset_dirt_maps', Empty)
+		# Last dirt map as int8 array (rows=y, columns=x), read only view of the service response
+		self.dirt_map_ = None
+		self.map_resolution_ = None
+		self.map_origin_ = None
+		# Label image of the rooms on the grid of the dirt map (0=no room, i+1=i-th labeled room)
+		self.room_labels_ = None
+		self.room_labels_key_ = None
+		# room id --> (label, row slice, column slice) of the bounding box of the room on the dirt map grid
+		self.room_boxes_ = {}
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[DirtMapClient]: " + str(text)
+
+	# Calls the service, returns the response or None if the service is not available or failed
+	def callService(self, service_proxy, *args):
+		try:
+			service_proxy.wait_for_service(self.service_timeout_)
+			return service_proxy(*args)
+		except (rospy.ROSException, rospy.ServiceException), e:
+			self.printMsg("Service " + str(service_proxy.resolved_name) + " failed: %s" % e)
+			return None
+
+	# Switch on the dirt detection, returns False if the dirt detection is not available
+	def activateDirtDetection(self):
+		return (self.callService(self.activate_service_) != None)
+
+	# Switch off the dirt detection
+	def deactivateDirtDetection(self):
+		return (self.callService(self.deactivate_service_) != None)
+
+	# Clear the dirt maps of the dirt detection
+	def resetDirtMaps(self):
+		return (self.callService(self.reset_service_) != None)
+
+	# Dirt detection session: the detection runs within the with-block only
+	@contextlib.contextmanager
+	def detectionSession(self):
+		self.activateDirtDetection()
+		try:
+			yield
+		finally:
+			self.deactivateDirtDetection()
+
+	# Fetch the current dirt map, returns it as int8 array (rows=y, columns=x) or None if not available
+	def getDirtMap(self):
+		response = self.callService(self.get_dirt_map_service_)
+		if (response == None):
+			return None
+		grid = response.dirtMap
+		# view on the received data, reshaping does not copy
+		self.dirt_map_ = np.asarray(grid.data, dtype=np.int8).reshape(grid.info.height, grid.info.width)
+		self.map_resolution_ = grid.info.resolution
+		self.map_origin_ = grid.info.origin
+		return self.dirt_map_
+
+	# Create the label image of the rooms on the grid of the last dirt map. A dirt cell belongs to the room which contains its center.
+	# The label image is only recomputed if the rooms or the grid changed.
+	def updateRoomLabels(self, database, rooms_list):
+		if (self.dirt_map_ is None):
+			return
+		key = (tuple(room.room_id_ for room in rooms_list), self.dirt_map_.shape, self.map_resolution_, self.map_origin_.position.x, self.map_origin_.position.y,
+			map_utilities.hashImage(database.global_map_data_.map_image_))
+		if (key == self.room_labels_key_):
+			return
+		bridge = CvBridge()
+		map_data = database.global_map_data_
+		# pixels of the global map at the centers of the dirt cells, computed for rows and columns separately
+		rows = ((self.map_origin_.position.y + (np.arange(self.dirt_map_.shape[0]) + 0.5)*self.map_resolution_ - map_data.map_origin_.position.y) / map_data.map_resolution_).astype(np.int64)
+		columns = ((self.map_origin_.position.x + (np.arange(self.dirt_map_.shape[1]) + 0.5)*self.map_resolution_ - map_data.map_origin_.position.x) / map_data.map_resolution_).astype(np.int64)
+		self.room_labels_ = np.zeros(self.dirt_map_.shape, np.int32)
+		self.room_boxes_ = {}
+		for label, room in enumerate(rooms_list, 1):
+			if (room.room_map_data_ is None):
+				continue
+			room_map = bridge.imgmsg_to_cv2(room.room_map_data_, desired_encoding = "passthrough")
+			valid_rows = np.flatnonzero((rows >= 0) & (rows < room_map.shape[0]))
+			valid_columns = np.flatnonzero((columns >= 0) & (columns < room_map.shape[1]))
+			room_mask = (room_map[np.ix_(rows[valid_rows], columns[valid_columns])] == 255)
+			room_rows = np.flatnonzero(np.any(room_mask, axis=1))
+			room_columns = np.flatnonzero(np.any(room_mask, axis=0))
+			if (room_rows.size == 0):
+				continue
+			label_view = self.room_labels_[valid_rows[0]:valid_rows[-1]+1, valid_columns[0]:valid_columns[-1]+1]
+			label_view[room_mask] = label
+			self.room_boxes_[room.room_id_] = (label, slice(int(valid_rows[room_rows[0]]), int(valid_rows[room_rows[-1]])+1), slice(int(valid_columns[room_columns[0]]), int(valid_columns[room_columns[-1]])+1))
+		self.room_labels_key_ = key
+
+	# Returns the views (dirt map, room mask) of the bounding box of the room on the last dirt map, (None, None) if the room is unknown
+	def getRoomView(self, room_id):
+		if ((self.dirt_map_ is None) or ((room_id in self.room_boxes_) == False)):
+			return None, None
+		label, row_slice, column_slice = self.room_boxes_[room_id]
+		return self.dirt_map_[row_slice, column_slice], (self.room_labels_[row_slice, column_slice] == label)
+
+	# Returns the mask of the dirty cells of the room within its bounding box and the offset (row, column) of the box, (None, None) if unknown
+	def getDirtyCells(self, room_id):
+		room_dirt_map, room_mask = self.getRoomView(room_id)
+		if (room_dirt_map is None):
+			return None, None
+		label, row_slice, column_slice = self.room_boxes_[room_id]
+		return ((room_dirt_map > self.dirt_threshold_) & room_mask), (row_slice.start, column_slice.start)
+
+	# Returns the world positions [m] of the dirty cells of the room as array of [x, y]
+	def getDirtyPositions(self, room_id):
+		dirty_cells, offset = self.getDirtyCells(room_id)
+		if (dirty_cells is None):
+			return np.zeros((0, 2))
+		rows, columns = np.nonzero(dirty_cells)
+		return self.cellsToWorld(rows + offset[0], columns + offset[1])
+
+	# Converts cells (rows, columns) of the dirt map into the world positions [m] of the cell centers, array of [x, y]
+	def cellsToWorld(self, rows, columns):
+		return np.column_stack((self.map_origin_.position.x + (np.asarray(columns) + 0.5)*self.map_resolution_,
+			self.map_origin_.position.y + (np.asarray(rows) + 0.5)*self.map_resolution_))
+
+	# Returns the dirt statistics of all labeled rooms, room id --> dictionary with
+	# the numbers of room cells, observed cells and dirty cells, the dirty area in [m^2] and the dirty fraction of the observed area
+	def computeRoomStatistics(self):
+		statistics = {}
+		if ((self.dirt_map_ is None) or (self.room_labels_ is None)):
+			return statistics
+		# one pass over the map for all rooms
+		labels = self.room_labels_.ravel()
+		number_labels = int(labels.max()) + 1
+		dirt_map = self.dirt_map_.ravel()
+		room_cells = np.bincount(labels, minlength=number_labels)
+		observed_cells = np.bincount(labels, weights=(dirt_map >= 0), minlength=number_labels)
+		dirty_cells = np.bincount(labels, weights=(dirt_map > self.dirt_threshold_), minlength=number_labels)
+		cell_area = self.map_resolution_*self.map_resolution_
+		for room_id, (label, row_slice, column_slice) in self.room_boxes_.items():
+			statistics[room_id] = {
+				"room_cells": int(room_cells[label]),
+				"observed_cells": int(observed_cells[label]),
+				"dirty_cells": int(dirty_cells[label]),
+				"dirty_area": dirty_cells[label]*cell_area,
+				"dirty_fraction": (dirty_cells[label]/observed_cells[label] if (observed_cells[label] > 0) else 0.)
+			}
+		return statistics
+
+	# Let the dirt detection check the given positions [x, y] of one dirt spot, returns the positions which are still dirty, None if the service failed
+	def validateCleaningResult(self, positions, number_validation_images=0):
+		validation_positions = [Point(x=position[0], y=position[1], z=0.) for position in positions]
+		response = self.callService(self.validate_service_, validation_positions, number_validation_images)
+		if (response == None):
+			return None
+		return [(point.x, point.y) for point in response.dirtyPositions]
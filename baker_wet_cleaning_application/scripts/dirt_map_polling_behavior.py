@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import coroutine_behavior
+import coroutine_runtime
+
+
+class DirtMapPollingBehavior(coroutine_behavior.CoroutineBehavior):
+
+	#========================================================================
+	# Description:
+	# Explores a room and polls the dirt map of the dirt detection at the
+	# same time. Both run on one EventLoop: the (blocking) exploration and
+	# the service calls are bridged into Futures, the dirt statistics of
+	# the room are updated after every poll and once more after the
+	# exploration. An interruption cancels the polling immediately.
+	#========================================================================
+
+	def __init__(self, behavior_name, interrupt_var):
+		self.behavior_name_ = behavior_name
+		self.interrupt_var_ = interrupt_var
+
+	# Method for setting parameters for the behavior
+	# exploration_function: blocking function which drives through the room, it has to observe the interruptions itself
+	# poll_period: time in [s] between two requests of the dirt map
+	def setParameters(self, database_handler, dirt_map_client, rooms_list, room_id, exploration_function, poll_period=2.0):
+		self.database_handler_ = database_handler
+		self.dirt_map_client_ = dirt_map_client
+		self.rooms_list_ = rooms_list
+		self.room_id_ = room_id
+		self.exploration_function_ = exploration_function
+		self.poll_period_ = poll_period
+		# Dirt statistics of the room after the last poll (see DirtMapClient.computeRoomStatistics), None if not available
+		self.room_statistics_ = None
+		self.number_polls_ = 0
+		# Return value of the exploration function
+		self.exploration_result_ = None
+
+	# Method for returning to the standard pose of the robot
+	def returnToRobotStandardState(self):
+		# nothing to save
+		# nothing to be undone
+		pass
+
+	# Coroutine: fetch the dirt map and update the dirt statistics of the room
+	def pollDirtMap(self, loop):
+		dirt_map = yield coroutine_runtime.runInThread(loop, self.dirt_map_client_.getDirtMap)
+		self.number_polls_ = self.number_polls_ + 1
+		if (dirt_map is None):
+			return
+		self.dirt_map_client_.updateRoomLabels(self.database_handler_.database_, self.rooms_list_)
+		room_statistics = self.dirt_map_client_.computeRoomStatistics().get(self.room_id_)
+		if ((room_statistics != None) and ((self.room_statistics_ == None) or (room_statistics["dirty_cells"] != self.room_statistics_["dirty_cells"]))):
+			self.printMsg("Dirt in room " + str(self.room_id_) + ": " + str(room_statistics["dirty_cells"]) + " dirty cells, " + str(room_statistics["dirty_area"]) + " m^2")
+		self.room_statistics_ = room_statistics
+
+	# Implemented Behavior
+	def executeCustomBehaviorAsync(self, loop):
+		exploration = coroutine_runtime.runInThread(loop, self.exploration_function_)
+		while (exploration.done() == False):
+			yield self.pollDirtMap(loop)
+			# the next poll follows after the poll period, the last one directly after the exploration
+			yield coroutine_runtime.waitFirst(loop, [exploration], self.poll_period_)
+		yield self.pollDirtMap(loop)
+		# failures of the exploration are raised here
+		self.exploration_result_ = yield exploration
@@ -1,24 +1,46 @@
 #!/usr/bin/env python
 
 import rospy
+import tf
+import numpy as np
+import cv2
+from geometry_msgs.msg import Point, Quaternion
+
 import behavior_container
 import database_handler
+import move_base_behavior
+import room_sequence_solver
+from room_sequencing_behavior import get_transform_listener
 
 
 class DirtRemovingBehavior(behavior_container.BehaviorContainer):
 
 	#========================================================================
 	# Description:
-	# Class which contains the behavior for removing dirt spots
+	# Class which contains the behavior for removing dirt spots.
+	# Spot cleaning: the dirty cells of the room's dirt map are clustered
+	# into connected dirt spots, the robot visits the spot centers on a
+	# short tour and validates each spot with the dirt detection right
+	# after its removal, while the spot is in the camera view.
 	#========================================================================
 
 	def __init__(self, behavior_name, interrupt_var, service_str):
 		self.behavior_name_ = behavior_name
 		self.interrupt_var_ = interrupt_var
-		
+		# move_base action
+		self.service_str_ = service_str
+
 	# Method for setting parameters for the behavior
-	def setParameters(self, database_handler):
+	# dirt_map_client: DirtMapClient whose dirt map and room labels are up to date for the room
+	# minimum_spot_size: dirt spots with less cells are ignored
+	# number_validation_images: images taken by the validation (<=0 = history depth of the dirt detection)
+	def setParameters(self, database_handler, dirt_map_client=None, room_id=None, map_header_frame_id="map", minimum_spot_size=1, number_validation_images=0):
 		self.database_handler_ = database_handler
+		self.dirt_map_client_ = dirt_map_client
+		self.room_id_ = room_id
+		self.map_header_frame_id_ = map_header_frame_id
+		self.minimum_spot_size_ = minimum_spot_size
+		self.number_validation_images_ = number_validation_images
 
 	# Method for returning to the standard pose of the robot
 	def returnToRobotStandardState(self):
@@ -26,6 +48,79 @@ class DirtRemovingBehavior(behavior_container.BehaviorContainer):
 		# undo or check whether everything has been undone
 		pass
 
+	# Returns the centers [x, y] of the dirt spots of the room in [m] and for each spot the positions [x, y] of its dirty cells
+	def computeDirtSpots(self):
+		dirty_cells, offset = self.dirt_map_client_.getDirtyCells(self.room_id_)
+		if ((dirty_cells is None) or (np.any(dirty_cells) == False)):
+			return np.zeros((0, 2)), []
+		number_components, labels, stats, centroids = cv2.connectedComponentsWithStats(dirty_cells.astype(np.uint8), connectivity=8)
+		# label 0 is the background, centroids are (column, row)
+		spots = [label for label in range(1, number_components) if (stats[label, cv2.CC_STAT_AREA] >= self.minimum_spot_size_)]
+		spot_cells = []
+		for label in spots:
+			rows, columns = np.nonzero(labels == label)
+			spot_cells.append(self.dirt_map_client_.cellsToWorld(rows + offset[0], columns + offset[1]))
+		return self.dirt_map_client_.cellsToWorld(centroids[spots, 1] + offset[0], centroids[spots, 0] + offset[1]), spot_cells
+
+	# Returns the current robot position [x, y] in the map frame or None if it is unknown
+	def currentRobotPosition(self):
+		try:
+			listener = get_transform_listener()
+			(translation, rotation) = listener.lookupTransform(self.map_header_frame_id_, '/base_link', rospy.Time(0))
+		except (tf.Exception, tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException), e:
+			return None
+		return np.array([translation[0], translation[1]])
+
+	# Returns the order of the dirt spots for a short tour from the robot position
+	def computeTour(self, spot_positions):
+		distance_matrix = np.hypot(spot_positions[:, 0, np.newaxis] - spot_positions[np.newaxis, :, 0], spot_positions[:, 1, np.newaxis] - spot_positions[np.newaxis, :, 1])
+		robot_position = self.currentRobotPosition()
+		if (robot_position is None):
+			start_distances = np.zeros(len(spot_positions))
+		else:
+			start_distances = np.hypot(spot_positions[:, 0] - robot_position[0], spot_positions[:, 1] - robot_position[1])
+		solver = room_sequence_solver.RoomSequenceSolver()
+		tour = solver.improveTour(solver.computeNearestNeighborTour(distance_matrix, start_distances), distance_matrix, start_distances)
+		self.printMsg("Tour over " + str(len(tour)) + " dirt spots with a length of " + str(solver.getTourLength(tour, distance_matrix, start_distances)) + " m.")
+		return tour
+
 	# Implemented Behavior
 	def executeCustomBehavior(self):
-		pass
+		# Number of found dirt spots and the spots which are still dirty after the cleaning as (center [x, y], dirty positions [x, y])
+		self.found_dirtspots_ = 0
+		self.remaining_dirtspots_ = []
+		if ((self.dirt_map_client_ == None) or (self.room_id_ == None)):
+			return
+
+		spot_positions, spot_cells = self.computeDirtSpots()
+		self.found_dirtspots_ = len(spot_positions)
+		self.printMsg("Found " + str(self.found_dirtspots_) + " dirt spots in room " + str(self.room_id_) + ".")
+		if (self.found_dirtspots_ == 0):
+			return
+
+		# Visit the dirt spots
+		move_base_handler = move_base_behavior.MoveBaseBehavior("MoveBaseBehavior", self.interrupt_var_, self.service_str_)
+		for spot_index in self.computeTour(spot_positions):
+			move_base_handler.setParameters(
+				Point(x=spot_positions[spot_index, 0], y=spot_positions[spot_index, 1], z=0.),
+				Quaternion(x=0., y=0., z=0., w=1.),
+				self.map_header_frame_id_
+			)
+			move_base_handler.executeBehavior()
+
+			# ==========================================
+			# insert dirt spot removal here
+			# ==========================================
+
+			# Interruption opportunity
+			if self.handleInterrupt() == 2:
+				return
+
+			# Validate the spot from its position, the positions of one call belong to the same dirt stain
+			dirty_positions = self.dirt_map_client_.validateCleaningResult(spot_cells[spot_index], self.number_validation_images_)
+			if (dirty_positions == None):
+				self.printMsg("Validation of dirt spot " + str(spot_index) + " failed.")
+			elif (len(dirty_positions) > 0):
+				self.remaining_dirtspots_.append(((spot_positions[spot_index, 0], spot_positions[spot_index, 1]), dirty_positions))
+
+		self.printMsg(str(len(self.remaining_dirtspots_)) + " of " + str(self.found_dirtspots_) + " dirt spots are still dirty after the spot cleaning.")
@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 
-import threading
 import time
 import rospy
 import behavior_container
 import database
 import tool_changing_behavior
 import trolley_movement_behavior
+import dirt_removing_behavior
+import dirt_map_polling_behavior
+import task_runner
 
 
 class DryCleaningBehavior(behavior_container.BehaviorContainer):
@@ -22,10 +24,20 @@ class DryCleaningBehavior(behavior_container.BehaviorContainer):
 		self.interrupt_var_ = interrupt_var
 		
 	# Method for setting parameters for the behavior
-	def setParameters(self, database_handler, sequencing_result, mapping):
+	# dirt_map_client: optional DirtMapClient, the dirt detection runs during the dry cleaning then
+	# dirt_history_store: optional DirtHistoryStore, the dirt map of the pass is added after the cleaning
+	# use_coroutine_behaviors: the dirt map is polled while a room is explored (DirtMapPollingBehavior), otherwise fetched once afterwards
+	# min_observation_coverage: covered percentage of a room from which its exploration counts as observation in the dirt history
+	def setParameters(self, database_handler, sequencing_result, mapping, dirt_map_client=None, dirt_history_store=None, use_coroutine_behaviors=False, min_observation_coverage=80.):
 		self.database_handler_ = database_handler
 		self.sequencing_result_ = sequencing_result
 		self.mapping_ = mapping
+		self.dirt_map_client_ = dirt_map_client
+		self.dirt_history_store_ = dirt_history_store
+		self.use_coroutine_behaviors_ = use_coroutine_behaviors
+		self.min_observation_coverage_ = min_observation_coverage
+		# IDs of the rooms whose exploration covered at least min_observation_coverage
+		self.observed_room_ids_ = []
 
 	# Method for returning to the standard state of the robot
 	def returnToRobotStandardState(self):
@@ -33,15 +45,14 @@ class DryCleaningBehavior(behavior_container.BehaviorContainer):
 		# nothing to be undone
 		pass
 
-	# Searching for trashcans
+	# Searching for trashcans, returns the log entry of the completed subtask
 	def trashcanRoutine(self, room_counter):
 		# ==========================================
 		# insert trashcan handling here
 		# ==========================================
-		self.database_handler_.checkoutCompletedRoom(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), -1)
 
-		# Adding log entry for wet cleaning
-		self.database_handler_.addLogEntry(
+		# Log entry for trashcan emptying, written with the checkout of the room
+		return self.database_handler_.createLogItem(
 			self.mapping_.get(room_counter), # room id
 			1, # status (1=Completed)
 			-1, # cleaning task (-1=trashcan only)
@@ -53,25 +64,28 @@ class DryCleaningBehavior(behavior_container.BehaviorContainer):
 			0 # battery usage
 		)
 
-	# Searching for dirt
+	# Searching for dirt, returns the log entry of the completed subtask or None if it was interrupted
 	def dirtRoutine(self, room_counter):
-		# ==========================================
-		# insert dirt removing here
-		# ==========================================
-		self.database_handler_.checkoutCompletedRoom(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), 0)
-
-	# Driving through room
-	def exploreRoom(self, room_counter):
-		# ==========================================
-		# insert room exploration here
-		# ==========================================
-		
-		# Adding log entry for wet cleaning
-		self.database_handler_.addLogEntry(
+		found_dirtspots = 0
+		# Spot cleaning of the detected dirt
+		if (self.dirt_map_client_ != None):
+			self.dirt_remover_.setParameters(
+				self.database_handler_,
+				self.dirt_map_client_,
+				self.mapping_.get(room_counter),
+				self.database_handler_.database_.global_map_data_.map_header_frame_id_
+			)
+			self.dirt_remover_.executeBehavior()
+			if (self.dirt_remover_.executionInterrupted() == True):
+				return None
+			found_dirtspots = self.dirt_remover_.found_dirtspots_
+
+		# Log entry for dry cleaning, written with the checkout of the room
+		return self.database_handler_.createLogItem(
 			self.mapping_.get(room_counter), # room id
 			1, # status (1=Completed)
 			0, # cleaning task (0=dry only)
-			0, # (found dirtspots)
+			found_dirtspots, # (found dirtspots)
 			0, # trashcan count
 			0, # surface area
 			[], # room issues
@@ -79,10 +93,64 @@ class DryCleaningBehavior(behavior_container.BehaviorContainer):
 			0 # battery usage
 		)
 
+	# Driving through room, returns the covered percentage of the room (coverage monitor) or None if unknown
+	def exploreRoom(self, room_counter):
+		# ==========================================
+		# insert room exploration here
+		# ==========================================
+		return None
+
+	# Explore the room while the dirt map is polled, returns the result of exploreRoom
+	def exploreRoomAndPollDirtMap(self, room_counter):
+		self.dirt_map_poller_.setParameters(
+			self.database_handler_,
+			self.dirt_map_client_,
+			[self.database_handler_.database_.getRoom(room_id) for room_id in self.mapping_.values()],
+			self.mapping_.get(room_counter),
+			lambda: self.exploreRoom(room_counter)
+		)
+		self.dirt_map_poller_.executeBehavior()
+		return self.dirt_map_poller_.exploration_result_
+
+	# Remember the room as observed for the dirt history if its exploration covered enough of it
+	def registerObservation(self, room_counter, coverage_percentage):
+		if ((coverage_percentage != None) and (coverage_percentage >= self.min_observation_coverage_)):
+			self.observed_room_ids_.append(self.mapping_.get(room_counter))
+
+	# Print the dirt found in the explored room
+	def reportDirt(self, room_counter):
+		if (self.dirt_map_client_ == None):
+			return
+		if (self.dirt_map_client_.getDirtMap() is None):
+			return
+		rooms_list = [self.database_handler_.database_.getRoom(room_id) for room_id in self.mapping_.values()]
+		self.dirt_map_client_.updateRoomLabels(self.database_handler_.database_, rooms_list)
+		room_statistics = self.dirt_map_client_.computeRoomStatistics().get(self.mapping_.get(room_counter))
+		if (room_statistics != None):
+			self.printMsg("Dirt in room " + str(self.mapping_.get(room_counter)) + ": " + str(room_statistics["dirty_cells"]) + " dirty cells, " + str(room_statistics["dirty_area"]) + " m^2")
+
+	# Add the dirt map of the pass to the dirt history, room_counter is the number of explored rooms
+	# Only the covered rooms count as observed, the others cannot be told from clean rooms.
+	def updateDirtHistory(self, room_counter):
+		if ((self.dirt_map_client_ == None) or (self.dirt_history_store_ == None) or (room_counter == 0)):
+			return
+		if (self.dirt_map_client_.getDirtMap() is None):
+			return
+		self.dirt_history_store_.addDirtMap(self.dirt_map_client_, self.observed_room_ids_)
+
+	# Checkout of all completed subtasks of the room with one database commit
+	# room_tasks: TaskFutures of the subtasks, log_items: LogItems of the subtasks which were executed directly
+	def checkoutRoom(self, room_counter, room_tasks, log_items=[]):
+		log_items = log_items + [task.result() for task in room_tasks if ((task.done() == True) and (task.cancelled() == False) and (task.exception() == None))]
+		log_items = [log_item for log_item in log_items if (log_item != None)]
+		self.database_handler_.checkoutCompletedRoomTasks(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), log_items)
+
 	# Implemented Behavior
 	def executeCustomBehavior(self):
 		self.tool_changer_ = tool_changing_behavior.ToolChangingBehavior("ToolChangingBehavior", self.interrupt_var_)
 		self.trolley_mover_ = trolley_movement_behavior.TrolleyMovementBehavior("TrolleyMovingBehavior", self.interrupt_var_)
+		self.dirt_remover_ = dirt_removing_behavior.DirtRemovingBehavior("DirtRemovingBehavior", self.interrupt_var_, 'move_base')
+		self.dirt_map_poller_ = dirt_map_polling_behavior.DirtMapPollingBehavior("DirtMapPollingBehavior", self.interrupt_var_)
 
 		# Tool change according to cleaning task
 		self.tool_changer_.setParameters(self.database_handler_)
@@ -90,28 +158,55 @@ class DryCleaningBehavior(behavior_container.BehaviorContainer):
 
 		room_counter = 0
 
-		for checkpoint in self.sequencing_result_.checkpoints:
-
-			# Trolley movement to checkpoint
-			self.trolley_mover_.setParameters(self.database_handler_)
-			self.trolley_mover_.executeBehavior()
-
-			for room_index in checkpoint.room_indices:
-
-				# Handling of selected room
-				cleaning_tasks = self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_
-				exploring_thread = threading.Thread(target = self.exploreRoom(room_counter))
-				exploring_thread.start()
-				if ((0 in cleaning_tasks) == True):
-					dirt_thread = threading.Thread(target = self.dirtRoutine(room_counter))
-					dirt_thread.start()
-				if ((-1 in cleaning_tasks) == True):
-					trashcan_thread = threading.Thread(target = self.trashcanRoutine(room_counter))
-					trashcan_thread.start()
-				exploring_thread.join()
-				
-				# Checkout the completed room
-				self.printMsg("ID of dry cleaned room: " + str(self.mapping_.get(room_counter)))
-				self.printMsg(str(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_))
-				room_counter = room_counter + 1
-				
+		# The dirt detection only runs during the dry cleaning
+		if (self.dirt_map_client_ != None):
+			self.dirt_map_client_.activateDirtDetection()
+
+		# The dirt and trashcan routines of a room run while the robot is exploring the room
+		self.task_runner_ = task_runner.TaskRunner(self.interrupt_var_)
+		self.task_runner_.start()
+		try:
+			for checkpoint in self.sequencing_result_.checkpoints:
+
+				# Trolley movement to checkpoint
+				self.trolley_mover_.setParameters(self.database_handler_)
+				self.trolley_mover_.executeBehavior()
+
+				for room_index in checkpoint.room_indices:
+
+					# Handling of selected room
+					cleaning_tasks = self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_
+					room_tasks = []
+					log_items = []
+					# the spot cleaning drives the robot, hence it follows the exploration
+					spot_cleaning = ((0 in cleaning_tasks) and (self.dirt_map_client_ != None))
+					if (((0 in cleaning_tasks) == True) and (spot_cleaning == False)):
+						room_tasks.append(self.task_runner_.submit(self.dirtRoutine, room_counter))
+					if ((-1 in cleaning_tasks) == True):
+						room_tasks.append(self.task_runner_.submit(self.trashcanRoutine, room_counter))
+					if ((self.use_coroutine_behaviors_ == True) and (self.dirt_map_client_ != None)):
+						coverage_percentage = self.exploreRoomAndPollDirtMap(room_counter)
+					else:
+						coverage_percentage = self.exploreRoom(room_counter)
+						self.reportDirt(room_counter)
+					self.registerObservation(room_counter, coverage_percentage)
+					if (spot_cleaning == True):
+						log_items.append(self.dirtRoutine(room_counter))
+					self.task_runner_.join(room_tasks)
+					self.checkoutRoom(room_counter, room_tasks, log_items)
+
+					# Interruption opportunity
+					if self.handleInterrupt() == 2:
+						self.updateDirtHistory(room_counter + 1)
+						return
+
+					# Checkout the completed room
+					self.printMsg("ID of dry cleaned room: " + str(self.mapping_.get(room_counter)))
+					self.printMsg(str(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_))
+					room_counter = room_counter + 1
+
+			self.updateDirtHistory(room_counter)
+		finally:
+			self.task_runner_.stop()
+			if (self.dirt_map_client_ != None):
+				self.dirt_map_client_.deactivateDirtDetection()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+# For the coverage paths
+from geometry_msgs.msg import PoseStamped
+# For map processing
+import math
+import numpy as np
+import cv2
+from cv_bridge import CvBridge, CvBridgeError
+
+
+class LocalCoveragePlanner():
+
+	#========================================================================
+	# Description:
+	# In-process boustrophedon coverage path planner for a single room.
+	# Takes the same inputs as RoomExplorationBehavior and serves as
+	# fallback if the room exploration server is not available and as
+	# fast planner for simple (nearly rectangular) rooms.
+	#========================================================================
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[LocalCoveragePlanner]: " + str(text)
+
+	# Method for setting the planning parameters
+	def setParameters(self, input_map, map_resolution, map_origin, robot_radius, coverage_radius, field_of_view):
+		self.input_map_ = input_map
+		self.map_resolution_ = map_resolution
+		self.map_origin_ = map_origin
+		self.robot_radius_ = robot_radius
+		self.coverage_radius_ = coverage_radius
+		self.field_of_view_ = field_of_view
+		# Distance in [m] between two consecutive poses on a sweep line
+		self.pose_spacing_ = 0.5
+
+	# Returns the room as binary image (1=room, 0=else)
+	def getRoomImage(self):
+		bridge = CvBridge()
+		room_map = bridge.imgmsg_to_cv2(self.input_map_, desired_encoding = "passthrough")
+		return (room_map == 255).astype(np.uint8)
+
+	# Returns the area which is accessible for the robot center (1=accessible, 0=else)
+	def getAccessibleArea(self, room_image):
+		radius_in_pixel = int(math.ceil(self.robot_radius_/self.map_resolution_))
+		kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*radius_in_pixel+1, 2*radius_in_pixel+1))
+		return cv2.erode(room_image, kernel)
+
+	# Returns True if the room nearly fills its bounding box (i.e. is a simple, rectangular room)
+	def isSimpleRoom(self, min_fill_ratio=0.9):
+		room_image = self.getRoomImage()
+		room_points = cv2.findNonZero(room_image)
+		if (room_points is None):
+			return False
+		x, y, width, height = cv2.boundingRect(room_points)
+		return (float(np.count_nonzero(room_image)) >= min_fill_ratio*width*height)
+
+	# Returns the width of the cleaned stripe and the lateral offset of its center from the robot center in [m]
+	def getCoverageStripe(self):
+		if ((self.field_of_view_ != None) and (len(self.field_of_view_) > 0)):
+			fov_y = np.array([point.y for point in self.field_of_view_])
+			return (fov_y.max() - fov_y.min()), 0.5*(fov_y.max() + fov_y.min())
+		return 2.*self.coverage_radius_, 0.
+
+	# Converts a pixel position and an orientation into a PoseStamped in map coordinates
+	def createPose(self, u, v, yaw, frame_id):
+		pose = PoseStamped()
+		pose.header.frame_id = frame_id
+		pose.pose.position.x = self.map_origin_.position.x + u*self.map_resolution_
+		pose.pose.position.y = self.map_origin_.position.y + v*self.map_resolution_
+		pose.pose.orientation.z = math.sin(0.5*yaw)
+		pose.pose.orientation.w = math.cos(0.5*yaw)
+		return pose
+
+	# Computes a boustrophedon path with horizontal sweep lines, returns a list of PoseStamped
+	def computeCoveragePath(self, frame_id="map"):
+		room_image = self.getRoomImage()
+		accessible_area = self.getAccessibleArea(room_image)
+		room_rows = np.flatnonzero(np.any(room_image, axis=1))
+		accessible_rows = np.flatnonzero(np.any(accessible_area, axis=1))
+		if ((room_rows.size == 0) or (accessible_rows.size == 0)):
+			self.printMsg("The room map is empty or not accessible for the robot.")
+			return []
+		stripe_width, stripe_offset_y = self.getCoverageStripe()
+		line_spacing_in_pixel = max(stripe_width/self.map_resolution_, 1.)
+		pose_spacing_in_pixel = max(int(self.pose_spacing_/self.map_resolution_), 1)
+		offset_y_in_pixel = stripe_offset_y/self.map_resolution_
+
+		# Rows of the cleaned stripe centers, the first and last stripe touch the room border
+		stripe_rows = np.arange(room_rows[0] + 0.5*line_spacing_in_pixel, room_rows[-1] + 0.5*line_spacing_in_pixel, line_spacing_in_pixel)
+
+		path = []
+		moving_forward = True
+		last_robot_row = None
+		for stripe_row in stripe_rows:
+			# driving in +x direction the stripe is shifted by +offset_y relative to the robot, in -x direction by -offset_y
+			if (moving_forward == True):
+				robot_row = int(round(stripe_row - offset_y_in_pixel))
+				yaw = 0.
+			else:
+				robot_row = int(round(stripe_row + offset_y_in_pixel))
+				yaw = math.pi
+			# stripes along the walls are swept from the closest accessible row
+			robot_row = int(accessible_rows[np.argmin(np.abs(accessible_rows - robot_row))])
+			if (robot_row == last_robot_row):
+				continue
+			last_robot_row = robot_row
+			# Free runs along the robot row: first and last column of each run
+			padded_row = np.concatenate(([0], accessible_area[robot_row, :], [0])).astype(np.int8)
+			changes = np.diff(padded_row)
+			run_starts = np.flatnonzero(changes == 1)
+			run_ends = np.flatnonzero(changes == -1) - 1
+			if (run_starts.size == 0):
+				continue
+			if (moving_forward == False):
+				run_starts, run_ends = run_ends[::-1], run_starts[::-1]
+			for run_start, run_end in zip(run_starts, run_ends):
+				step = pose_spacing_in_pixel if (run_end >= run_start) else -pose_spacing_in_pixel
+				columns = np.arange(run_start, run_end, step).tolist() + [run_end]
+				for u in columns:
+					path.append(self.createPose(u, robot_row, yaw, frame_id))
+			moving_forward = not moving_forward
+
+		self.printMsg("Computed coverage path with " + str(len(path)) + " poses on " + str(len(stripe_rows)) + " sweep lines.")
+		return path
@@ -18,12 +18,16 @@ class MapHandlingBehavior(behavior_container.BehaviorContainer):
 	#========================================================================
 	
 	# Method for setting parameters for the behavior
-	def setParameters(self, database_handler, rooms_list):
+	def setParameters(self, database_handler, rooms_list, room_sequence_cache=None, room_distance_matrix=None, start_position=None):
 		# Parameters set autonomously
 		self.room_sequencing_service_str_ = '/room_sequence_planning/room_sequence_planning_server'
 		# Parameters set from the outside
 		self.database_handler_ = database_handler
 		self.rooms_list_ = rooms_list
+		self.room_sequence_cache_ = room_sequence_cache
+		self.room_distance_matrix_ = room_distance_matrix
+		# Optional Point32 in [m] from which the room sequence starts, None = current robot position
+		self.start_position_ = start_position
 
 
 	# Method for returning to the standard pose of the robot
@@ -47,7 +51,11 @@ class MapHandlingBehavior(behavior_container.BehaviorContainer):
 		self.room_sequencer_.setParameters(
 			self.database_handler_.database_,
 			self.room_information_in_pixel_,
-			self.database_handler_.database_.robot_properties_.exploration_robot_radius_
+			self.database_handler_.database_.robot_properties_.exploration_robot_radius_,
+			[room.room_id_ for room in self.rooms_list_],
+			self.room_sequence_cache_,
+			distance_matrix=self.room_distance_matrix_,
+			start_position=self.start_position_
 			)
 		self.room_sequencer_.executeCustomBehavior()
 		self.room_sequencing_data_ = self.room_sequencer_.room_sequence_result_	
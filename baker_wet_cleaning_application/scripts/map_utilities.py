@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+#========================================================================
+# Description:
+# Helper functions for the handling of map images (sensor_msgs/Image)
+#========================================================================
+
+# For hashing
+import hashlib
+# For map cropping
+import copy
+import math
+import numpy as np
+import cv2
+from cv_bridge import CvBridge, CvBridgeError
+# For transit planning
+import heapq
+
+import path_utilities
+
+
+# Returns a hash string of the contents of a sensor_msgs/Image, which is identical for identical maps
+def hashImage(image_msg):
+	image_hash = hashlib.sha1()
+	image_hash.update(str(image_msg.height) + "x" + str(image_msg.width) + "_" + str(image_msg.encoding) + "_" + str(image_msg.step) + "_")
+	image_hash.update(image_msg.data)
+	return image_hash.hexdigest()
+
+
+
+# Crops a room map (white=room, black=else) to the bounding box of the room plus a margin in [m].
+# Returns the cropped map and the map origin of the cropped map, such that pixel coordinates
+# of the cropped map are converted to the same world coordinates as in the original map.
+# The map origin is assumed to be unrotated.
+def cropRoomMap(room_map_data, map_origin, map_resolution, margin=0.5):
+	bridge = CvBridge()
+	room_map = bridge.imgmsg_to_cv2(room_map_data, desired_encoding = "passthrough")
+	image_height, image_width = room_map.shape
+	room_rows = np.flatnonzero(np.any(room_map == 255, axis=1))
+	room_columns = np.flatnonzero(np.any(room_map == 255, axis=0))
+	# Nothing to crop for empty maps
+	if (room_rows.size == 0):
+		return room_map_data, map_origin
+	margin_in_pixel = int(math.ceil(margin/map_resolution))
+	v_min = max(room_rows[0] - margin_in_pixel, 0)
+	v_max = min(room_rows[-1] + margin_in_pixel + 1, image_height)
+	u_min = max(room_columns[0] - margin_in_pixel, 0)
+	u_max = min(room_columns[-1] + margin_in_pixel + 1, image_width)
+	cropped_map_data = bridge.cv2_to_imgmsg(np.ascontiguousarray(room_map[v_min:v_max, u_min:u_max]), encoding = "mono8")
+	cropped_map_origin = copy.deepcopy(map_origin)
+	cropped_map_origin.position.x = map_origin.position.x + u_min*map_resolution
+	cropped_map_origin.position.y = map_origin.position.y + v_min*map_resolution
+	return cropped_map_data, cropped_map_origin
+
+
+
+# Creates a coarse occupancy grid of the global map for transit planning (True=accessible for the robot center).
+# The free space (white) is eroded by the robot radius and a grid cell is only accessible if all of its pixels are.
+# Returns the grid and the cell size in pixels.
+def createTransitGrid(map_data, map_resolution, robot_radius, cell_size=0.2):
+	bridge = CvBridge()
+	map_image = bridge.imgmsg_to_cv2(map_data, desired_encoding = "passthrough")
+	free_space = (map_image == 255).astype(np.uint8)
+	radius_in_pixel = int(math.ceil(robot_radius/map_resolution))
+	kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*radius_in_pixel+1, 2*radius_in_pixel+1))
+	accessible_area = cv2.erode(free_space, kernel)
+	cell_size_in_pixel = max(int(round(cell_size/map_resolution)), 1)
+	grid_height = accessible_area.shape[0] // cell_size_in_pixel
+	grid_width = accessible_area.shape[1] // cell_size_in_pixel
+	cells = accessible_area[0:grid_height*cell_size_in_pixel, 0:grid_width*cell_size_in_pixel].reshape(grid_height, cell_size_in_pixel, grid_width, cell_size_in_pixel)
+	return cells.min(axis=(1, 3)) > 0, cell_size_in_pixel
+
+
+
+# Converts a world position [m] into a cell (row, column) of a transit grid
+def worldToCell(x, y, map_resolution, map_origin, cell_size_in_pixel):
+	return (int((y - map_origin.position.y)/(map_resolution*cell_size_in_pixel)), int((x - map_origin.position.x)/(map_resolution*cell_size_in_pixel)))
+
+
+
+# Converts a cell (row, column) of a transit grid into the world position [m] of the cell center
+def cellToWorld(cell, map_resolution, map_origin, cell_size_in_pixel):
+	return (map_origin.position.x + (cell[1] + 0.5)*cell_size_in_pixel*map_resolution, map_origin.position.y + (cell[0] + 0.5)*cell_size_in_pixel*map_resolution)
+
+
+
+# Returns the accessible cell closest to the given cell within max_distance cells, None if there is none
+def findNearestAccessibleCell(grid, cell, max_distance=5):
+	row_min = max(cell[0] - max_distance, 0)
+	column_min = max(cell[1] - max_distance, 0)
+	window = grid[row_min:cell[0]+max_distance+1, column_min:cell[1]+max_distance+1]
+	candidates = np.argwhere(window)
+	if (candidates.shape[0] == 0):
+		return None
+	distances = np.hypot(candidates[:, 0] + row_min - cell[0], candidates[:, 1] + column_min - cell[1])
+	nearest = candidates[int(np.argmin(distances))]
+	return (int(nearest[0]) + row_min, int(nearest[1]) + column_min)
+
+
+
+# Dijkstra search on a grid with 8-neighborhood (True=accessible).
+# Returns the distance field (in cells, inf=unreachable) and the predecessor index of each cell (-1=none).
+# The search stops early once goal_cell or the first cell of goal_mask has been settled.
+def computeDistanceField(grid, start_cell, goal_cell=None, goal_mask=None):
+	grid_height, grid_width = grid.shape
+	distances = np.full(grid.shape, np.inf)
+	predecessors = np.full(grid.shape, -1, np.int64)
+	if (grid[start_cell] == False):
+		return distances, predecessors
+	neighbors = [(-1, -1, math.sqrt(2.)), (-1, 0, 1.), (-1, 1, math.sqrt(2.)), (0, -1, 1.), (0, 1, 1.), (1, -1, math.sqrt(2.)), (1, 0, 1.), (1, 1, math.sqrt(2.))]
+	distances[start_cell] = 0.
+	queue = [(0., start_cell[0], start_cell[1])]
+	while (len(queue) > 0):
+		distance, row, column = heapq.heappop(queue)
+		if (distance > distances[row, column]):
+			continue
+		if ((goal_cell != None) and (row == goal_cell[0]) and (column == goal_cell[1])):
+			break
+		if ((goal_mask is not None) and (goal_mask[row, column] == True)):
+			break
+		for (d_row, d_column, step) in neighbors:
+			next_row = row + d_row
+			next_column = column + d_column
+			if ((next_row < 0) or (next_row >= grid_height) or (next_column < 0) or (next_column >= grid_width)):
+				continue
+			if ((grid[next_row, next_column] == False) or (distance + step >= distances[next_row, next_column])):
+				continue
+			distances[next_row, next_column] = distance + step
+			predecessors[next_row, next_column] = row*grid_width + column
+			heapq.heappush(queue, (distance + step, next_row, next_column))
+	return distances, predecessors
+
+
+
+# Plans a transit path between two world positions [x, y] on a transit grid (see createTransitGrid).
+# Returns a list of PoseStamped from start to goal or None if the goal is not reachable.
+def computeTransitPath(grid, cell_size_in_pixel, map_resolution, map_origin, start_position, goal_position, frame_id="map"):
+	start_cell = worldToCell(start_position[0], start_position[1], map_resolution, map_origin, cell_size_in_pixel)
+	goal_cell = worldToCell(goal_position[0], goal_position[1], map_resolution, map_origin, cell_size_in_pixel)
+	# positions on the room border may fall into cells which are blocked by the inflation
+	start_cell = findNearestAccessibleCell(grid, start_cell)
+	goal_cell = findNearestAccessibleCell(grid, goal_cell)
+	if ((start_cell == None) or (goal_cell == None)):
+		return None
+	distances, predecessors = computeDistanceField(grid, start_cell, goal_cell)
+	if (np.isinf(distances[goal_cell]) == True):
+		return None
+	# Trace the cells back from the goal
+	grid_width = grid.shape[1]
+	cells = [goal_cell]
+	index = predecessors[goal_cell]
+	while (index >= 0):
+		cells.append((int(index) // grid_width, int(index) % grid_width))
+		index = predecessors[cells[-1]]
+	cells.reverse()
+	# The exact start and goal positions replace the centers of the first and last cell
+	poses = np.zeros((max(len(cells), 2), 3))
+	poses[0, 0:2] = start_position
+	for i in range(1, len(cells)-1):
+		poses[i, 0:2] = cellToWorld(cells[i], map_resolution, map_origin, cell_size_in_pixel)
+	poses[-1, 0:2] = goal_position
+	return path_utilities.orientAlongPath(path_utilities.simplifyPath(path_utilities.arrayToPath(poses, frame_id), 0.5*cell_size_in_pixel*map_resolution))
+
+
+
+# Converts a room map (white=room) into a mask on a transit grid, a cell belongs to the room if all of its pixels do
+def createRoomMask(room_map_data, grid_shape, cell_size_in_pixel):
+	bridge = CvBridge()
+	room_map = bridge.imgmsg_to_cv2(room_map_data, desired_encoding = "passthrough")
+	grid_height, grid_width = grid_shape
+	cells = (room_map[0:grid_height*cell_size_in_pixel, 0:grid_width*cell_size_in_pixel] == 255).reshape(grid_height, cell_size_in_pixel, grid_width, cell_size_in_pixel)
+	return cells.min(axis=(1, 3))
+
+
+
+# Returns the cell of target_mask with the shortest path from start_position [x, y] on a transit grid and the path length in [m].
+# Returns (None, inf) if no cell of target_mask is reachable.
+def findClosestCell(grid, cell_size_in_pixel, map_resolution, map_origin, start_position, target_mask):
+	start_cell = worldToCell(start_position[0], start_position[1], map_resolution, map_origin, cell_size_in_pixel)
+	start_cell = findNearestAccessibleCell(grid, start_cell)
+	target_mask = np.logical_and(target_mask, grid)
+	if ((start_cell == None) or (np.any(target_mask) == False)):
+		return None, float("inf")
+	distances, predecessors = computeDistanceField(grid, start_cell, goal_mask=target_mask)
+	target_distances = np.where(target_mask, distances, np.inf)
+	closest_cell = np.unravel_index(int(np.argmin(target_distances)), target_distances.shape)
+	if (np.isinf(target_distances[closest_cell]) == True):
+		return None, float("inf")
+	return (int(closest_cell[0]), int(closest_cell[1])), target_distances[closest_cell]*cell_size_in_pixel*map_resolution
+
+
+
+# Compares the coverage image of the coverage monitor (covered pixels are drawn with 127) with the room map (white=room).
+# Returns the covered area in [m^2], the covered percentage of the room and the mask of the uncovered room pixels.
+def computeCoverage(room_map_data, coverage_map_data, map_resolution):
+	bridge = CvBridge()
+	room_mask = (bridge.imgmsg_to_cv2(room_map_data, desired_encoding = "passthrough") == 255)
+	coverage_map = bridge.imgmsg_to_cv2(coverage_map_data, desired_encoding = "passthrough")
+	uncovered_mask = room_mask & (coverage_map == 255)
+	room_pixels = np.count_nonzero(room_mask)
+	covered_pixels = room_pixels - np.count_nonzero(uncovered_mask)
+	if (room_pixels == 0):
+		return 0., 0., uncovered_mask
+	return covered_pixels*map_resolution*map_resolution, 100.*covered_pixels/room_pixels, uncovered_mask
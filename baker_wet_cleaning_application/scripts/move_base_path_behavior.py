@@ -2,18 +2,27 @@
 
 import rospy
 import actionlib
+import numpy as np
+import tf
 
+from actionlib_msgs.msg import GoalStatus
 from scitos_msgs.msg import MoveBasePathAction
 from scitos_msgs.msg import MoveBasePathGoal
 
 import behavior_container
+import path_utilities
+from room_sequencing_behavior import get_transform_listener
 
 class MoveBasePathBehavior(behavior_container.BehaviorContainer):
 
 	#========================================================================
 	# Description:
-	# Class which contains the behavior for making the robot follow 
+	# Class which contains the behavior for making the robot follow
 	# a specified trajectory
+	# Long paths can be streamed in overlapping chunks: the next chunk is
+	# sent as soon as the robot reaches the overlapping part of the current
+	# chunk. The reached poses are recorded such that an interrupted or
+	# failed path can be resumed instead of restarted.
 	#========================================================================
 
 	def __init__(self, behavior_name, interrupt_var, service_str):
@@ -28,22 +37,136 @@ class MoveBasePathBehavior(behavior_container.BehaviorContainer):
 		pass
 
 	# Method for setting parameters for the behavior
-	def setParameters(self, target_poses, area_map, path_tolerance, goal_position_tolerance, goal_angle_tolerance):
+	def setParameters(self, target_poses, area_map, path_tolerance, goal_position_tolerance, goal_angle_tolerance, chunk_size=0, chunk_overlap=3, start_pose_index=0, progress_callback=None):
 		self.target_poses_ = target_poses
 		self.area_map_ = area_map
 		self.path_tolerance_ = path_tolerance
 		self.goal_position_tolerance_ = goal_position_tolerance
 		self.goal_angle_tolerance_ = goal_angle_tolerance
+		# Number of poses per goal, 0 = send the whole path as one goal
+		self.chunk_size_ = chunk_size
+		# Number of poses at the end of a chunk which are repeated at the beginning of the next chunk
+		self.chunk_overlap_ = chunk_overlap
+		# Index of the first pose of target_poses to be driven (resumes an interrupted path)
+		self.start_pose_index_ = start_pose_index
+		# Number of times a failed chunk is resent from the last reached pose
+		self.chunk_retries_ = 1
+		# Optional function which is called with last_reached_pose_index_ whenever a chunk is completed or the path is stopped
+		self.progress_callback_ = progress_callback
+		# Progress of the path: index of the last completed chunk and of the last reached pose
+		self.last_completed_chunk_index_ = -1
+		self.last_reached_pose_index_ = start_pose_index - 1
+		self.move_base_path_result_ = None
 
-	# Implemented Behavior
-	def executeCustomBehavior(self):
+	# Returns True if all poses of the path have been driven
+	def pathCompleted(self):
+		return (self.last_reached_pose_index_ >= len(self.target_poses_) - 1)
+
+	# Report the last reached pose to the progress callback
+	def reportProgress(self):
+		if (self.progress_callback_ != None):
+			self.progress_callback_(self.last_reached_pose_index_)
+
+	# Create the goal for the poses [first_pose_index, end_pose_index)
+	def createGoal(self, first_pose_index, end_pose_index):
 		move_base_path_goal = MoveBasePathGoal()
-		move_base_path_goal.target_poses = self.target_poses_
+		move_base_path_goal.target_poses = self.target_poses_[first_pose_index:end_pose_index]
 		move_base_path_goal.area_map = self.area_map_
 		move_base_path_goal.path_tolerance = self.path_tolerance_
 		move_base_path_goal.goal_position_tolerance = self.goal_position_tolerance_
 		move_base_path_goal.goal_angle_tolerance = self.goal_angle_tolerance_
+		return move_base_path_goal
+
+	# Returns the current robot position [x, y] in the frame of the path or None if it is unknown
+	def currentRobotPosition(self):
+		try:
+			listener = get_transform_listener()
+			frame_id = self.target_poses_[0].header.frame_id
+			if (frame_id == ""):
+				frame_id = "/map"
+			(translation, rotation) = listener.lookupTransform(frame_id, '/base_link', rospy.Time(0))
+		except (tf.Exception, tf.LookupException, tf.ConnectivityException, tf.ExtrapolationException), e:
+			return None
+		return np.array([translation[0], translation[1]])
+
+	# Update last_reached_pose_index_ with the poses of [first_pose_index, end_pose_index) close to the robot
+	def updateReachedPose(self, path_positions, first_pose_index, end_pose_index):
+		robot_position = self.currentRobotPosition()
+		if (robot_position is None):
+			return
+		search_start = max(first_pose_index, self.last_reached_pose_index_ + 1)
+		if (search_start >= end_pose_index):
+			return
+		distances = np.hypot(path_positions[search_start:end_pose_index, 0] - robot_position[0], path_positions[search_start:end_pose_index, 1] - robot_position[1])
+		reached = np.flatnonzero(distances <= self.goal_position_tolerance_)
+		if (reached.size > 0):
+			self.last_reached_pose_index_ = search_start + int(reached[-1])
+
+	# Drive the path in chunks of chunk_size_ poses
+	def executeChunkedPath(self, move_base_path_client):
+		path_positions = path_utilities.pathToArray(self.target_poses_)[:, 0:2]
+		number_poses = len(self.target_poses_)
+		overlap = min(self.chunk_overlap_, self.chunk_size_ - 1)
+		chunk_index = self.last_completed_chunk_index_ + 1
+		first_pose_index = max(self.start_pose_index_, 0)
+		retries = 0
+		while (first_pose_index < number_poses):
+			end_pose_index = min(first_pose_index + self.chunk_size_, number_poses)
+			is_last_chunk = (end_pose_index == number_poses)
+			# the next chunk is sent when the robot reaches the first overlapping pose
+			handover_pose_index = end_pose_index - 1 - overlap
+			self.printMsg("Sending chunk " + str(chunk_index) + " with poses " + str(first_pose_index) + " to " + str(end_pose_index-1) + " of " + str(number_poses) + ".")
+			move_base_path_client.send_goal(self.createGoal(first_pose_index, end_pose_index))
+			handed_over = False
+			while ((move_base_path_client.get_state() in [GoalStatus.PENDING, GoalStatus.ACTIVE]) and (handed_over == False)):
+				if (self.executionInterrupted()==True or rospy.is_shutdown()==True):
+					move_base_path_client.cancel_goal()
+					move_base_path_client.wait_for_result(rospy.Duration(5.0))
+					self.start_pose_index_ = self.last_reached_pose_index_ + 1
+					self.reportProgress()
+					return self.handleInterrupt()
+				rospy.sleep(0.2)
+				self.updateReachedPose(path_positions, first_pose_index, end_pose_index)
+				handed_over = ((is_last_chunk == False) and (self.last_reached_pose_index_ >= handover_pose_index))
+			if (handed_over == True or move_base_path_client.get_state() == GoalStatus.SUCCEEDED):
+				if (handed_over == False):
+					self.last_reached_pose_index_ = max(self.last_reached_pose_index_, end_pose_index - 1)
+				self.last_completed_chunk_index_ = chunk_index
+				self.reportProgress()
+				chunk_index = chunk_index + 1
+				# every chunk advances by at least one pose, also for chunk_size_ = 1
+				first_pose_index = max(self.last_reached_pose_index_, end_pose_index - 1 - overlap, first_pose_index + 1)
+				if (is_last_chunk == True):
+					break
+				retries = 0
+			elif (retries < self.chunk_retries_):
+				retries = retries + 1
+				first_pose_index = max(self.last_reached_pose_index_, first_pose_index)
+				self.printMsg("Chunk " + str(chunk_index) + " failed, resending it from pose " + str(first_pose_index) + ".")
+			else:
+				self.printMsg("Chunk " + str(chunk_index) + " failed.")
+				self.start_pose_index_ = self.last_reached_pose_index_ + 1
+				self.reportProgress()
+				return None
+		self.start_pose_index_ = number_poses
+		return move_base_path_client.get_result()
+
+	# Implemented Behavior
+	def executeCustomBehavior(self):
 		move_base_path_client = actionlib.SimpleActionClient(self.service_str_, MoveBasePathAction)
+		if (self.start_pose_index_ >= len(self.target_poses_)):
+			self.printMsg("All poses of the path have been driven already.")
+			return
 		self.printMsg("Running move_base_path action...")
-		self.move_base_path_result_ = self.runAction(move_base_path_client, move_base_path_goal)
-		self.printMsg("move_base_path completed.")
\ No newline at end of file
+		if (self.chunk_size_ <= 0 or len(self.target_poses_) - self.start_pose_index_ <= self.chunk_size_):
+			self.move_base_path_result_ = self.runAction(move_base_path_client, self.createGoal(self.start_pose_index_, len(self.target_poses_)))
+			if (move_base_path_client.get_state() == GoalStatus.SUCCEEDED):
+				self.last_reached_pose_index_ = len(self.target_poses_) - 1
+				self.last_completed_chunk_index_ = self.last_completed_chunk_index_ + 1
+				self.start_pose_index_ = len(self.target_poses_)
+				self.reportProgress()
+		else:
+			self.printMsg("Waiting for action " + str(self.service_str_) + " to become available...")
+			move_base_path_client.wait_for_server()
+			self.move_base_path_result_ = self.executeChunkedPath(move_base_path_client)
+		self.printMsg("move_base_path completed.")
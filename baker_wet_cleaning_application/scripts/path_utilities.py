@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+#========================================================================
+# Description:
+# Helper functions for the handling of paths (lists of PoseStamped)
+#========================================================================
+
+# For the paths
+from geometry_msgs.msg import PoseStamped
+# For the path processing
+import math
+import numpy as np
+
+
+# Converts a list of PoseStamped into an array of [x, y, yaw]
+def pathToArray(path, dtype=np.float64):
+	poses = np.zeros((len(path), 3), dtype)
+	for i in range(len(path)):
+		orientation = path[i].pose.orientation
+		poses[i, 0] = path[i].pose.position.x
+		poses[i, 1] = path[i].pose.position.y
+		poses[i, 2] = 2.*math.atan2(orientation.z, orientation.w)
+	return poses
+
+
+
+# Converts an array of [x, y, yaw] into a list of PoseStamped
+def arrayToPath(poses, frame_id):
+	path = []
+	for i in range(poses.shape[0]):
+		pose = PoseStamped()
+		pose.header.frame_id = frame_id
+		pose.pose.position.x = float(poses[i, 0])
+		pose.pose.position.y = float(poses[i, 1])
+		pose.pose.orientation.z = math.sin(0.5*float(poses[i, 2]))
+		pose.pose.orientation.w = math.cos(0.5*float(poses[i, 2]))
+		path.append(pose)
+	return path
+
+
+
+# Returns the path driven in the opposite direction (reversed order, orientations turned by 180 degrees)
+def reversePath(path):
+	if (len(path) == 0):
+		return path
+	poses = pathToArray(path)[::-1]
+	poses[:, 2] = poses[:, 2] + math.pi
+	return arrayToPath(poses, path[0].header.frame_id)
+
+
+
+# Returns the indices of the points which are kept by the Douglas-Peucker algorithm,
+# i.e. no removed point has a larger distance than tolerance to the simplified polyline
+def douglasPeucker(points, tolerance):
+	number_points = points.shape[0]
+	if (number_points < 3):
+		return np.arange(number_points)
+	keep = np.zeros(number_points, np.bool_)
+	keep[0] = True
+	keep[-1] = True
+	segments = [(0, number_points-1)]
+	while (len(segments) > 0):
+		first, last = segments.pop()
+		if (last - first < 2):
+			continue
+		# distances of all intermediate points to the line segment first-last
+		segment = points[last] - points[first]
+		segment_length = math.hypot(segment[0], segment[1])
+		offsets = points[first+1:last] - points[first]
+		if (segment_length > 1e-9):
+			projections = np.clip(np.dot(offsets, segment)/(segment_length*segment_length), 0., 1.)
+			distances = np.hypot(offsets[:, 0] - projections*segment[0], offsets[:, 1] - projections*segment[1])
+		else:
+			distances = np.hypot(offsets[:, 0], offsets[:, 1])
+		farthest = int(np.argmax(distances))
+		if (distances[farthest] > tolerance):
+			split = first + 1 + farthest
+			keep[split] = True
+			segments.append((first, split))
+			segments.append((split, last))
+	return np.flatnonzero(keep)
+
+
+
+# Sets the orientation of each pose to the driving direction towards the next pose, the last pose keeps the incoming direction
+def orientAlongPath(path):
+	if (len(path) < 2):
+		return path
+	poses = pathToArray(path)
+	directions = np.arctan2(np.diff(poses[:, 1]), np.diff(poses[:, 0]))
+	poses[:-1, 2] = directions
+	poses[-1, 2] = directions[-1]
+	return arrayToPath(poses, path[0].header.frame_id)
+
+
+
+# Simplifies a coverage path: removes duplicate and (nearly) collinear poses with the Douglas-Peucker algorithm.
+# The kept poses keep the orientation of the planner, only at small jogs (turn below max_jog_angle in [rad])
+# the orientation is smoothed to the mean of the incoming and outgoing driving direction.
+# tolerance: maximum distance in [m] of a removed pose to the simplified path
+def simplifyPath(path, tolerance=0.05, min_distance=0.01, max_jog_angle=0.25*math.pi):
+	if (len(path) < 3):
+		return path
+	poses = pathToArray(path)
+	# Remove duplicates of the last kept pose
+	kept = [0]
+	for i in range(1, poses.shape[0]):
+		if (math.hypot(poses[i, 0] - poses[kept[-1], 0], poses[i, 1] - poses[kept[-1], 1]) > min_distance):
+			kept.append(i)
+	poses = poses[kept]
+	# Merge collinear segments
+	poses = poses[douglasPeucker(poses[:, 0:2], tolerance)]
+	# Smooth the orientations at the interior jogs, corners (e.g. the ends of the sweep lines) keep the planned orientation
+	if (poses.shape[0] >= 3):
+		directions = np.arctan2(np.diff(poses[:, 1]), np.diff(poses[:, 0]))
+		turns = np.arctan2(np.sin(directions[1:] - directions[:-1]), np.cos(directions[1:] - directions[:-1]))
+		jogs = np.flatnonzero(np.abs(turns) <= max_jog_angle)
+		poses[jogs + 1, 2] = directions[jogs] + 0.5*turns[jogs]
+	return arrayToPath(poses, path[0].header.frame_id)
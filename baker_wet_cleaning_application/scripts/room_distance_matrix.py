@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+# For the cache storage
+import hashlib
+import os
+import threading
+# For the distance computation
+import numpy as np
+
+import map_utilities
+
+
+class RoomDistanceMatrix():
+
+	#========================================================================
+	# Description:
+	# Travel distances in [m] between all rooms of the database, measured
+	# on the global map inflated by the robot radius. A room is represented
+	# by its first entry pose, otherwise by its room center. The matrix is
+	# stored in a cache file and only recomputed if the global map, the
+	# robot radius or the room positions change.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, cache_filename, cell_size=0.2):
+		self.cache_filename_ = cache_filename
+		# Cell size in [m] of the transit grid on which the distances are computed
+		self.cell_size_ = cell_size
+		# Maximum distance in cells from a room position to the next accessible cell
+		self.max_cell_offset_ = 10
+		self.key_ = None
+		self.room_ids_ = []
+		self.room_positions_ = np.zeros((0, 2))
+		self.distances_ = np.zeros((0, 0))
+		# room_id --> row of the distance matrix
+		self.room_index_ = {}
+		# Transit grid of the global map, only created if distances have to be computed
+		self.grid_ = None
+		self.cell_size_in_pixel_ = 1
+		self.lock_ = threading.Lock()
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[RoomDistanceMatrix]: " + str(text)
+
+	# Returns the ids and the positions [x, y] in [m] of all rooms of the database
+	def computeRoomPositions(self, database):
+		room_ids = []
+		room_positions = []
+		for room in database.rooms_:
+			if (len(room.room_entry_poses_) > 0):
+				room_positions.append([room.room_entry_poses_[0][0], room.room_entry_poses_[0][1]])
+			elif (room.room_information_in_meter_ != None):
+				room_positions.append([room.room_information_in_meter_.room_center.x, room.room_information_in_meter_.room_center.y])
+			else:
+				continue
+			room_ids.append(room.room_id_)
+		return room_ids, np.array(room_positions, np.float64).reshape(-1, 2)
+
+	# Compute the key of the distance matrix
+	def computeKey(self, database, robot_radius, room_ids, room_positions):
+		key_hash = hashlib.sha1()
+		key_hash.update(map_utilities.hashImage(database.global_map_data_.map_image_))
+		key_hash.update("_" + str(round(robot_radius, 4)) + "_" + str(round(self.cell_size_, 4)) + "_")
+		key_hash.update(str(room_ids))
+		key_hash.update(str(np.round(room_positions, 2).tolist()))
+		return key_hash.hexdigest()
+
+	# Read the cache file, returns True if it contains the matrix with the given key
+	def loadMatrix(self, key):
+		if (os.path.isfile(self.cache_filename_) == False):
+			return False
+		try:
+			cache_file = np.load(self.cache_filename_)
+			if (str(cache_file["key"]) != key):
+				return False
+			self.room_ids_ = cache_file["room_ids"].tolist()
+			self.room_positions_ = cache_file["room_positions"]
+			self.distances_ = cache_file["distances"]
+		except Exception, e:
+			self.printMsg("Could not read cache file " + str(self.cache_filename_) + ": %s" % e)
+			return False
+		return True
+
+	# Write the cache file
+	def saveMatrix(self):
+		cache_directory = os.path.dirname(self.cache_filename_)
+		if ((cache_directory != "") and (os.path.isdir(cache_directory) == False)):
+			os.makedirs(cache_directory)
+		# np.savez appends .npz to file names without this extension
+		tmp_cache_filename = self.cache_filename_ + ".tmp.npz"
+		np.savez(tmp_cache_filename, key=np.array(self.key_), room_ids=np.array(self.room_ids_, np.int64),
+			room_positions=self.room_positions_, distances=self.distances_)
+		os.rename(tmp_cache_filename, self.cache_filename_)
+
+	# Create the transit grid of the global map
+	def createGrid(self, database, robot_radius):
+		self.grid_, self.cell_size_in_pixel_ = map_utilities.createTransitGrid(database.global_map_data_.map_image_,
+			database.global_map_data_.map_resolution_, robot_radius, self.cell_size_)
+		self.map_resolution_ = database.global_map_data_.map_resolution_
+		self.map_origin_ = database.global_map_data_.map_origin_
+
+	# Returns the accessible grid cell of a position [x, y] in [m], None if there is none nearby
+	def getCell(self, position):
+		cell = map_utilities.worldToCell(position[0], position[1], self.map_resolution_, self.map_origin_, self.cell_size_in_pixel_)
+		return map_utilities.findNearestAccessibleCell(self.grid_, cell, self.max_cell_offset_)
+
+	# Returns the travel distances in [m] from a position [x, y] to the given positions, inf if not reachable
+	def computeDistances(self, position, positions):
+		distances = np.full(len(positions), np.inf)
+		start_cell = self.getCell(position)
+		if (start_cell == None):
+			return distances
+		distance_field, predecessors = map_utilities.computeDistanceField(self.grid_, start_cell)
+		for i in range(len(positions)):
+			cell = self.getCell(positions[i])
+			if (cell != None):
+				distances[i] = distance_field[cell]*self.cell_size_in_pixel_*self.map_resolution_
+		return distances
+
+	# Replaces the unreachable distances by the straight line distances
+	def fillUnreachable(self, distances, position, positions):
+		unreachable = np.isinf(distances)
+		if (np.any(unreachable) == True):
+			distances[unreachable] = np.hypot(positions[unreachable, 0] - position[0], positions[unreachable, 1] - position[1])
+		return distances
+
+	# Make sure the distance matrix belongs to the current global map, load it from the cache or compute it
+	def update(self, database, robot_radius):
+		with self.lock_:
+			room_ids, room_positions = self.computeRoomPositions(database)
+			key = self.computeKey(database, robot_radius, room_ids, room_positions)
+			if (key == self.key_):
+				return
+			self.key_ = key
+			if (self.loadMatrix(key) == True):
+				# the grid of a previous map is created again on demand
+				self.grid_ = None
+			else:
+				self.printMsg("Computing the travel distances between " + str(len(room_ids)) + " rooms.")
+				self.createGrid(database, robot_radius)
+				self.room_ids_ = room_ids
+				self.room_positions_ = room_positions
+				self.distances_ = np.zeros((len(room_ids), len(room_ids)))
+				for i in range(len(room_ids)):
+					distances = self.computeDistances(room_positions[i], room_positions)
+					if (np.any(np.isinf(distances)) == True):
+						self.printMsg("Warning: room " + str(room_ids[i]) + " cannot reach all other rooms, using straight line distances.")
+					self.distances_[i] = self.fillUnreachable(distances, room_positions[i], room_positions)
+				# the distances from and to a room may differ slightly due to the accessible cell search
+				self.distances_ = 0.5*(self.distances_ + self.distances_.T)
+				self.saveMatrix()
+			self.room_index_ = dict((room_id, i) for i, room_id in enumerate(self.room_ids_))
+
+	# Returns the travel distance in [m] between two rooms
+	def getDistance(self, room_id_a, room_id_b):
+		return self.distances_[self.room_index_[room_id_a], self.room_index_[room_id_b]]
+
+	# Returns the distance matrix of the given rooms
+	def getMatrix(self, room_ids):
+		indices = [self.room_index_[room_id] for room_id in room_ids]
+		return self.distances_[np.ix_(indices, indices)]
+
+	# Returns the positions [x, y] in [m] which represent the given rooms
+	def getRoomPositions(self, room_ids):
+		return self.room_positions_[[self.room_index_[room_id] for room_id in room_ids]].reshape(-1, 2)
+
+	# Returns the travel distances in [m] from a position [x, y] (e.g. the robot) to the given rooms
+	def getDistancesFromPosition(self, position, room_ids, database, robot_radius):
+		with self.lock_:
+			if (self.grid_ is None):
+				self.createGrid(database, robot_radius)
+			room_positions = self.getRoomPositions(room_ids)
+			return self.fillUnreachable(self.computeDistances(position, room_positions), position, room_positions)
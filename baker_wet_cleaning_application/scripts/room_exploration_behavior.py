@@ -6,6 +6,7 @@ import actionlib
 from ipa_building_msgs.msg import *
 
 import behavior_container
+import local_coverage_planner
 
 class RoomExplorationBehavior(behavior_container.BehaviorContainer):
 
@@ -19,6 +20,9 @@ class RoomExplorationBehavior(behavior_container.BehaviorContainer):
 		self.behavior_name_ = behavior_name
 		self.interrupt_var_ = interrupt_var
 		self.service_str_ = service_str
+		# Time in [s] to wait for the room exploration server to become available and to compute a path
+		self.server_timeout_ = 5.0
+		self.planning_timeout_ = 120.0
 
 	# Method for returning to the standard pose of the robot
 	def returnToRobotStandardState(self):
@@ -27,7 +31,7 @@ class RoomExplorationBehavior(behavior_container.BehaviorContainer):
 		pass
 
 	# Method for setting parameters for the behavior
-	def setParameters(self, input_map, map_resolution, map_origin, robot_radius, coverage_radius, field_of_view, starting_position, planning_mode):
+	def setParameters(self, input_map, map_resolution, map_origin, robot_radius, coverage_radius, field_of_view, starting_position, planning_mode, path_cache=None, local_planning_mode=1, map_frame_id="map"):
 		self.input_map_ = input_map
 		self.map_resolution_ = map_resolution
 		self.map_origin_ = map_origin
@@ -36,9 +40,50 @@ class RoomExplorationBehavior(behavior_container.BehaviorContainer):
 		self.field_of_view_ = field_of_view
 		self.starting_position_ = starting_position
 		self.planning_mode_ = planning_mode
+		# Optional CoveragePathCache, None = always ask the room exploration server
+		self.path_cache_ = path_cache
+		# Usage of the LocalCoveragePlanner: 0=never, 1=fallback if the server fails, 2=fallback and for simple rooms
+		self.local_planning_mode_ = local_planning_mode
+		# Frame of the locally planned poses
+		self.map_frame_id_ = map_frame_id
+
+	# Compute the exploration path with the provided LocalCoveragePlanner
+	def computeLocalPath(self, local_planner):
+		self.exploration_result_ = RoomExplorationResult()
+		self.exploration_result_.coverage_path_pose_stamped = local_planner.computeCoveragePath(self.map_frame_id_)
+		if (len(self.exploration_result_.coverage_path_pose_stamped) == 0):
+			self.exploration_result_ = None
+
+	# Returns the key of the requested path in the path cache, None if there is no cache
+	def computePathKey(self):
+		if (self.path_cache_ == None):
+			return None
+		return self.path_cache_.computeKey(self.input_map_, self.map_resolution_, self.map_origin_, self.robot_radius_,
+			self.coverage_radius_, self.field_of_view_, self.starting_position_, self.planning_mode_)
 
 	# Implemented Behavior
 	def executeCustomBehavior(self):
+		# True if the computation was aborted by an interruption, the result is incomplete then
+		self.interrupted_ = False
+		# Look up the path in the cache first
+		cache_key = self.computePathKey()
+		if (cache_key != None):
+			cached_path = self.path_cache_.loadPath(cache_key)
+			if (cached_path != None):
+				self.exploration_result_ = RoomExplorationResult()
+				self.exploration_result_.coverage_path_pose_stamped = cached_path
+				self.printMsg("Exploration path loaded from cache with length " + str(len(cached_path)))
+				return
+
+		local_planner = local_coverage_planner.LocalCoveragePlanner()
+		local_planner.setParameters(self.input_map_, self.map_resolution_, self.map_origin_, self.robot_radius_, self.coverage_radius_, self.field_of_view_)
+
+		# Simple rooms do not need the room exploration server
+		if ((self.local_planning_mode_ == 2) and (local_planner.isSimpleRoom() == True)):
+			self.printMsg("Simple room, planning the exploration path locally.")
+			self.computeLocalPath(local_planner)
+			return
+
 		exploration_goal = RoomExplorationGoal()
 		exploration_goal.input_map = self.input_map_
 		exploration_goal.map_resolution = self.map_resolution_
@@ -49,8 +94,23 @@ class RoomExplorationBehavior(behavior_container.BehaviorContainer):
 		exploration_goal.starting_position = self.starting_position_
 		exploration_goal.planning_mode = self.planning_mode_
 		exploration_client = actionlib.SimpleActionClient(self.service_str_, RoomExplorationAction)
-		self.printMsg("Running room exploration action...")
-		self.exploration_result_ = self.runAction(exploration_client, exploration_goal)
-		if (self.exploration_result_ != None):
+		if (exploration_client.wait_for_server(rospy.Duration(self.server_timeout_)) == True):
+			self.printMsg("Running room exploration action...")
+			self.exploration_result_ = self.runAction(exploration_client, exploration_goal, self.planning_timeout_)
+			# runAction returns the interruption code if the goal was cancelled by an interruption
+			self.interrupted_ = isinstance(self.exploration_result_, int)
+		else:
+			self.printMsg("Room exploration server " + str(self.service_str_) + " is not available.")
+			self.exploration_result_ = None
+		if ((self.interrupted_ == True) or (self.executionInterrupted() == True)):
+			self.interrupted_ = True
+			self.exploration_result_ = None
+			return
+		if ((self.exploration_result_ == None) and (self.local_planning_mode_ != 0)):
+			self.printMsg("Room exploration server failed, planning the exploration path locally.")
+			self.computeLocalPath(local_planner)
+		elif (self.exploration_result_ != None):
 			self.printMsg("Exploration path received with length " + str(len(self.exploration_result_.coverage_path_pose_stamped)))
+			if (cache_key != None):
+				self.path_cache_.savePath(cache_key, self.exploration_result_.coverage_path_pose_stamped)
 		self.printMsg("Room exploration action completed.")
\ No newline at end of file
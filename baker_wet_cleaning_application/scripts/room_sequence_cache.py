@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# For the cache storage
+import collections
+import cPickle
+import os
+import threading
+from StringIO import StringIO
+# For the room sequence results
+from ipa_building_msgs.msg import *
+
+import map_utilities
+
+
+class RoomSequenceCache():
+
+	#========================================================================
+	# Description:
+	# Persistent LRU cache of FindRoomSequenceWithCheckpoints results.
+	# A result is identified by the sequenced rooms, the global map,
+	# the robot radius and the grid-rounded robot start coordinate.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, cache_filename, capacity=20, start_coordinate_grid=1.0):
+		self.cache_filename_ = cache_filename
+		# Maximum number of stored results
+		self.capacity_ = capacity
+		# Grid size in [m] to which the robot start coordinate is rounded
+		self.start_coordinate_grid_ = start_coordinate_grid
+		# key --> serialized FindRoomSequenceWithCheckpointsResult, least recently used first
+		self.entries_ = collections.OrderedDict()
+		self.lock_ = threading.Lock()
+		self.loadCache()
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[RoomSequenceCache]: " + str(text)
+
+	# Read the cache file, start with an empty cache if it cannot be read
+	def loadCache(self):
+		if (os.path.isfile(self.cache_filename_) == False):
+			return
+		try:
+			cache_file = open(self.cache_filename_, "rb")
+			self.entries_ = cPickle.load(cache_file)
+			cache_file.close()
+		except Exception, e:
+			self.printMsg("Could not read cache file " + str(self.cache_filename_) + ": %s" % e)
+			self.entries_ = collections.OrderedDict()
+
+	# Write the cache file
+	def saveCache(self):
+		cache_directory = os.path.dirname(self.cache_filename_)
+		if ((cache_directory != "") and (os.path.isdir(cache_directory) == False)):
+			os.makedirs(cache_directory)
+		tmp_cache_filename = self.cache_filename_ + ".tmp"
+		cache_file = open(tmp_cache_filename, "wb")
+		cPickle.dump(self.entries_, cache_file, cPickle.HIGHEST_PROTOCOL)
+		cache_file.close()
+		os.rename(tmp_cache_filename, self.cache_filename_)
+
+	# Compute the key of a room sequence request
+	def computeKey(self, room_ids, map_image, robot_radius, robot_start_coordinate):
+		return (tuple(room_ids), map_utilities.hashImage(map_image), round(robot_radius, 4),
+			int(round(robot_start_coordinate.x/self.start_coordinate_grid_)), int(round(robot_start_coordinate.y/self.start_coordinate_grid_)))
+
+	# Returns the cached FindRoomSequenceWithCheckpointsResult or None if there is no such result
+	def getResult(self, key):
+		with self.lock_:
+			if ((key in self.entries_) == False):
+				return None
+			# mark as most recently used
+			serialized_result = self.entries_.pop(key)
+			self.entries_[key] = serialized_result
+		result = FindRoomSequenceWithCheckpointsResult()
+		result.deserialize(serialized_result)
+		return result
+
+	# Store the checkpoints of the given FindRoomSequenceWithCheckpointsResult under the given key
+	def storeResult(self, key, room_sequence_result):
+		# the sequence map is not needed by the application, only keep the checkpoints
+		stripped_result = FindRoomSequenceWithCheckpointsResult()
+		stripped_result.checkpoints = room_sequence_result.checkpoints
+		buff = StringIO()
+		stripped_result.serialize(buff)
+		with self.lock_:
+			if (key in self.entries_):
+				self.entries_.pop(key)
+			self.entries_[key] = buff.getvalue()
+			while (len(self.entries_) > self.capacity_):
+				self.entries_.popitem(last=False)
+			self.saveCache()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# For the sequencing result
+from geometry_msgs.msg import Point32
+from ipa_building_msgs.msg import FindRoomSequenceWithCheckpointsResult, RoomSequence
+# For the tour optimization
+import numpy as np
+
+
+class RoomSequenceSolver():
+
+	#========================================================================
+	# Description:
+	# In-process room sequencing: orders the rooms with a nearest neighbor
+	# tour improved by 2-opt and groups consecutive rooms into trolley
+	# checkpoints. Returns the same structure as the room sequencing
+	# server (FindRoomSequenceWithCheckpointsResult).
+	#========================================================================
+
+	# Constructor
+	def __init__(self, trolley_radius=10.0):
+		# Maximum travel distance in [m] between the trolley checkpoint and the rooms of the checkpoint
+		self.trolley_radius_ = trolley_radius
+		# Maximum number of 2-opt improvement rounds
+		self.max_improvement_rounds_ = 100
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[RoomSequenceSolver]: " + str(text)
+
+	# Returns the length of the open tour, starting at the robot
+	def getTourLength(self, tour, distance_matrix, start_distances):
+		if (len(tour) == 0):
+			return 0.
+		return start_distances[tour[0]] + sum(distance_matrix[tour[i], tour[i+1]] for i in range(len(tour)-1))
+
+	# Nearest neighbor tour from the robot position
+	def computeNearestNeighborTour(self, distance_matrix, start_distances):
+		number_rooms = distance_matrix.shape[0]
+		visited = np.zeros(number_rooms, np.bool_)
+		tour = [int(np.argmin(start_distances))]
+		visited[tour[0]] = True
+		for i in range(number_rooms - 1):
+			distances = np.where(visited, np.inf, distance_matrix[tour[-1]])
+			tour.append(int(np.argmin(distances)))
+			visited[tour[-1]] = True
+		return tour
+
+	# Improves an open tour with fixed start (the robot) by reversing segments (2-opt)
+	def improveTour(self, tour, distance_matrix, start_distances):
+		tour = list(tour)
+		for improvement_round in range(self.max_improvement_rounds_):
+			improved = False
+			for i in range(len(tour) - 1):
+				# cost of the edge in front of tour[i], the first room is connected to the robot
+				if (i == 0):
+					edge_in = start_distances[tour[0]]
+				else:
+					edge_in = distance_matrix[tour[i-1], tour[i]]
+				for j in range(i + 1, len(tour)):
+					if (i == 0):
+						new_edge_in = start_distances[tour[j]]
+					else:
+						new_edge_in = distance_matrix[tour[i-1], tour[j]]
+					edge_out = distance_matrix[tour[j], tour[j+1]] if (j + 1 < len(tour)) else 0.
+					new_edge_out = distance_matrix[tour[i], tour[j+1]] if (j + 1 < len(tour)) else 0.
+					if (new_edge_in + new_edge_out < edge_in + edge_out - 1e-6):
+						tour[i:j+1] = tour[i:j+1][::-1]
+						improved = True
+						if (i == 0):
+							edge_in = start_distances[tour[0]]
+						else:
+							edge_in = distance_matrix[tour[i-1], tour[i]]
+			if (improved == False):
+				break
+		return tour
+
+	# Returns the member of the group with the smallest maximum distance to all other members and this distance
+	def getGroupCenter(self, group, distance_matrix):
+		max_distances = distance_matrix[np.ix_(group, group)].max(axis=1)
+		center = int(np.argmin(max_distances))
+		return group[center], max_distances[center]
+
+	# Splits the tour into groups of consecutive rooms which can be reached from one trolley position
+	def computeCheckpoints(self, tour, distance_matrix):
+		groups = []
+		for room_index in tour:
+			if (len(groups) > 0):
+				center, radius = self.getGroupCenter(groups[-1] + [room_index], distance_matrix)
+				if (radius <= self.trolley_radius_):
+					groups[-1].append(room_index)
+					continue
+			groups.append([room_index])
+		return groups
+
+	# Compute the room sequence.
+	# room_positions: array of room positions [x, y] in [m] (e.g. room centers or entry poses)
+	# distance_matrix: travel distances in [m] between the rooms
+	# start_distances: travel distances in [m] from the robot to the rooms
+	def computeSequence(self, room_positions, distance_matrix, start_distances, map_resolution, map_origin):
+		room_sequence_result = FindRoomSequenceWithCheckpointsResult()
+		if (len(room_positions) == 0):
+			return room_sequence_result
+		distance_matrix = np.asarray(distance_matrix, np.float64)
+		start_distances = np.asarray(start_distances, np.float64)
+		tour = self.computeNearestNeighborTour(distance_matrix, start_distances)
+		nearest_neighbor_length = self.getTourLength(tour, distance_matrix, start_distances)
+		tour = self.improveTour(tour, distance_matrix, start_distances)
+		self.printMsg("Tour length: " + str(nearest_neighbor_length) + " m (nearest neighbor), " + str(self.getTourLength(tour, distance_matrix, start_distances)) + " m (2-opt).")
+		for group in self.computeCheckpoints(tour, distance_matrix):
+			checkpoint = RoomSequence()
+			checkpoint.room_indices = group
+			center, radius = self.getGroupCenter(group, distance_matrix)
+			checkpoint.checkpoint_position_in_meter = Point32(x=room_positions[center][0], y=room_positions[center][1])
+			checkpoint.checkpoint_position_in_pixel = Point32(x=(room_positions[center][0] - map_origin.position.x)/map_resolution, y=(room_positions[center][1] - map_origin.position.y)/map_resolution)
+			room_sequence_result.checkpoints.append(checkpoint)
+		return room_sequence_result
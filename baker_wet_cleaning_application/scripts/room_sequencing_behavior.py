@@ -7,6 +7,8 @@ from geometry_msgs.msg import PoseStamped, Pose2D, Point32, Quaternion
 from ipa_building_msgs.msg import *
 
 import behavior_container
+import room_sequence_solver
+import numpy as np
 
 
 ###############''WORKAROUND FOR TRANSFORMLISTENER ISSUE####################
@@ -34,13 +36,27 @@ class RoomSequencingBehavior(behavior_container.BehaviorContainer):
 		self.behavior_name_ = behavior_name
 		self.interrupt_var_ = interrupt_var
 		self.service_str_ = service_str
+		# Time in [s] to wait for the room sequencing server to become available
+		self.server_timeout_ = 5.0
 
 	# Method for setting parameters for the behavior
 	#def setParameters(self, map_data, segmentation_data, robot_radius):
-	def setParameters(self, database, room_information_in_pixel, robot_radius):
+	def setParameters(self, database, room_information_in_pixel, robot_radius, room_ids=None, sequence_cache=None, local_sequencing_mode=1, trolley_radius=10.0, distance_matrix=None, start_position=None):
 		self.database_ = database
 		self.room_information_in_pixel_ = room_information_in_pixel
 		self.robot_radius_ = robot_radius
+		# IDs of the rooms in room_information_in_pixel, required for the sequence cache
+		self.room_ids_ = room_ids
+		# Optional RoomSequenceCache, None = always ask the room sequencing server
+		self.sequence_cache_ = sequence_cache
+		# Usage of the RoomSequenceSolver: 0=never, 1=fallback if the server fails, 2=always
+		self.local_sequencing_mode_ = local_sequencing_mode
+		# Maximum travel distance in [m] between a trolley checkpoint and its rooms for the RoomSequenceSolver
+		self.trolley_radius_ = trolley_radius
+		# Optional RoomDistanceMatrix with the travel distances between the rooms, None = straight line distances
+		self.distance_matrix_ = distance_matrix
+		# Optional Point32 in [m] from which the sequence starts, None = current robot position
+		self.start_position_ = start_position
 
 	# Method for returning to the standard pose of the robot
 	def returnToRobotStandardState(self):
@@ -63,6 +79,42 @@ class RoomSequencingBehavior(behavior_container.BehaviorContainer):
 		
 		return (robot_pose_translation, robot_pose_rotation, robot_pose_rotation_euler)
 
+	# Returns the positions [x, y] in [m] which represent the rooms: the first entry pose if available, otherwise the room center
+	def getRoomPositions(self):
+		map_resolution = self.database_.global_map_data_.map_resolution_
+		map_origin = self.database_.global_map_data_.map_origin_
+		room_positions = []
+		for i in range(len(self.room_information_in_pixel_)):
+			room = None
+			if (self.room_ids_ != None):
+				room = self.database_.getRoom(self.room_ids_[i])
+			if ((room != None) and (len(room.room_entry_poses_) > 0)):
+				room_positions.append([room.room_entry_poses_[0][0], room.room_entry_poses_[0][1]])
+			else:
+				room_center = self.room_information_in_pixel_[i].room_center
+				room_positions.append([map_origin.position.x + room_center.x*map_resolution, map_origin.position.y + room_center.y*map_resolution])
+		return np.array(room_positions, np.float64).reshape(-1, 2)
+
+	# Returns the straight line distances between the rooms and from the start position to the rooms
+	def computeDistances(self, room_positions, start_position):
+		distance_matrix = np.hypot(room_positions[:, 0:1] - room_positions[:, 0], room_positions[:, 1:2] - room_positions[:, 1])
+		start_distances = np.hypot(room_positions[:, 0] - start_position.x, room_positions[:, 1] - start_position.y)
+		return distance_matrix, start_distances
+
+	# Compute the room sequence with the in-process RoomSequenceSolver
+	def computeLocalSequence(self, start_position):
+		if ((self.distance_matrix_ != None) and (self.room_ids_ != None)):
+			self.distance_matrix_.update(self.database_, self.robot_radius_)
+			room_positions = self.distance_matrix_.getRoomPositions(self.room_ids_)
+			distance_matrix = self.distance_matrix_.getMatrix(self.room_ids_)
+			start_distances = self.distance_matrix_.getDistancesFromPosition([start_position.x, start_position.y], self.room_ids_, self.database_, self.robot_radius_)
+		else:
+			room_positions = self.getRoomPositions()
+			distance_matrix, start_distances = self.computeDistances(room_positions, start_position)
+		solver = room_sequence_solver.RoomSequenceSolver(self.trolley_radius_)
+		self.room_sequence_result_ = solver.computeSequence(room_positions, distance_matrix, start_distances,
+			self.database_.global_map_data_.map_resolution_, self.database_.global_map_data_.map_origin_)
+
 	# Implemented Behavior
 	def executeCustomBehavior(self):
 		
@@ -73,14 +125,43 @@ class RoomSequencingBehavior(behavior_container.BehaviorContainer):
 		room_sequence_goal.map_origin = self.database_.global_map_data_.map_origin_
 		room_sequence_goal.robot_radius = self.robot_radius_
 		room_sequence_goal.room_information_in_pixel = self.room_information_in_pixel_
-		(robot_pose_translation, robot_pose_rotation, robot_pose_rotation_euler) = self.currentRobotPose()
-		if (robot_pose_translation!=None):
-			room_sequence_goal.robot_start_coordinate.position = Point32(x=robot_pose_translation[0], y=robot_pose_translation[1])  # actual current coordinates should be inserted
+		if (self.start_position_ != None):
+			room_sequence_goal.robot_start_coordinate.position = Point32(x=self.start_position_.x, y=self.start_position_.y)
 		else:
-			self.printMsg("Warning: tf lookup failed, taking (0,0) as robot_start_coordinate.")
-			room_sequence_goal.robot_start_coordinate.position = Point32(x=0, y=0)
+			(robot_pose_translation, robot_pose_rotation, robot_pose_rotation_euler) = self.currentRobotPose()
+			if (robot_pose_translation!=None):
+				room_sequence_goal.robot_start_coordinate.position = Point32(x=robot_pose_translation[0], y=robot_pose_translation[1])  # actual current coordinates should be inserted
+			else:
+				self.printMsg("Warning: tf lookup failed, taking (0,0) as robot_start_coordinate.")
+				room_sequence_goal.robot_start_coordinate.position = Point32(x=0, y=0)
 		room_sequence_goal.robot_start_coordinate.orientation = Quaternion(x=0.,y=0.,z=0., w=0.)	# todo: normalized quaternion
+
+		# Look up the sequence in the cache first
+		cache_key = None
+		if ((self.sequence_cache_ != None) and (self.room_ids_ != None)):
+			cache_key = self.sequence_cache_.computeKey(self.room_ids_, room_sequence_goal.input_map, self.robot_radius_, room_sequence_goal.robot_start_coordinate.position)
+			self.room_sequence_result_ = self.sequence_cache_.getResult(cache_key)
+			if (self.room_sequence_result_ != None):
+				self.printMsg("Room sequence loaded from cache.")
+				return
+
+		if (self.local_sequencing_mode_ == 2):
+			self.printMsg("Computing the room sequence locally.")
+			self.computeLocalSequence(room_sequence_goal.robot_start_coordinate.position)
+			return
+
 		room_sequence_client = actionlib.SimpleActionClient(str(self.service_str_), FindRoomSequenceWithCheckpointsAction)
-		self.printMsg("Running sequencing action...")
-		self.room_sequence_result_ = self.runAction(room_sequence_client, room_sequence_goal)
+		if (room_sequence_client.wait_for_server(rospy.Duration(self.server_timeout_)) == True):
+			self.printMsg("Running sequencing action...")
+			self.room_sequence_result_ = self.runAction(room_sequence_client, room_sequence_goal)
+		else:
+			self.printMsg("Room sequencing server " + str(self.service_str_) + " is not available.")
+			self.room_sequence_result_ = None
+		if (self.executionInterrupted() == True):
+			return
+		if ((self.room_sequence_result_ == None) and (self.local_sequencing_mode_ != 0)):
+			self.printMsg("Room sequencing server failed, computing the room sequence locally.")
+			self.computeLocalSequence(room_sequence_goal.robot_start_coordinate.position)
+		elif ((self.room_sequence_result_ != None) and (cache_key != None)):
+			self.sequence_cache_.storeResult(cache_key, self.room_sequence_result_)
 		self.printMsg("Room sequencing completed.")
\ No newline at end of file
@@ -1,10 +1,8 @@
 #!/usr/bin/env python
 
 import rospy
-from geometry_msgs.msg import PoseStamped, Pose2D, Point32, Quaternion
-import std_srvs.srv
-import dynamic_reconfigure.client
-import ipa_building_msgs.srv
+import math
+from geometry_msgs.msg import PoseStamped, Pose2D, Point, Point32, Quaternion
 
 import behavior_container
 import move_base_behavior
@@ -14,6 +12,9 @@ import trolley_movement_behavior
 import tool_changing_behavior
 import move_base_wall_follow_behavior
 import trashcan_emptying_behavior
+import map_utilities
+import path_utilities
+import cleaning_session
 
 
 class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
@@ -25,7 +26,7 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 	#========================================================================
 		
 	# Method for setting parameters for the behavior
-	def setParameters(self, room_map_data, room_center, map_resolution, map_origin, map_header_frame_id, robot_frame_id, robot_radius, coverage_radius, field_of_view):
+	def setParameters(self, room_map_data, room_center, map_resolution, map_origin, map_header_frame_id, robot_frame_id, robot_radius, coverage_radius, field_of_view, exploration_result=None, coverage_path_cache=None, start_pose_index=0, progress_callback=None, cleaning_session=None, room_id=None, starting_position=None, room_entry_poses=[]):
 		# Parameters set from the outside
 		self.room_map_data_ = room_map_data
 		self.room_center_ = room_center
@@ -36,16 +37,39 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 		self.robot_radius_ = robot_radius
 		self.coverage_radius_ = coverage_radius
 		self.field_of_view_ = field_of_view
+		# Coverage path computed in advance (e.g. by the CoveragePathPrefetcher), None = compute in this behavior
+		self.exploration_result_ = exploration_result
+		# Optional CoveragePathCache for the room exploration
+		self.coverage_path_cache_ = coverage_path_cache
+		# Index of the first coverage path pose to be driven, > 0 when resuming the room
+		self.start_pose_index_ = start_pose_index
+		# Optional function which is called with the last reached pose index of the coverage path
+		self.progress_callback_ = progress_callback
+		# Optional CleaningSession which keeps the brush and the coverage monitoring running across rooms, None = use a session for this room only
+		self.cleaning_session_ = cleaning_session
+		# CleaningSession used in this room, the checkpoint session or a session of this room
+		self.room_session_ = None
+		self.room_id_ = room_id
+		# Starting position [x, y] in [m] for the room exploration, None = room center
+		self.starting_position_ = starting_position
+		# Entry poses [x, y, yaw] in [m] and [rad] of the room behind its doors, the robot drives to the entry pose closest to the path start with move_base
+		self.room_entry_poses_ = room_entry_poses
 		# Parameters set autonomously
 		self.room_exploration_service_str_ = '/room_exploration/room_exploration_server'
 		self.move_base_path_service_str_ = '/move_base_path'
 		self.move_base_wall_follow_service_str_ = '/move_base_wall_follow'
 		self.move_base_service_str_ = 'move_base'
-		self.start_cleaning_service_str_ = '/brush_cleaning_module_interface/start_brush_cleaner'
-		self.stop_cleaning_service_str_ = '/brush_cleaning_module_interface/stop_brush_cleaner'
-		self.coverage_monitor_dynamic_reconfigure_service_str_ = '/room_exploration/coverage_monitor_server'
-		self.stop_coverage_monitoring_service_str_ = "/room_exploration/coverage_monitor_server/stop_coverage_monitoring"
-		self.receive_coverage_image_service_str_ = "/room_exploration/coverage_monitor_server/get_coverage_image"
+		# Margin in [m] around the room's bounding box which is kept when cropping the room map for the room exploration
+		self.room_map_margin_ = 0.5
+		# Usage of the in-process coverage planner: 0=never, 1=fallback if the server fails, 2=fallback and for simple rooms
+		self.local_planning_mode_ = 1
+		# Maximum deviation in [m] of the simplified coverage path from the planned one
+		self.path_simplification_tolerance_ = 0.05
+		# Number of poses per goal sent to move_base_path and number of overlapping poses between two goals
+		self.path_chunk_size_ = 40
+		self.path_chunk_overlap_ = 3
+		# Coverage image of the room (CheckCoverage response), received at the end of the room if there is no checkpoint session
+		self.coverage_map_response_ = None
 
 
 
@@ -54,22 +78,14 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 	# Method for returning to the standard pose of the robot
 	def returnToRobotStandardState(self):
 		# save current data if necessary
-		# undo or check whether everything has been undone
-		pass
+		# turn off the cleaning device, the room is resumed by starting the session again
+		if (self.room_session_ != None):
+			self.room_session_.pause()
 
 
 
-
-
-	# Implemented Behavior
-	def executeCustomBehavior(self):
-		self.move_base_handler_ = move_base_behavior.MoveBaseBehavior("MoveBaseBehavior", self.interrupt_var_, self.move_base_service_str_)
-		self.room_explorer_ = room_exploration_behavior.RoomExplorationBehavior("RoomExplorationBehavior", self.interrupt_var_, self.room_exploration_service_str_)
-		self.path_follower_ = move_base_path_behavior.MoveBasePathBehavior("MoveBasePathBehavior_PathFollowing", self.interrupt_var_, self.move_base_path_service_str_)
-		self.wall_follower_ = move_base_wall_follow_behavior.MoveBaseWallFollowBehavior("MoveBaseWallFollowBehavior", self.interrupt_var_, self.move_base_wall_follow_service_str_)
-		self.trashcan_emptier_ = trashcan_emptying_behavior.TrashcanEmptyingBehavior("TrashcanEmptyingBehavior", self.interrupt_var_)
-		
-		# Room exploration
+	# Method for setting the room exploration parameters of this room at the provided RoomExplorationBehavior
+	def setupRoomExplorer(self, room_explorer):
 		"""
 		For room exploration:
 		map_resolution = self.map_resolution_
@@ -80,20 +96,44 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 		starting_position = Pose2D(x=1., y=0., theta=0.)
 		planning_mode = 2
 		"""
-		self.room_explorer_.setParameters(
-			self.room_map_data_,
+		if (self.starting_position_ != None):
+			starting_position = Pose2D(x=self.starting_position_[0], y=self.starting_position_[1], theta=0.)
+		else:
+			starting_position = Pose2D(x=self.room_center_.x, y=self.room_center_.y, theta=0.)
+		# Only send the room's region of interest, the shifted map origin keeps the resulting poses in map coordinates
+		cropped_room_map_data, cropped_map_origin = map_utilities.cropRoomMap(self.room_map_data_, self.map_origin_, self.map_resolution_, self.room_map_margin_)
+		room_explorer.setParameters(
+			cropped_room_map_data,
 			self.map_resolution_,
-			self.map_origin_,
+			cropped_map_origin,
 			robot_radius = self.robot_radius_,
 			coverage_radius = self.coverage_radius_,
 			field_of_view = self.field_of_view_,		# this field of view represents the off-center iMop floor wiping device
-			starting_position = Pose2D(x=self.room_center_.x, y=self.room_center_.y, theta=0.),	# todo: determine current robot position
-			planning_mode = 2
+			starting_position = starting_position,
+			planning_mode = 2,
+			path_cache = self.coverage_path_cache_,
+			local_planning_mode = self.local_planning_mode_,
+			map_frame_id = self.map_header_frame_id_
 		)
-		self.room_explorer_.executeBehavior()
+
+
+
+	# Implemented Behavior
+	def executeCustomBehavior(self):
+		self.move_base_handler_ = move_base_behavior.MoveBaseBehavior("MoveBaseBehavior", self.interrupt_var_, self.move_base_service_str_)
+		self.room_explorer_ = room_exploration_behavior.RoomExplorationBehavior("RoomExplorationBehavior", self.interrupt_var_, self.room_exploration_service_str_)
+		self.path_follower_ = move_base_path_behavior.MoveBasePathBehavior("MoveBasePathBehavior_PathFollowing", self.interrupt_var_, self.move_base_path_service_str_)
+		self.wall_follower_ = move_base_wall_follow_behavior.MoveBaseWallFollowBehavior("MoveBaseWallFollowBehavior", self.interrupt_var_, self.move_base_wall_follow_service_str_)
+		self.trashcan_emptier_ = trashcan_emptying_behavior.TrashcanEmptyingBehavior("TrashcanEmptyingBehavior", self.interrupt_var_)
+		
+		# Room exploration, if the coverage path has not been computed in advance
+		if (self.exploration_result_ == None):
+			self.setupRoomExplorer(self.room_explorer_)
+			self.room_explorer_.executeBehavior()
+			self.exploration_result_ = self.room_explorer_.exploration_result_
 
 		# If no trajectory was created - move on to next room
-		if (self.room_explorer_.exploration_result_ != None):
+		if (self.exploration_result_ != None):
 			
 			# Interruption opportunity
 			if self.handleInterrupt() == 2:
@@ -102,52 +142,32 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 			#rospy.sleep(20)
 			#continue
 
-			# Robot movement into next room
-			"""
-			For movement to room:
-			goal_position = self.room_center_
-			goal_orientation = Quaternion(x=0., y=0., z=0., w=0.)
-			header_frame_id = 'base_link'
-			"""
-			# todo: hack: reactivate this code
-			"""
-			self.printMsg("Moving to room_center in meter=" + str(self.room_center_))
-			self.move_base_handler_.setParameters(
-				self.room_center_,
-				Quaternion(x=0., y=0., z=0., w=1.),
-				'base_link'
-				)
-			self.move_base_handler_.executeBehavior()
-			"""
+			# Robot movement into next room: to the entry pose closest to the start of the coverage path, not when resuming the room
+			coverage_poses = self.exploration_result_.coverage_path_pose_stamped
+			if ((len(self.room_entry_poses_) > 0) and (len(coverage_poses) > 0) and (self.start_pose_index_ == 0)):
+				path_start = coverage_poses[0].pose.position
+				entry_pose = min(self.room_entry_poses_, key=lambda pose: math.hypot(pose[0] - path_start.x, pose[1] - path_start.y))
+				self.printMsg("Moving to the room entry pose " + str(entry_pose))
+				self.move_base_handler_.setParameters(
+					Point(x=entry_pose[0], y=entry_pose[1], z=0.),
+					Quaternion(x=0., y=0., z=math.sin(0.5*entry_pose[2]), w=math.cos(0.5*entry_pose[2])),
+					self.map_header_frame_id_
+					)
+				self.move_base_handler_.executeBehavior()
 			
 			# Interruption opportunity
 			if self.handleInterrupt() == 2:
 				return
 			
-			# baker_brush_cleaning_module_interface: turn on the cleaning device (service "start_brush_cleaner")
-			self.printMsg("Start cleaning with " + self.start_cleaning_service_str_)
-			rospy.wait_for_service(self.start_cleaning_service_str_) 
-			try:
-				req = rospy.ServiceProxy(self.start_cleaning_service_str_, std_srvs.srv.Trigger)
-				resp = req()
-				print "Start cleaning returned with success status " + str(resp.success)
-			except rospy.ServiceException, e:
-				print "Service call to " + self.start_cleaning_service_str_ + " failed: %s" % e
-			
-			# coverage_monitor_server: set the robot configuration (robot_radius, coverage_radius, coverage_offset) with dynamic reconfigure
-			#                          and turn on logging of the cleaned path (service "start_coverage_monitoring")
-			try:
-				print "Calling dynamic reconfigure at the coverage_monitor_server to set robot radius, coverage_radius, and coverage offset and start coverage monitoring."
-				client = dynamic_reconfigure.client.Client(self.coverage_monitor_dynamic_reconfigure_service_str_, timeout=5)
-				rospy.wait_for_service(self.coverage_monitor_dynamic_reconfigure_service_str_ + "/set_parameters")
-				client.update_configuration({"map_frame":self.map_header_frame_id_, "robot_frame":self.robot_frame_id_,
-											"coverage_radius":self.coverage_radius_,
-											"coverage_circle_offset_transform_x":0.5*(self.field_of_view_[0].x+self.field_of_view_[2].x),
-											"coverage_circle_offset_transform_y":0.5*(self.field_of_view_[0].y+self.field_of_view_[1].y),
-											"coverage_circle_offset_transform_z":0.0,
-											"robot_trajectory_recording_active":True})
-			except rospy.ServiceException, e:
-				print "Dynamic reconfigure request to " + self.coverage_monitor_dynamic_reconfigure_service_str_ + " failed: %s" % e
+			# A room which is not part of a checkpoint session runs a session of its own
+			if (self.cleaning_session_ == None):
+				self.room_session_ = cleaning_session.CleaningSession(self.map_header_frame_id_, self.robot_frame_id_, self.coverage_radius_,
+					self.field_of_view_, self.map_resolution_, self.map_origin_)
+			else:
+				self.room_session_ = self.cleaning_session_
+			# turn on the cleaning device and the coverage monitoring, a checkpoint session is usually still running from the previous room
+			self.room_session_.addRoom(self.room_id_, self.room_map_data_)
+			self.room_session_.start()
 			
 			# Explored path follow
 			"""
@@ -158,14 +178,30 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 			goal_position_tolerance = 0.5
 			goal_angle_tolerance = 1.57
 			"""
+			coverage_path = path_utilities.simplifyPath(self.exploration_result_.coverage_path_pose_stamped, self.path_simplification_tolerance_)
+			self.printMsg("Simplified coverage path from " + str(len(self.exploration_result_.coverage_path_pose_stamped)) + " to " + str(len(coverage_path)) + " poses.")
 			self.path_follower_.setParameters(
-				self.room_explorer_.exploration_result_.coverage_path_pose_stamped,
+				coverage_path,
 				self.room_map_data_,
 				0.2,
 				0.5,
-				1.57
+				1.57,
+				chunk_size = self.path_chunk_size_,
+				chunk_overlap = self.path_chunk_overlap_,
+				start_pose_index = min(self.start_pose_index_, len(coverage_path)),
+				progress_callback = self.progress_callback_
 			)
+			if (self.start_pose_index_ > 0):
+				self.printMsg("Resuming the coverage path at pose " + str(self.start_pose_index_) + ".")
 			self.path_follower_.executeBehavior()
+			# Resume the path from the last reached pose after a pause, the cleaning device and the recording are off during the pause
+			while (self.path_follower_.pathCompleted() == False and self.interrupt_var_[0] == 1 and rospy.is_shutdown() == False):
+				self.room_session_.pause()
+				rospy.sleep(self.sleep_time_)
+				if (self.interrupt_var_[0] == 0):
+					self.printMsg("Resuming the coverage path at pose " + str(self.path_follower_.start_pose_index_) + ".")
+					self.room_session_.start()
+					self.path_follower_.executeBehavior()
 			
 			# Interruption opportunity
 			if self.handleInterrupt() == 2:
@@ -179,24 +215,6 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 			goal_position_tolerance = 0.4
 			goal_angle_tolerance = 3.14
 			"""
-			# receive coverage map from coverage monitor
-			"""
-			self.printMsg("Receive coverage image from coverage monitor " + self.receive_coverage_image_service_str_)
-			rospy.wait_for_service(self.receive_coverage_image_service_str_) 
-			try:
-				req = rospy.ServiceProxy(self.receive_coverage_image_service_str_, ipa_building_msgs.srv.CheckCoverage)
-				req.input_map = self.room_map_data_
-				req.map_resolution = self.map_data_.map_resolution
-				req.map_origin = self.map_data_.map_origin
-				req.field_of_view = self.field_of_view_
-				req.coverage_radius = self.coverage_radius_
-				req.check_for_footprint = False
-				req.check_number_of_coverages = False
-				self.coverage_map_response_ = req()
-				print "Receive coverage image returned with success status " + str(resp.success)
-			except rospy.ServiceException, e:
-				print "Service call to " + self.receive_coverage_image_service_str_ + " failed: %s" % e
-			"""
 			'''
 			self.wall_follower_.setParameters(
 				self.map_data_.map
@@ -213,23 +231,11 @@ class RoomWetFloorCleaningBehavior(behavior_container.BehaviorContainer):
 			if self.handleInterrupt() == 2:
 				return
 			
-			# coverage_monitor_server.cpp: turn off logging of the cleaned path (service "stop_coverage_monitoring")
-			self.printMsg("Stop coverage monitoring with " + self.stop_coverage_monitoring_service_str_)
-			rospy.wait_for_service(self.stop_coverage_monitoring_service_str_) 
-			try:
-				req = rospy.ServiceProxy(self.stop_coverage_monitoring_service_str_, std_srvs.srv.Trigger)
-				resp = req()
-				print "Stop coverage monitoring returned with success status " + str(resp.success)
-			except rospy.ServiceException, e:
-				print "Service call to " + self.stop_coverage_monitoring_service_str_ + " failed: %s" % e
-			
-			
-			# baker_brush_cleaning_module_interface: turn off the cleaning device (service "stop_brush_cleaner")
-			self.printMsg("Stop cleaning with " + self.stop_cleaning_service_str_)
-			rospy.wait_for_service(self.stop_cleaning_service_str_) 
-			try:
-				req = rospy.ServiceProxy(self.stop_cleaning_service_str_, std_srvs.srv.Trigger)
-				resp = req()
-				print "Stop cleaning returned with success status " + str(resp.success)
-			except rospy.ServiceException, e:
-				print "Service call to " + self.stop_cleaning_service_str_ + " failed: %s" % e
+			# The checkpoint session keeps running into the next room and is stopped after the last room of the checkpoint,
+			# the trajectory is split per room map then
+			if (self.cleaning_session_ != None):
+				return
+
+			# turn off the cleaning device and the coverage monitoring and receive the coverage map of the room
+			self.room_session_.stop()
+			self.coverage_map_response_ = self.room_session_.coverage_responses_.get(self.room_id_)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import rospy
+import threading
+import Queue
+
+
+class TaskFuture():
+
+	#========================================================================
+	# Description:
+	# Handle of a task submitted to the TaskRunner. Provides the state and
+	# the result of the task.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, function, args, kwargs):
+		self.function_ = function
+		self.args_ = args
+		self.kwargs_ = kwargs
+		# State of the task: 0=pending, 1=running, 2=finished, 3=cancelled
+		self.state_ = 0
+		self.result_ = None
+		self.exception_ = None
+		self.condition_ = threading.Condition()
+
+	# Returns True if the task is finished or cancelled
+	def done(self):
+		with self.condition_:
+			return (self.state_ >= 2)
+
+	# Returns True if the task was cancelled before it started
+	def cancelled(self):
+		with self.condition_:
+			return (self.state_ == 3)
+
+	# Cancel the task if it did not start yet, returns True if the task will not run
+	def cancel(self):
+		with self.condition_:
+			if (self.state_ == 0):
+				self.state_ = 3
+				self.condition_.notify_all()
+			return (self.state_ == 3)
+
+	# Wait until the task is finished or cancelled, returns False on timeout or shutdown
+	def wait(self, timeout=None):
+		with self.condition_:
+			waited_time = 0.
+			while (self.state_ < 2):
+				if ((rospy.is_shutdown() == True) or ((timeout != None) and (waited_time >= timeout))):
+					return False
+				self.condition_.wait(0.1)
+				waited_time = waited_time + 0.1
+			return True
+
+	# Returns the return value of the task, raises the exception of the task if it failed
+	def result(self, timeout=None):
+		self.wait(timeout)
+		with self.condition_:
+			if (self.exception_ != None):
+				raise self.exception_
+			return self.result_
+
+	# Returns the exception raised by the task, None if there was none
+	def exception(self):
+		with self.condition_:
+			return self.exception_
+
+	# Run the task in the calling thread, does nothing if the task was cancelled
+	def run(self):
+		with self.condition_:
+			if (self.state_ != 0):
+				return
+			self.state_ = 1
+		result = None
+		exception = None
+		try:
+			result = self.function_(*self.args_, **self.kwargs_)
+		except Exception, e:
+			exception = e
+		with self.condition_:
+			self.result_ = result
+			self.exception_ = exception
+			self.state_ = 2
+			self.condition_.notify_all()
+
+
+
+class TaskRunner():
+
+	#========================================================================
+	# Description:
+	# Bounded pool of worker threads for subtasks which may run while the
+	# robot is driving (e.g. logging, trashcan handling). Tasks which did
+	# not start yet are cancelled when the application is cancelled.
+	#========================================================================
+
+	# Constructor
+	def __init__(self, interrupt_var, number_workers=2):
+		# Pointer to the interrupt variable of the application container
+		self.interrupt_var_ = interrupt_var
+		self.number_workers_ = number_workers
+		# Queue of TaskFutures, None stops a worker
+		self.tasks_ = Queue.Queue()
+		# Submitted tasks which are not done yet
+		self.open_futures_ = []
+		self.lock_ = threading.Lock()
+		self.worker_threads_ = []
+
+	# Method for printing messages.
+	def printMsg(self, text):
+		print "[TaskRunner]: " + str(text)
+
+	# Start the worker threads
+	def start(self):
+		while (len(self.worker_threads_) < self.number_workers_):
+			worker_thread = threading.Thread(target = self.processTasks)
+			worker_thread.daemon = True
+			worker_thread.start()
+			self.worker_threads_.append(worker_thread)
+
+	# Stop the worker threads after the already submitted tasks
+	def stop(self):
+		for worker_thread in self.worker_threads_:
+			self.tasks_.put(None)
+		self.worker_threads_ = []
+
+	# Submit function(*args, **kwargs) for execution in a worker thread, returns the TaskFuture of the task
+	def submit(self, function, *args, **kwargs):
+		future = TaskFuture(function, args, kwargs)
+		with self.lock_:
+			self.open_futures_ = [open_future for open_future in self.open_futures_ if (open_future.done() == False)]
+			self.open_futures_.append(future)
+		# without workers the task is run immediately
+		if (len(self.worker_threads_) == 0):
+			future.run()
+		else:
+			self.tasks_.put(future)
+		return future
+
+	# Cancel all tasks which did not start yet
+	def cancelPending(self):
+		with self.lock_:
+			for future in self.open_futures_:
+				future.cancel()
+
+	# Barrier: wait until the given tasks (default: all submitted tasks) are done.
+	# If the application is cancelled meanwhile, the tasks which did not start yet are cancelled.
+	# Returns False if any of the tasks failed or was cancelled.
+	def join(self, futures=None):
+		if (futures == None):
+			with self.lock_:
+				futures = list(self.open_futures_)
+		success = True
+		for future in futures:
+			while (future.wait(1.0) == False):
+				if (rospy.is_shutdown() == True):
+					return False
+				if (self.interrupt_var_[0] == 2):
+					self.cancelPending()
+			if (future.cancelled() == True):
+				success = False
+			elif (future.exception() != None):
+				self.printMsg("Task " + str(future.function_.__name__) + " failed: %s" % future.exception())
+				success = False
+		return success
+
+	# Worker loop
+	def processTasks(self):
+		while (True):
+			future = self.tasks_.get()
+			if (future == None):
+				break
+			# tasks are not started anymore once the application is cancelled
+			if (self.interrupt_var_[0] == 2):
+				future.cancel()
+			future.run()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import rospy
+import os
 from geometry_msgs.msg import PoseStamped, Pose2D, Point32, Quaternion
 import std_srvs.srv
 import dynamic_reconfigure.client
@@ -9,7 +10,6 @@ import ipa_building_msgs.srv
 import cv2
 import numpy as np
 from cv_bridge import CvBridge, CvBridgeError
-import threading
 
 import behavior_container
 import move_base_behavior
@@ -20,6 +20,12 @@ import trashcan_emptying_behavior
 import tool_changing_behavior
 import move_base_wall_follow_behavior
 import room_wet_floor_cleaning_behavior
+import coverage_path_prefetcher
+import coverage_path_cache
+import cleaning_session
+import map_utilities
+import path_utilities
+import task_runner
 
 class WetCleaningBehavior(behavior_container.BehaviorContainer):
 
@@ -31,7 +37,7 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 
 		
 	# Method for setting parameters for the behavior
-	def setParameters(self, database_handler, room_information_in_meter, sequence_data, mapping, robot_frame_id, robot_radius, coverage_radius, field_of_view):
+	def setParameters(self, database_handler, room_information_in_meter, sequence_data, mapping, robot_frame_id, robot_radius, coverage_radius, field_of_view, cleaning_pass=1):
 		# Parameters set from the outside
 		self.database_handler_= database_handler
 		self.room_information_in_meter_ = room_information_in_meter
@@ -41,6 +47,8 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 		self.robot_radius_ = robot_radius
 		self.coverage_radius_ = coverage_radius
 		self.field_of_view_ = field_of_view
+		# Cleaning pass for the progress checkpoint [1=due wet, 3=overdue wet]
+		self.cleaning_pass_ = cleaning_pass
 		# Parameters set autonomously
 		self.room_exploration_service_str_ = '/room_exploration/room_exploration_server'
 		self.move_base_path_service_str_ = '/move_base_path'
@@ -53,6 +61,23 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 		self.receive_coverage_image_service_str_ = "/room_exploration/coverage_monitor_server/get_coverage_image"
 		self.trolley_movement_service_str_ = ""
 		self.tool_changing_service_str_ = ""
+		# Number of upcoming rooms whose coverage paths are computed while the current room is cleaned
+		self.planning_lookahead_ = 1
+		# Keep the cleaning device and the coverage monitoring running across all rooms of a trolley checkpoint
+		self.use_cleaning_session_ = False
+		# Drive the coverage paths of all rooms of a checkpoint as one path, joined by transit segments on the global map
+		self.concatenate_checkpoint_paths_ = False
+		# Maximum deviation in [m] of the simplified coverage paths (concatenated mode)
+		self.path_simplification_tolerance_ = 0.05
+		# Number of poses per goal sent to move_base_path and number of overlapping poses between two goals (concatenated mode)
+		self.path_chunk_size_ = 40
+		self.path_chunk_overlap_ = 3
+		# Cell size in [m] of the grid for the transit planning between rooms
+		self.transit_cell_size_ = 0.2
+		# Start the coverage path of each room close to where the previous room was left
+		self.transit_aware_start_ = True
+		# Coverage paths are only reversed if the cleaned stripe is centered within this lateral offset in [m], otherwise the stripes would shift
+		self.max_reversal_fov_offset_ = 0.05
 
 
 
@@ -64,17 +89,11 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 
 
 
-	# Driving through room and wet cleaning
-	def driveCleaningTrajectory(self, room_counter, current_room_index):
-
-		self.printMsg("Moving to next room with current_room_index = " + str(current_room_index))
-
-		# Interruption opportunity
-		if self.handleInterrupt() == 2:
-			return
-
-		self.room_wet_floor_cleaner_.setParameters(
-			self.database_handler_.database_.getRoom(self.mapping_.get(current_room_index)).room_map_data_, 
+	# Create a RoomWetFloorCleaningBehavior with the parameters of the specified room
+	def createRoomWetFloorCleaner(self, room_counter, current_room_index, exploration_result=None, start_pose_index=0, progress_callback=None):
+		room_wet_floor_cleaner = room_wet_floor_cleaning_behavior.RoomWetFloorCleaningBehavior("RoomWetFloorCleaningBehavior", self.interrupt_var_)
+		room_wet_floor_cleaner.setParameters(
+			self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).room_map_data_, 
 			self.room_information_in_meter_[current_room_index].room_center, 
 			self.database_handler_.database_.global_map_data_.map_resolution_, 
 			self.database_handler_.database_.global_map_data_.map_origin_, 
@@ -82,47 +101,310 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 			self.robot_frame_id_, 
 			self.robot_radius_, 
 			self.coverage_radius_, 
-			self.field_of_view_
+			self.field_of_view_,
+			exploration_result,
+			self.coverage_path_cache_,
+			start_pose_index,
+			progress_callback,
+			self.cleaning_session_,
+			self.mapping_.get(room_counter),
+			self.getStartingPosition(room_counter),
+			self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).room_entry_poses_
 		)
-		self.room_wet_floor_cleaner_.executeBehavior()
+		return room_wet_floor_cleaner
+
+
+
+	# Request the coverage path of an upcoming room in the background
+	def prefetchCoveragePath(self, room_counter, current_room_index):
+		room_explorer = room_exploration_behavior.RoomExplorationBehavior("RoomExplorationBehavior_Prefetch", self.interrupt_var_, self.room_exploration_service_str_)
+		self.createRoomWetFloorCleaner(room_counter, current_room_index).setupRoomExplorer(room_explorer)
+		self.coverage_path_prefetcher_.prefetch(room_counter, room_explorer)
+
+
+
+	# Returns the starting position [x, y] of the room's coverage path: the room cell with the shortest transit
+	# from the end of the previous room's path. If the previous room's path is not known yet, the room's first
+	# entry pose is used (None = room center if there are no entry poses).
+	def getStartingPosition(self, room_counter):
+		if ((room_counter in self.room_starting_positions_) == False):
+			starting_position = None
+			room_entry_poses = self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).room_entry_poses_
+			if (len(room_entry_poses) > 0):
+				starting_position = (room_entry_poses[0][0], room_entry_poses[0][1])
+			previous_exit_position = self.room_exit_positions_.get(room_counter - 1)
+			if ((self.transit_aware_start_ == True) and (previous_exit_position != None)):
+				database = self.database_handler_.database_
+				grid, cell_size_in_pixel = self.getTransitGrid()
+				room_mask = map_utilities.createRoomMask(database.getRoom(self.mapping_.get(room_counter)).room_map_data_, grid.shape, cell_size_in_pixel)
+				closest_cell, transit_distance = map_utilities.findClosestCell(grid, cell_size_in_pixel, database.global_map_data_.map_resolution_,
+					database.global_map_data_.map_origin_, previous_exit_position, room_mask)
+				if (closest_cell != None):
+					starting_position = map_utilities.cellToWorld(closest_cell, database.global_map_data_.map_resolution_, database.global_map_data_.map_origin_, cell_size_in_pixel)
+					self.printMsg("Starting position of room " + str(self.mapping_.get(room_counter)) + ": " + str(starting_position) + ", transit " + str(transit_distance) + " m.")
+			self.room_starting_positions_[room_counter] = starting_position
+		return self.room_starting_positions_[room_counter]
+
+
+
+	# Returns True if the coverage path is reached faster from the end of the previous room's path when driven backwards
+	def shallReversePath(self, room_counter, coverage_path):
+		previous_exit_position = self.room_exit_positions_.get(room_counter - 1)
+		if ((self.transit_aware_start_ == False) or (previous_exit_position == None) or (len(coverage_path) < 2)):
+			return False
+		fov_y = [point.y for point in self.field_of_view_]
+		if (abs(0.5*(max(fov_y) + min(fov_y))) > self.max_reversal_fov_offset_):
+			return False
+		database = self.database_handler_.database_
+		grid, cell_size_in_pixel = self.getTransitGrid()
+		first_cell = map_utilities.worldToCell(coverage_path[0].pose.position.x, coverage_path[0].pose.position.y, database.global_map_data_.map_resolution_, database.global_map_data_.map_origin_, cell_size_in_pixel)
+		last_cell = map_utilities.worldToCell(coverage_path[-1].pose.position.x, coverage_path[-1].pose.position.y, database.global_map_data_.map_resolution_, database.global_map_data_.map_origin_, cell_size_in_pixel)
+		if ((first_cell == last_cell) or (min(first_cell + last_cell) < 0) or (max(first_cell[0], last_cell[0]) >= grid.shape[0]) or (max(first_cell[1], last_cell[1]) >= grid.shape[1])):
+			return False
+		end_mask = np.zeros(grid.shape, np.bool_)
+		end_mask[first_cell] = True
+		end_mask[last_cell] = True
+		closest_cell, transit_distance = map_utilities.findClosestCell(grid, cell_size_in_pixel, database.global_map_data_.map_resolution_,
+			database.global_map_data_.map_origin_, previous_exit_position, end_mask)
+		return (closest_cell == last_cell)
+
+
+
+	# Returns the path key and the exploration result of the room from the prefetcher
+	# (computed now if it was not prefetched) and requests the coverage paths of the next rooms.
+	# The path is reversed if its end is closer to the previous room, which is marked in the path key.
+	def getCoveragePath(self, room_counter, current_room_index):
+		room_explorer = room_exploration_behavior.RoomExplorationBehavior("RoomExplorationBehavior", self.interrupt_var_, self.room_exploration_service_str_)
+		self.createRoomWetFloorCleaner(room_counter, current_room_index).setupRoomExplorer(room_explorer)
+		exploration_result = self.coverage_path_prefetcher_.getResult(room_counter, room_explorer)
+		path_key = room_explorer.computePathKey()
+
+		if ((exploration_result != None) and (len(exploration_result.coverage_path_pose_stamped) > 0)):
+			if (self.shallReversePath(room_counter, exploration_result.coverage_path_pose_stamped) == True):
+				self.printMsg("Reversing the coverage path of room " + str(self.mapping_.get(room_counter)) + ".")
+				exploration_result.coverage_path_pose_stamped = path_utilities.reversePath(exploration_result.coverage_path_pose_stamped)
+				if (path_key != None):
+					path_key = path_key + "_reversed"
+			exit_position = exploration_result.coverage_path_pose_stamped[-1].pose.position
+			self.room_exit_positions_[room_counter] = (exit_position.x, exit_position.y)
+
+		# Compute the coverage paths of the next rooms while this room is cleaned
+		for (next_room_counter, next_room_index) in self.room_schedule_[room_counter+1 : room_counter+1+self.planning_lookahead_]:
+			self.prefetchCoveragePath(next_room_counter, next_room_index)
+		return path_key, exploration_result
+
+
+
+	# Returns the covered surface area in [m^2] and the coverage percentage of the room from the coverage image of the coverage monitor.
+	# The uncovered regions of the room are saved as image for follow-up passes.
+	def accountRoomCoverage(self, room_counter):
+		room_id = self.mapping_.get(room_counter)
+		room = self.database_handler_.database_.getRoom(room_id)
+		# within a session the coverage image is received while the recording is still active
+		if ((self.cleaning_session_ != None) and (room.room_map_data_ is not None)):
+			self.room_coverage_responses_[room_id] = self.cleaning_session_.receiveCoverageImage(room.room_map_data_)
+		coverage_response = self.room_coverage_responses_.get(room_id)
+		if ((coverage_response == None) or (room.room_map_data_ is None)):
+			return 0., 0.
+		covered_area, coverage_percentage, uncovered_mask = map_utilities.computeCoverage(room.room_map_data_, coverage_response.coverage_map,
+			self.database_handler_.database_.global_map_data_.map_resolution_)
+		self.printMsg("Covered " + str(covered_area) + " m^2 (" + str(coverage_percentage) + " %) of room " + str(room_id) + ".")
+		coverage_directory = self.database_handler_.database_.extracted_file_path + "resources/coverage/"
+		if (os.path.isdir(coverage_directory) == False):
+			os.makedirs(coverage_directory)
+		cv2.imwrite(coverage_directory + "uncovered_room_" + str(room_id) + ".png", uncovered_mask.astype(np.uint8)*255)
+		return covered_area, coverage_percentage
+
+	# Mark the wet cleaning and the given further subtasks of the room as finished with one database commit.
+	# log_items: LogItems of further completed subtasks (e.g. trashcan emptying)
+	# update_progress: clear the progress checkpoint of the room, False if the progress of the next room may be recorded meanwhile
+	def checkoutRoom(self, room_counter, log_items=[], update_progress=True):
+		self.printMsg("ID of cleaned room: " + str(self.mapping_.get(room_counter)))
+		covered_area, coverage_percentage = self.accountRoomCoverage(room_counter)
+		with self.database_handler_.transaction():
+			# Log entry for wet cleaning
+			wet_log_item = self.database_handler_.createLogItem(
+				self.mapping_.get(room_counter), # room id
+				1, # status (1=Completed)
+				1, # cleaning task (1=wet only)
+				0, # (found dirtspots)
+				0, # trashcan count
+				covered_area, # surface area
+				[], # room issues
+				0, # water amount
+				0, # battery usage
+				coverage_percentage
+			)
+			self.database_handler_.checkoutCompletedRoomTasks(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), [wet_log_item] + log_items)
+			if (update_progress == True):
+				self.database_handler_.updateRoomProgress(self.cleaning_pass_, self.current_checkpoint_index_, None)
+		self.printMsg(str(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_))
+
+
+
+	# Driving through room and wet cleaning, returns False if the cleaning was cancelled
+	def driveCleaningTrajectory(self, room_counter, current_room_index):
+
+		self.printMsg("Moving to next room with current_room_index = " + str(current_room_index))
 
 		# Interruption opportunity
 		if self.handleInterrupt() == 2:
-			return
+			return False
+
+		# Get the coverage path of the room
+		path_key, exploration_result = self.getCoveragePath(room_counter, current_room_index)
+
+		# Interruption opportunity, the room is not checked out if its path computation was cancelled
+		if ((self.handleInterrupt() == 2) or ((exploration_result == None) and ((self.executionInterrupted() == True) or (rospy.is_shutdown() == True)))):
+			return False
+
+		# If the server returned no trajectory - move on to next room
+		if (exploration_result != None):
+			# Continue a room which was interrupted before, the path key ensures that the recorded pose index belongs to the same path
+			room_id = self.mapping_.get(room_counter)
+			start_pose_index = self.database_handler_.getResumePoseIndex(self.cleaning_pass_, room_id, path_key)
+			self.database_handler_.updateRoomProgress(self.cleaning_pass_, self.current_checkpoint_index_, room_id, path_key, start_pose_index - 1)
+			progress_callback = lambda last_reached_pose_index: self.database_handler_.updateRoomProgress(self.cleaning_pass_, self.current_checkpoint_index_, room_id, path_key, last_reached_pose_index)
+			self.room_wet_floor_cleaner_ = self.createRoomWetFloorCleaner(room_counter, current_room_index, exploration_result, start_pose_index, progress_callback)
+			self.room_wet_floor_cleaner_.executeBehavior()
+			if (self.room_wet_floor_cleaner_.coverage_map_response_ != None):
+				self.room_coverage_responses_[room_id] = self.room_wet_floor_cleaner_.coverage_map_response_
+		else:
+			self.printMsg("No coverage path available for room " + str(self.mapping_.get(room_counter)) + ".")
 
-		# Mark the current room as finished
-		self.printMsg("ID of cleaned room: " + str(self.mapping_.get(room_counter)))
-		self.database_handler_.checkoutCompletedRoom(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), 1)
-		self.printMsg(str(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_))
+		# Interruption opportunity
+		if self.handleInterrupt() == 2:
+			return False
+
+		# The current room is checked out together with its other subtasks
+		return True
+
+
+
+	# Returns the grid for the transit planning on the global map, computed on first use
+	def getTransitGrid(self):
+		if (self.transit_grid_ == None):
+			self.transit_grid_ = map_utilities.createTransitGrid(
+				self.database_handler_.database_.global_map_data_.map_image_,
+				self.database_handler_.database_.global_map_data_.map_resolution_,
+				self.robot_radius_,
+				self.transit_cell_size_
+			)
+		return self.transit_grid_
+
+
+
+	# Driving through all rooms of a checkpoint with one continuous path.
+	# checkpoint_rooms: list of (room_counter, room_index)
+	# Returns False if the path could not be assembled, then the rooms have to be cleaned one by one.
+	def driveCheckpointTrajectory(self, checkpoint_rooms):
+		database = self.database_handler_.database_
+		frame_id = database.global_map_data_.map_header_frame_id_
+
+		# Coverage paths of the rooms, rooms without a path are only checked out
+		room_paths = []
+		rooms_without_path = []
+		for (room_counter, current_room_index) in checkpoint_rooms:
+			path_key, exploration_result = self.getCoveragePath(room_counter, current_room_index)
+			# Interruption opportunity, the rooms are not checked out if a path computation was cancelled
+			if ((self.handleInterrupt() == 2) or ((exploration_result == None) and ((self.executionInterrupted() == True) or (rospy.is_shutdown() == True)))):
+				return True
+			if (exploration_result == None):
+				self.printMsg("No coverage path available for room " + str(self.mapping_.get(room_counter)) + ".")
+				rooms_without_path.append(room_counter)
+				continue
+			room_id = self.mapping_.get(room_counter)
+			coverage_path = path_utilities.simplifyPath(exploration_result.coverage_path_pose_stamped, self.path_simplification_tolerance_)
+			start_pose_index = min(self.database_handler_.getResumePoseIndex(self.cleaning_pass_, room_id, path_key), len(coverage_path))
+			room_paths.append((room_counter, room_id, path_key, coverage_path, start_pose_index))
+
+		# Concatenation of the coverage paths with transit segments
+		# room_markers: (room_counter, room_id, path_key, index of the room's first pose, index after its last pose, pose index in the room's path at the first pose)
+		grid, cell_size_in_pixel = self.getTransitGrid()
+		target_poses = []
+		room_markers = []
+		for (room_counter, room_id, path_key, coverage_path, start_pose_index) in room_paths:
+			room_poses = coverage_path[start_pose_index:]
+			if ((len(target_poses) > 0) and (len(room_poses) > 0)):
+				last_position = target_poses[-1].pose.position
+				next_position = room_poses[0].pose.position
+				transit_path = map_utilities.computeTransitPath(grid, cell_size_in_pixel, database.global_map_data_.map_resolution_, database.global_map_data_.map_origin_,
+					(last_position.x, last_position.y), (next_position.x, next_position.y), frame_id)
+				if (transit_path == None):
+					self.printMsg("No transit path into room " + str(room_id) + " found, cleaning the rooms one by one.")
+					return False
+				target_poses.extend(transit_path[1:-1])
+			room_markers.append((room_counter, room_id, path_key, len(target_poses), len(target_poses) + len(room_poses), start_pose_index))
+			target_poses.extend(room_poses)
+		self.printMsg("Concatenated the coverage paths of " + str(len(room_markers)) + " rooms to " + str(len(target_poses)) + " poses.")
+
+		# Per room checkout and progress documentation from the reached poses.
+		# The progress callback runs in the polling loop of the path following, the checkouts (coverage image, database) run on the task runner.
+		checked_out_rooms = set()
+		checkout_tasks = []
+		def documentProgress(last_reached_pose_index):
+			for (room_counter, room_id, path_key, first_index, end_index, start_pose_index) in room_markers:
+				if ((last_reached_pose_index >= end_index - 1) and ((room_counter in checked_out_rooms) == False)):
+					checked_out_rooms.add(room_counter)
+					checkout_tasks.append(self.task_runner_.submit(self.checkoutRoom, room_counter, [], False))
+				elif ((last_reached_pose_index >= first_index) and (last_reached_pose_index < end_index - 1)):
+					self.database_handler_.updateRoomProgress(self.cleaning_pass_, self.current_checkpoint_index_, room_id, path_key, start_pose_index + last_reached_pose_index - first_index)
+
+		# The cleaning device and the recording keep running along the whole path including the transit segments,
+		# the recorded trajectory is split per room map when the session is stopped.
+		if (len(target_poses) > 0):
+			for (room_counter, room_id, path_key, first_index, end_index, start_pose_index) in room_markers:
+				self.cleaning_session_.addRoom(room_id, database.getRoom(room_id).room_map_data_)
+			self.cleaning_session_.start()
+			self.path_follower_ = move_base_path_behavior.MoveBasePathBehavior("MoveBasePathBehavior_CheckpointPath", self.interrupt_var_, self.move_base_path_service_str_)
+			self.path_follower_.setParameters(
+				target_poses,
+				database.global_map_data_.map_image_,
+				0.2,
+				0.5,
+				1.57,
+				chunk_size = self.path_chunk_size_,
+				chunk_overlap = self.path_chunk_overlap_,
+				progress_callback = documentProgress
+			)
+			try:
+				self.path_follower_.executeBehavior()
+				# Resume the path from the last reached pose after a pause, the cleaning device and the recording are off during the pause
+				while (self.path_follower_.pathCompleted() == False and self.interrupt_var_[0] == 1 and rospy.is_shutdown() == False):
+					self.cleaning_session_.pause()
+					rospy.sleep(self.sleep_time_)
+					if (self.interrupt_var_[0] == 0):
+						self.cleaning_session_.start()
+						self.path_follower_.executeBehavior()
+			finally:
+				# the cleaning device is off for the trashcan routines and the way to the next checkpoint
+				self.cleaning_session_.pause()
+				self.task_runner_.join(checkout_tasks)
+			if ((len(checkout_tasks) > 0) and (self.path_follower_.pathCompleted() == True)):
+				self.database_handler_.updateRoomProgress(self.cleaning_pass_, self.current_checkpoint_index_, None)
 
 		# Interruption opportunity
 		if self.handleInterrupt() == 2:
-			return
+			return True
 
-		# Adding log entry for wet cleaning
-		self.database_handler_.addLogEntry(
-			self.mapping_.get(room_counter), # room id
-			1, # status (1=Completed)
-			1, # cleaning task (1=wet only)
-			0, # (found dirtspots)
-			0, # trashcan count
-			0, # surface area
-			[], # room issues
-			0, # water amount
-			0 # battery usage
-		)
+		# Rooms whose markers were not reached are checked out as in the room by room mode
+		for (room_counter, room_id, path_key, first_index, end_index, start_pose_index) in room_markers:
+			if ((room_counter in checked_out_rooms) == False):
+				self.checkoutRoom(room_counter)
+		for room_counter in rooms_without_path:
+			self.checkoutRoom(room_counter)
+		return True
 
 
 
-	# Searching for trashcans
+	# Searching for trashcans, returns the log entry of the completed subtask
 	def trashcanRoutine(self, room_counter):
 		# ==========================================
 		# insert trashcan handling here
 		# ==========================================
-		self.database_handler_.checkoutCompletedRoom(self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)), -1)
 
-		# Adding log entry for trashcan emptying
-		self.database_handler_.addLogEntry(
+		# Log entry for trashcan emptying, written with the checkout of the room
+		return self.database_handler_.createLogItem(
 			self.mapping_.get(room_counter), # room id
 			1, # status (1=Completed)
 			-1, # cleaning task (-1=trashcan only)
@@ -140,32 +422,93 @@ class WetCleaningBehavior(behavior_container.BehaviorContainer):
 	def executeCustomBehavior(self):
 		self.trolley_mover_ = trolley_movement_behavior.TrolleyMovementBehavior("TrolleyMovementBehavior", self.interrupt_var_)
 		self.tool_changer_ = tool_changing_behavior.ToolChangingBehavior("ToolChangingBehavior", self.interrupt_var_)
-		self.room_wet_floor_cleaner_ = room_wet_floor_cleaning_behavior.RoomWetFloorCleaningBehavior("RoomWetFloorCleaningBehavior", self.interrupt_var_)
-		
+		self.coverage_path_prefetcher_ = coverage_path_prefetcher.CoveragePathPrefetcher(self.interrupt_var_, self.planning_lookahead_)
+		self.coverage_path_cache_ = coverage_path_cache.CoveragePathCache(self.database_handler_.database_.extracted_file_path + "resources/cache/coverage_paths/")
+
+		# Cleaning order of all rooms: room_schedule_[room_counter] = (room_counter, room_index)
+		# Room counter index: Needed for mapping of room_indices <--> RoomItem.room_id
+		self.room_schedule_ = []
+		for checkpoint in self.sequence_data_.checkpoints:
+			for current_room_index in checkpoint.room_indices:
+				self.room_schedule_.append((len(self.room_schedule_), current_room_index))
 
 		# Tool changing
 		self.tool_changer_.setParameters(self.database_handler_)
 		self.tool_changer_.executeBehavior()
 
-		# Room counter index: Needed for mapping of room_indices <--> RoomItem.room_id
 		room_counter = 0
-
-		for current_checkpoint_index in range(len(self.sequence_data_.checkpoints)):
-
-			# Trolley movement to checkpoint
-			self.trolley_mover_.setParameters(self.database_handler_)
-			self.trolley_mover_.executeBehavior()
-
-			for current_room_index in self.sequence_data_.checkpoints[current_checkpoint_index].room_indices:
-
-				# Handling of selected room
-				cleaning_thread = threading.Thread(target = self.driveCleaningTrajectory(room_counter, current_room_index))
-				cleaning_thread.start()
-				cleaning_tasks = self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_
-				if ((-1 in cleaning_tasks) == True):
-					trashcan_thread = threading.Thread(target = self.trashcanRoutine(room_counter))
-					trashcan_thread.start()
-				cleaning_thread.join()
-				
-				# Increment the current room counter index
-				room_counter = room_counter + 1
\ No newline at end of file
+		self.current_checkpoint_index_ = 0
+		self.cleaning_session_ = None
+		self.transit_grid_ = None
+		# Chosen starting positions and end positions of the coverage paths, room_counter --> [x, y]
+		self.room_starting_positions_ = {}
+		self.room_exit_positions_ = {}
+		# Coverage images of the cleaned rooms, room_id --> CheckCoverage response
+		self.room_coverage_responses_ = {}
+
+		# Subtasks which run while the robot is driving (trashcan routine)
+		self.task_runner_ = task_runner.TaskRunner(self.interrupt_var_)
+
+		self.coverage_path_prefetcher_.start()
+		self.task_runner_.start()
+		try:
+			for current_checkpoint_index in range(len(self.sequence_data_.checkpoints)):
+				self.current_checkpoint_index_ = current_checkpoint_index
+
+				# Trolley movement to checkpoint
+				self.trolley_mover_.setParameters(self.database_handler_)
+				self.trolley_mover_.executeBehavior()
+
+				# The rooms of a checkpoint are cleaned back to back within one session
+				if ((self.use_cleaning_session_ == True) or (self.concatenate_checkpoint_paths_ == True)):
+					self.cleaning_session_ = cleaning_session.CleaningSession(
+						self.database_handler_.database_.global_map_data_.map_header_frame_id_,
+						self.robot_frame_id_,
+						self.coverage_radius_,
+						self.field_of_view_,
+						self.database_handler_.database_.global_map_data_.map_resolution_,
+						self.database_handler_.database_.global_map_data_.map_origin_
+					)
+
+				checkpoint_rooms = self.room_schedule_[room_counter : room_counter + len(self.sequence_data_.checkpoints[current_checkpoint_index].room_indices)]
+				try:
+					# All rooms of the checkpoint with one path
+					if ((self.concatenate_checkpoint_paths_ == True) and (len(checkpoint_rooms) > 1) and (self.driveCheckpointTrajectory(checkpoint_rooms) == True)):
+						if ((self.handleInterrupt() == 2) or (rospy.is_shutdown() == True)):
+							return
+						for (current_room_counter, current_room_index) in checkpoint_rooms:
+							room = self.database_handler_.database_.getRoom(self.mapping_.get(current_room_counter))
+							if ((-1 in room.open_cleaning_tasks_) == True):
+								self.database_handler_.checkoutCompletedRoomTasks(room, [self.trashcanRoutine(current_room_counter)])
+						room_counter = room_counter + len(checkpoint_rooms)
+						continue
+
+					for current_room_index in self.sequence_data_.checkpoints[current_checkpoint_index].room_indices:
+
+						# Handling of selected room, the trashcan routine runs while the robot is cleaning
+						cleaning_tasks = self.database_handler_.database_.getRoom(self.mapping_.get(room_counter)).open_cleaning_tasks_
+						room_tasks = []
+						if ((-1 in cleaning_tasks) == True):
+							room_tasks.append(self.task_runner_.submit(self.trashcanRoutine, room_counter))
+						room_completed = self.driveCleaningTrajectory(room_counter, current_room_index)
+						self.task_runner_.join(room_tasks)
+
+						# Interruption opportunity
+						if ((room_completed == False) or (self.handleInterrupt() == 2)):
+							return
+
+						# Mark the current room as finished
+						log_items = [task.result() for task in room_tasks if ((task.cancelled() == False) and (task.exception() == None))]
+						self.checkoutRoom(room_counter, log_items)
+
+						# Increment the current room counter index
+						room_counter = room_counter + 1
+				finally:
+					# Turn off the cleaning device and split the recorded trajectory into the rooms of the checkpoint
+					if (self.cleaning_session_ != None):
+						self.cleaning_session_.stop()
+						self.room_coverage_responses_.update(self.cleaning_session_.coverage_responses_)
+						self.cleaning_session_ = None
+		finally:
+			self.coverage_path_prefetcher_.stop()
+			self.task_runner_.stop()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import coroutine_runtime
+
+
+# Coroutine which returns value after delay seconds
+def delayedValue(loop, delay, value):
+	yield coroutine_runtime.sleep(loop, delay)
+	raise coroutine_runtime.Return(value)
+
+# Coroutine which waits for future and records whether it was cancelled
+def recordCancellation(loop, future, record):
+	try:
+		yield future
+	except coroutine_runtime.CancelledError:
+		record.append("cancelled")
+		raise
+
+
+class TestCoroutineRuntime(unittest.TestCase):
+
+	def setUp(self):
+		self.loop_ = coroutine_runtime.EventLoop()
+
+	def test_task_returns_value(self):
+		self.assertEqual(self.loop_.runUntilComplete(delayedValue(self.loop_, 0.01, 42)), 42)
+
+	def test_task_propagates_exception(self):
+		def failing(loop):
+			yield coroutine_runtime.sleep(loop, 0.)
+			raise ValueError("failed")
+		self.assertRaises(ValueError, self.loop_.runUntilComplete, failing(self.loop_))
+
+	def test_nested_coroutines(self):
+		def outer(loop):
+			first = yield delayedValue(loop, 0.01, 1)
+			second = yield delayedValue(loop, 0.01, 2)
+			raise coroutine_runtime.Return(first + second)
+		self.assertEqual(self.loop_.runUntilComplete(outer(self.loop_)), 3)
+
+	def test_task_cancel_raises_at_yield(self):
+		record = []
+		pending = coroutine_runtime.Future(self.loop_)
+		task = self.loop_.createTask(recordCancellation(self.loop_, pending, record))
+		self.loop_.callLater(0.01, task.cancel)
+		self.assertRaises(coroutine_runtime.CancelledError, self.loop_.runUntilComplete, task)
+		self.assertEqual(record, ["cancelled"])
+		self.assertTrue(task.cancelled())
+		self.assertTrue(pending.cancelled())
+
+	def test_gather_runs_concurrently(self):
+		start_time = time.time()
+		results = self.loop_.runUntilComplete(coroutine_runtime.gather(self.loop_,
+			delayedValue(self.loop_, 0.2, "a"), delayedValue(self.loop_, 0.2, "b"), delayedValue(self.loop_, 0.1, "c")))
+		self.assertEqual(results, ["a", "b", "c"])
+		self.assertLess(time.time() - start_time, 0.35)
+
+	def test_gather_cancel_cancels_all(self):
+		records = [[], []]
+		futures = [coroutine_runtime.Future(self.loop_), coroutine_runtime.Future(self.loop_)]
+		tasks = [self.loop_.createTask(recordCancellation(self.loop_, futures[i], records[i])) for i in range(2)]
+		gathered = coroutine_runtime.gather(self.loop_, *tasks)
+		self.loop_.callLater(0.01, gathered.cancel)
+		self.assertRaises(coroutine_runtime.CancelledError, self.loop_.runUntilComplete, gathered)
+		# the cancellation of the tasks is processed by the loop
+		self.loop_.runUntilComplete(coroutine_runtime.sleep(self.loop_, 0.01))
+		self.assertEqual(records, [["cancelled"], ["cancelled"]])
+		self.assertTrue(all(task.cancelled() for task in tasks))
+
+	def test_gather_propagates_exception(self):
+		failed = coroutine_runtime.Future(self.loop_)
+		self.loop_.callLater(0.01, failed.setException, ValueError("failed"))
+		gathered = coroutine_runtime.gather(self.loop_, delayedValue(self.loop_, 0.01, 1), failed)
+		self.assertRaises(ValueError, self.loop_.runUntilComplete, gathered)
+
+	def test_with_timeout_returns_result(self):
+		self.assertEqual(self.loop_.runUntilComplete(coroutine_runtime.withTimeout(self.loop_, delayedValue(self.loop_, 0.01, 5), 1.0)), 5)
+
+	def test_with_timeout_cancels_operation(self):
+		record = []
+		pending = coroutine_runtime.Future(self.loop_)
+		timed = coroutine_runtime.withTimeout(self.loop_, recordCancellation(self.loop_, pending, record), 0.05)
+		self.assertRaises(coroutine_runtime.TimeoutError, self.loop_.runUntilComplete, timed)
+		# the cancellation of the operation is processed by the loop
+		self.loop_.runUntilComplete(coroutine_runtime.sleep(self.loop_, 0.01))
+		self.assertEqual(record, ["cancelled"])
+		self.assertTrue(pending.cancelled())
+
+	def test_with_timeout_cancel_cancels_operation(self):
+		pending = coroutine_runtime.Future(self.loop_)
+		timed = coroutine_runtime.withTimeout(self.loop_, pending, 1.0)
+		self.loop_.callLater(0.01, timed.cancel)
+		self.assertRaises(coroutine_runtime.CancelledError, self.loop_.runUntilComplete, timed)
+		self.assertTrue(pending.cancelled())
+
+	def test_wait_first(self):
+		slow = self.loop_.createTask(delayedValue(self.loop_, 1.0, "slow"))
+		fast = self.loop_.createTask(delayedValue(self.loop_, 0.01, "fast"))
+		done = self.loop_.runUntilComplete(coroutine_runtime.waitFirst(self.loop_, [slow, fast]))
+		self.assertEqual(done, [fast])
+		self.assertFalse(slow.done())
+		self.assertEqual(self.loop_.runUntilComplete(coroutine_runtime.waitFirst(self.loop_, [slow], 0.01)), [])
+		slow.cancel()
+
+	def test_run_in_thread(self):
+		self.assertEqual(self.loop_.runUntilComplete(coroutine_runtime.runInThread(self.loop_, lambda x: 2*x, 21)), 42)
+		def failing():
+			raise ValueError("failed")
+		self.assertRaises(ValueError, self.loop_.runUntilComplete, coroutine_runtime.runInThread(self.loop_, failing))
+
+
+if __name__ == '__main__':
+	unittest.main()